@@ -0,0 +1,311 @@
+"""
+Benchmarks of the deploy, merge, list and validation paths of cronpi.
+
+Nothing touches the crontab of the user: the "spool" backend writes a
+temporary file and the "crontab" backend runs a fake "crontab" executable
+put first in PATH, which keeps the crontab in a temporary file too.
+Results are printed as JSON so that runs of different releases can be
+compared.
+
+Usage
+----------
+python benchmark/bench.py --output result.json
+python benchmark/bench.py --sizes 10 1000 --repeat 5 --backends spool
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import cron, validator
+from cronpi.backend import CrontabBackend, SpoolBackend
+
+SIZES = (10, 100, 1000, 10000, 100000)
+BACKENDS = ("spool", "crontab")
+REPEAT = 20
+BATCH_JOBS = 100
+BATCH_SIZE = 1000
+VALIDATE_LINES = 100000
+
+FAKE_CRONTAB = """#!{python}
+import os
+import sys
+
+path = os.environ["CRONPI_FAKE_CRONTAB"]
+if sys.argv[1:] == ["-l"]:
+    if not os.path.exists(path):
+        sys.stderr.write("no crontab for bench\\n")
+        sys.exit(1)
+    with open(path) as f:
+        sys.stdout.write(f.read())
+elif sys.argv[1:] == ["-r"]:
+    if os.path.exists(path):
+        os.remove(path)
+else:
+    content = sys.stdin.read()
+    with open(path, "w") as f:
+        f.write(content)
+"""
+
+
+def make_crontab(size):
+    """
+    crontab content of size job lines with different commands.
+    """
+    lines = []
+    for i in range(size):
+        lines.append("{} {} * * {} /opt/jobs/job{}.sh --id {}".format(
+            i % 60, i % 24, ("*", "1-5", "0,6")[i % 3], i, i))
+    return "\n".join(lines) + "\n"
+
+
+def summarize(samples):
+    """
+    statistics in milliseconds of the given durations in seconds.
+    """
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        "count": count,
+        "min_ms": samples[0] * 1000,
+        "median_ms": samples[count // 2] * 1000,
+        "p95_ms": samples[min(count - 1, int(count * 0.95))] * 1000,
+        "max_ms": samples[-1] * 1000,
+        "mean_ms": sum(samples) / count * 1000,
+    }
+
+
+def measure(func, repeat, setup=None):
+    """
+    durations of repeat calls of func, setup is called before each of them
+    and is not measured.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+class Environment(object):
+    """
+    Temporary crontab for a backend name, "spool" or "crontab".
+    """
+
+    def __init__(self, backend_name):
+        self.backend_name = backend_name
+        self.directory = tempfile.mkdtemp(prefix="cronpi-bench-")
+        self.path = os.path.join(self.directory, "crontab")
+        self.environ = dict(os.environ)
+        if backend_name == "spool":
+            self.backend = SpoolBackend(self.path)
+        elif backend_name == "crontab":
+            fake = os.path.join(self.directory, "bin", "crontab")
+            os.makedirs(os.path.dirname(fake))
+            with open(fake, "w") as f:
+                f.write(FAKE_CRONTAB.format(python=sys.executable))
+            os.chmod(fake, os.stat(fake).st_mode | stat.S_IEXEC)
+            os.environ["CRONPI_FAKE_CRONTAB"] = self.path
+            os.environ["PATH"] = os.pathsep.join([os.path.dirname(fake), os.environ["PATH"]])
+            self.backend = CrontabBackend()
+        else:
+            raise ValueError("unknown backend {}".format(backend_name))
+
+    def __enter__(self):
+        cronpi.set_backend(self.backend)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        cron.set_backend(CrontabBackend())
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def fill(self, content):
+        with open(self.path, "w") as f:
+            f.write(content)
+        cron._invalidate_cache()
+
+
+def bench_deploy(backend_name, sizes, repeat):
+    """
+    latency of a single deploy, appending or overwriting a job, against
+    the size of the installed crontab.
+    """
+    results = []
+    for size in sizes:
+        content = make_crontab(size)
+        with Environment(backend_name) as env:
+            for overwrite in (False, True):
+                line = "30 7 * * * /opt/jobs/job{}.sh --id {}".format(size // 2, size // 2) \
+                    if overwrite else "30 7 * * * /opt/jobs/new.sh"
+                samples = measure(
+                    lambda: cronpi.run_custom(line, isOverwrite=overwrite),
+                    repeat, setup=lambda: env.fill(content))
+                results.append(dict(
+                    name="deploy", backend=backend_name, size=size,
+                    overwrite=overwrite, **summarize(samples)))
+    return results
+
+
+def bench_batch(backend_name, jobs, size, repeat):
+    """
+    deploying jobs one by one against deploying them in a transaction.
+    """
+    content = make_crontab(size)
+    lines = ["{} 3 * * * /opt/jobs/batch{}.sh".format(i % 60, i) for i in range(jobs)]
+
+    def per_job():
+        for line in lines:
+            cronpi.run_custom(line)
+
+    def batch():
+        with cronpi.transaction():
+            for line in lines:
+                cronpi.run_custom(line)
+
+    results = []
+    with Environment(backend_name) as env:
+        for mode, func in (("per_job", per_job), ("batch", batch)):
+            samples = measure(func, repeat, setup=lambda: env.fill(content))
+            results.append(dict(
+                name="batch", backend=backend_name, size=size, jobs=jobs,
+                mode=mode, **summarize(samples)))
+    return results
+
+
+def bench_merge(sizes, repeat):
+    """
+    cost of merging a job into an installed crontab, without any I/O
+    but the read of "_get_updated_content" from a spool file.
+    """
+    results = []
+    for size in sizes:
+        content = make_crontab(size)
+        line = "30 7 * * * /opt/jobs/job{}.sh --id {}".format(size // 2, size // 2)
+        samples = measure(lambda: cron._merge_content(content, line, True), repeat)
+        results.append(dict(name="merge", size=size, **summarize(samples)))
+        with Environment("spool") as env:
+            env.fill(content)
+            samples = measure(lambda: cron._get_updated_content(line, True), repeat)
+        results.append(dict(name="get_updated_content", size=size, **summarize(samples)))
+    return results
+
+
+def bench_validate(lines, repeat):
+    """
+    throughput of line by line and whole crontab validation.
+    """
+    content = make_crontab(lines)
+    split = content.splitlines()
+
+    def per_line():
+        for line in split:
+            validator.validate_crontab_content(line)
+
+    results = []
+    for mode, func in (("per_line", per_line),
+                       ("crontab", lambda: validator.validate_crontab(content))):
+        stats = summarize(measure(func, repeat))
+        stats["lines_per_second"] = lines / (stats["median_ms"] / 1000)
+        results.append(dict(name="validate", mode=mode, lines=lines, **stats))
+    return results
+
+
+def bench_job_list(backend_name, sizes, repeat):
+    """
+    cost of get_job_list with and without the read cache.
+    """
+    results = []
+    for size in sizes:
+        with Environment(backend_name) as env:
+            env.fill(make_crontab(size))
+            for cached in (False, True):
+                cronpi.configure_cache(enabled=cached)
+                cronpi.get_job_list()
+                samples = measure(cronpi.get_job_list, repeat)
+                results.append(dict(
+                    name="get_job_list", backend=backend_name, size=size,
+                    cached=cached, **summarize(samples)))
+        cronpi.configure_cache()
+    return results
+
+
+def run(sizes=SIZES, backends=BACKENDS, repeat=REPEAT, jobs=BATCH_JOBS, label=None):
+    """
+    Run every benchmark.
+
+    Parameters
+    ----------
+    sizes: list
+        numbers of lines of the installed crontab
+
+    backends: list
+        backend names, "spool" and/or "crontab"
+
+    repeat: int
+        number of measures of each case
+
+    jobs: int
+        number of jobs deployed by the batch benchmark
+
+    label: string
+        free text stored in the result, eg. the release
+
+    Returns
+    ----------
+    result: dict
+        environment and list of measures
+    """
+    results = []
+    for backend_name in backends:
+        results += bench_deploy(backend_name, sizes, repeat)
+        results += bench_batch(backend_name, jobs, min(BATCH_SIZE, max(sizes)), max(1, repeat // 10))
+        results += bench_job_list(backend_name, sizes, repeat)
+    results += bench_merge(sizes, repeat)
+    results += bench_validate(min(VALIDATE_LINES, max(sizes) * 10), max(1, repeat // 10))
+    return {
+        "label": label,
+        "time": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="cronpi benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="numbers of lines of the installed crontab")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--jobs", type=int, default=BATCH_JOBS,
+                        help="number of jobs deployed by the batch benchmark")
+    parser.add_argument("--label", help="eg. the release being measured")
+    parser.add_argument("--output", help="file to write the JSON to, default is stdout")
+    args = parser.parse_args(argv)
+
+    result = run(args.sizes, args.backends, args.repeat, args.jobs, args.label)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
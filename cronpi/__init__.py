@@ -1,6 +1,16 @@
-from cronpi.app import cronpiObj as __cronpiObj
+from cronpi.app import App as __App, cronpiObj as __cronpiObj
+from cronpi import cron as __cron
+from cronpi.backend import CrontabBackend, SpoolBackend
+from cronpi import entry as __entry
+from cronpi import history as __history
+from cronpi import metrics
+from cronpi import validator as __validator
+from cronpi.manifest import dump_manifest, load_manifest
+from cronpi.schedule import compile_expression, next_run, next_runs, previous_run
+from cronpi.scheduler import Scheduler
 
-def run_every_day(cmd, isOverwrite=False):
+
+def run_every_day(cmd, isOverwrite=False, user=None):
     """
     set a command that runs every day.
     It is of no use if "on" method is not called.
@@ -15,11 +25,15 @@ def run_every_day(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
     """
-    __cronpiObj.type = 1
-    return __cronpiObj.set_command(cmd,isOverwrite)
+    return __App(1).set_command(cmd, isOverwrite, user)
+
 
-def run_every_week(cmd, isOverwrite=False):
+def run_every_week(cmd, isOverwrite=False, user=None):
     """
     set a command that runs every week.
     It is of no use if "on" method is not called.
@@ -34,11 +48,15 @@ def run_every_week(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
     """
-    __cronpiObj.type = 2
-    return __cronpiObj.set_command(cmd, isOverwrite)
-    
-def run_every_month(cmd, isOverwrite=False):
+    return __App(2).set_command(cmd, isOverwrite, user)
+
+
+def run_every_month(cmd, isOverwrite=False, user=None):
     """
     set a command that runs every month.
     It is of no use if "on" method is not called.
@@ -53,11 +71,15 @@ def run_every_month(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
     """
-    __cronpiObj.type = 3
-    return __cronpiObj.set_command(cmd, isOverwrite)
-    
-def run_every_year(cmd, isOverwrite=False):
+    return __App(3).set_command(cmd, isOverwrite, user)
+
+
+def run_every_year(cmd, isOverwrite=False, user=None):
     """
     set a command that runs every year.
     It is of no use if "on" method is not called.
@@ -72,11 +94,15 @@ def run_every_year(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
     """
-    __cronpiObj.type = 4
-    return __cronpiObj.set_command(cmd, isOverwrite)
-    
-def run_by_date(cmd, isOverwrite=False):
+    return __App(4).set_command(cmd, isOverwrite, user)
+
+
+def run_by_date(cmd, isOverwrite=False, user=None):
     """
     set a command that runs at given date.
     It is of no use if "on" method is not called.
@@ -91,11 +117,49 @@ def run_by_date(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
+
+    The job is installed with an "expires" annotation: it is removed by
+    "gc" or by the next "run_by_date" once it has run, so that it does not
+    run again the next year.
+    """
+    return __App(5).set_command(cmd, isOverwrite, user)
+
+
+def run_every_seconds(cmd, isOverwrite=False, user=None):
+    """
+    set a command that runs every few seconds, eg. every 15 seconds
+    with ".on(15)". The seconds should divide 60.
+    It is of no use if "on" method is not called.
+
+    parameters
+    ---------------
+    cmd: string
+        command to run as cronjob
+
+    isOverwrite: bool
+        If True and cmd already exists as cronjob,
+        it will overwrite with the new interval.
+        Otherwise, it will insert as new cron job.
+        Default value is False.
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
+
+    The job is installed as a single line running every minute the cronpi
+    runner, which runs the command at fixed seconds of the minute and
+    skips a run while the previous one is still running.
     """
-    __cronpiObj.type = 5
-    return __cronpiObj.set_command(cmd, isOverwrite)
-    
-def run_custom(cmd, isOverwrite=False):
+    return __App(7).set_command(cmd, isOverwrite, user)
+
+
+def run_custom(cmd, isOverwrite=False, tags=None, user=None, track=False,
+               max_concurrency=None, on_overlap="skip", max_parallel=None, group=None,
+               profile=None):
     """
     set a cronjob like "crontab -e" command
 
@@ -109,20 +173,345 @@ def run_custom(cmd, isOverwrite=False):
         it will overwrite with the new date and time.
         Otherwise, it will insert as new cron job.
         Default value is False.
+
+    tags: string or list
+        tags to find or remove the job later, eg. "web" or ["web", "db"].
+        Other "run_*" functions take them with ".tag(...)" before "on".
+
+    user: string
+        If given, install into the crontab of this user ("crontab -u"),
+        which usually requires root. Default is the current user.
+
+    track: bool
+        If True, install the command behind the cronpi runner, which
+        records every run for "stats". Other "run_*" functions do it with
+        ".track()" before "on".
+
+    max_concurrency: int
+        If given, at most this number of copies of the command run at once.
+
+    on_overlap: string
+        when max_concurrency copies are running, "skip" the new run,
+        "queue" it until one of them ends or "kill" the oldest one.
+        Default is "skip".
+
+    max_parallel: int
+        If given, at most this number of jobs of the group run at once
+        on the host.
+
+    group: string
+        group of max_parallel. Default is "default".
+        Other "run_*" functions take these options with ".limit(...)".
+
+    profile: string
+        If given, resource profile the command is started with,
+        "background" or "batch". Other "run_*" functions take it and
+        finer options with ".resources(...)".
     """
-    __cronpiObj.type = 6
-    return __cronpiObj.set_command(cmd, isOverwrite).on(None)
+    return __App.custom(cmd, isOverwrite, tags, user, track, max_concurrency, on_overlap,
+                        max_parallel, group, profile).on(None)
 
-def get_job_list():
+
+def get_job_list(user=None):
     """
-    get the jobs in crontab for current user
+    get the jobs in crontab for current user, or for the given user
 
     Return
     ----------
     result: list
         result of "crontab -l" command  as list
     """
-    installed_content = __cronpiObj.get_job_list()
+    installed_content = __cronpiObj.get_job_list(user)
     installed_content = installed_content.rstrip("\n")
 
-    return installed_content.split("\n")
\ No newline at end of file
+    return installed_content.split("\n")
+
+
+def iter_entries(kind=None, user=None):
+    """
+    iterate over the lines of the crontab as CronEntry objects.
+    Schedule and command of an entry are parsed only when accessed.
+
+    parameters
+    ---------------
+    kind: string or tuple
+        only yield entries of given kinds among "job", "macro", "env",
+        "comment" and "blank". Default is every line.
+
+    Usage
+    ----------
+    for job in cronpi.iter_entries(kind=("job", "macro")):
+        print(job.line_number, job.schedule, job.command)
+    """
+    return __entry.iter_entries(__cron.get_installed_content(user=user), kind)
+
+
+def configure_cache(enabled=True, ttl=1.0):
+    """
+    set how "get_job_list" caches the crontab.
+    The cache is refreshed when the crontab file changes or cronpi writes
+    it. If the file can not be checked, eg. the spool of "crontab" binary
+    is not readable, the cache expires after ttl seconds.
+
+    parameters
+    ---------------
+    enabled: bool
+        If False, "get_job_list" always reads the crontab.
+        Default value is True.
+
+    ttl: float
+        seconds to keep the cache when the file can not be checked.
+        Default value is 1.0.
+    """
+    __cron.configure_cache(enabled, ttl)
+
+
+def transaction(user=None):
+    """
+    group several jobs so that they are installed with a single write.
+    Jobs deployed inside the block are queued and the merged crontab is
+    written once when the block exits. Nothing is written if the block
+    raises an exception.
+
+    Usage
+    ----------
+    with cronpi.transaction():
+        cronpi.run_every_day("/some/command").on("7:30")
+        cronpi.run_every_week("/other/command").on("sunday", time="17:30")
+    """
+    return __cron.transaction(user)
+
+
+batch = transaction
+
+
+def set_backend(backend):
+    """
+    set the backend used to read and install the crontab.
+    Default is CrontabBackend which runs the "crontab" binary.
+
+    parameters
+    ---------------
+    backend: object
+        eg. SpoolBackend("/var/spool/cron/crontabs") to read and write
+        the crontab file directly without starting any process.
+    """
+    __cron.set_backend(backend)
+
+
+def sync(desired_jobs, prune=True, user=None):
+    """
+    make the installed crontab match the given jobs with a single write.
+    Nothing is written when the crontab is already up to date.
+
+    parameters
+    ---------------
+    desired_jobs: list
+        crontab lines like "30 7 * * * /some/command"
+
+    prune: bool
+        If True, installed jobs whose command is not in desired_jobs
+        are removed. Default value is True.
+
+    Return
+    ----------
+    result: SyncResult
+        namedtuple of added, updated and removed crontab lines
+    """
+    return __cron.sync(desired_jobs, prune, user)
+
+
+def configure_concurrency(use_flock=True, compare_and_swap=False,
+                          max_retries=5, backoff=0.05):
+    """
+    set how concurrent deploys from several processes are protected.
+
+    parameters
+    ---------------
+    use_flock: bool
+        If True, every read-merge-write of the crontab is done while
+        holding an advisory file lock shared by all cronpi processes.
+        Default value is True.
+
+    compare_and_swap: bool
+        If True, the crontab is read again before writing and the merge
+        is retried with backoff if it has been changed meanwhile.
+        Default value is False.
+
+    max_retries: int
+        retries before giving up in compare_and_swap mode.
+
+    backoff: float
+        seconds to wait before the first retry, doubled on each retry.
+    """
+    __cron.configure_concurrency(use_flock, compare_and_swap, max_retries, backoff)
+
+
+def contention_stats():
+    """
+    get the lock and retry counters of this process.
+
+    Return
+    ----------
+    result: dict
+        lock_acquisitions, lock_wait_seconds, cas_retries and cas_failures
+    """
+    return __cron.get_contention_stats()
+
+
+def configure_metrics(enabled=True, hook=None):
+    """
+    record the duration of the validate, lock, read, merge, write and
+    exec phases of every deploy and counters like no-op writes and bytes
+    written. Disabled by default.
+
+    parameters
+    ---------------
+    enabled: bool
+        If False, stop recording. Default value is True.
+
+    hook: callable
+        called with a metrics.Span whenever a phase ends.
+
+    Usage
+    ----------
+    cronpi.configure_metrics()
+    print(cronpi.metrics.to_prometheus())
+    """
+    if enabled:
+        metrics.enable(hook)
+    else:
+        metrics.disable()
+        if hook is not None:
+            metrics.remove_hook(hook)
+
+
+def find(command=None, predicate=None, regex=None, tag=None, schedule=None, user=None):
+    """
+    get the installed jobs matching every given criterion.
+
+    parameters
+    ---------------
+    command: string
+        command of the jobs
+
+    predicate: callable
+        takes a CronEntry and returns True for the jobs to keep
+
+    regex: string
+        pattern searched in the command of the jobs
+
+    tag: string
+        tag given with "tags=" or ".tag(...)" when deploying
+
+    schedule: string
+        5 time fields or macro, eg. "30 7 * * *" or "@daily"
+
+    Return
+    ----------
+    result: list
+        CronEntry of each matching job
+
+    Usage
+    ----------
+    for job in cronpi.find(tag="web", regex=r"backup"):
+        print(job.line_number, job.schedule, job.command)
+    """
+    return __cron.find(command, predicate, regex, tag, schedule, user)
+
+
+def remove(cmd, user=None):
+    """
+    remove every job running the given command.
+
+    Return
+    ----------
+    result: list
+        crontab lines that have been removed
+    """
+    return __cron.remove(cmd, user)
+
+
+def remove_where(predicate=None, regex=None, tag=None, schedule=None, user=None):
+    """
+    remove every job matching all the given criteria, the same as in
+    "find", with a single write of the crontab.
+
+    Return
+    ----------
+    result: list
+        crontab lines that have been removed
+
+    Usage
+    ----------
+    cronpi.remove_where(tag="web")
+    cronpi.remove_where(regex=r"^/opt/app/", predicate=lambda job: job.hour == "3")
+    """
+    return __cron.remove_where(predicate, regex, tag, schedule, user=user)
+
+
+def gc(user=None):
+    """
+    remove every job installed by "run_by_date" whose date has passed,
+    with a single write of the crontab.
+
+    Return
+    ----------
+    result: list
+        crontab lines that have been removed
+
+    Usage
+    ----------
+    # prune expired one-shot jobs every night
+    cronpi.run_every_day("python3 -c 'import cronpi; cronpi.gc()'", isOverwrite=True).on("0:15")
+    """
+    return __cron.gc(user=user)
+
+
+def compact(user=None):
+    """
+    remove duplicate jobs and merge the schedules of jobs running the same
+    command which differ in a single field, with a single write of the
+    crontab. Every command still runs at the same minutes.
+
+    Return
+    ----------
+    result: CompactResult
+        removed lines and merged lines added instead
+
+    Usage
+    ----------
+    # "30 7 * * 1 cmd", "30 7 * * 3 cmd" and "30 7 * * 5 cmd"
+    # are merged into "30 7 * * 1,3,5 cmd"
+    result = cronpi.compact()
+    print(result.removed, result.added)
+    """
+    return __cron.compact(user)
+
+
+def stats(cmd, history=None):
+    """
+    get the statistics of the runs of a command installed with ".track()".
+    They are read from a summary kept up to date by every run, without
+    reading the whole run history.
+
+    parameters
+    ---------------
+    cmd: string
+        command of the job
+
+    history: string
+        run history file given to ".track()", if any.
+
+    Return
+    ----------
+    stats: JobStats
+        count, failures, mean, min, max, p50, p95 and p99 durations in
+        seconds, last_start, last_exit_code and max_rss in bytes
+
+    Usage
+    ----------
+    cronpi.run_every_day("/some/command").track().on("7:30")
+    print(cronpi.stats("/some/command").p95)
+    """
+    return __history.stats(cmd, history)
@@ -0,0 +1,209 @@
+"""
+asyncio version of the cronpi api.
+
+Every function returns a coroutine. Deploys awaited at the same time for
+the same crontab are coalesced into a single read and a single write.
+
+Usage
+----------
+import cronpi.aio
+
+await cronpi.aio.run_every_day("/some/command").on("5:30pm")
+await asyncio.gather(*[cronpi.aio.deploy(line, False) for line in lines])
+jobs = await cronpi.aio.get_job_list()
+"""
+import asyncio
+import functools
+import weakref
+from datetime import datetime
+
+from cronpi import cron
+from cronpi.app import App
+from cronpi.document import EXPIRES_ATTRIBUTE, CrontabDocument
+from cronpi.validator import validate_crontab_content
+
+
+class AsyncApp(App):
+    """
+    Job builder whose "on" returns a coroutine.
+    """
+    __slots__ = ()
+
+    def deploy(self, content):
+        return deploy(self.annotate(content), self.overwrite, self.user)
+
+    def deploy_spread(self, content, spread=0, jitter=False):
+        if not spread:
+            return self.deploy(content)
+        return self.__deploy_spread(content, spread, jitter)
+
+    async def __deploy_spread(self, content, spread, jitter):
+        placement = self.get_placement(content, spread, jitter, await self.planned_content())
+        await self.deploy(placement.content)
+        return placement
+
+    async def planned_content(self):
+        """
+        installed crontab the jobs are spread against, read without
+        blocking the event loop.
+        """
+        return await _read(cron.get_backend(self.user))
+
+
+def run_every_day(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_every_day, "on" has to be awaited.
+    """
+    return AsyncApp(1).set_command(cmd, isOverwrite, user)
+
+
+def run_every_week(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_every_week, "on" has to be awaited.
+    """
+    return AsyncApp(2).set_command(cmd, isOverwrite, user)
+
+
+def run_every_month(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_every_month, "on" has to be awaited.
+    """
+    return AsyncApp(3).set_command(cmd, isOverwrite, user)
+
+
+def run_every_year(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_every_year, "on" has to be awaited.
+    """
+    return AsyncApp(4).set_command(cmd, isOverwrite, user)
+
+
+def run_by_date(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_by_date, "on" has to be awaited.
+    """
+    return AsyncApp(5).set_command(cmd, isOverwrite, user)
+
+
+def run_every_seconds(cmd, isOverwrite=False, user=None):
+    """
+    same as cronpi.run_every_seconds, "on" has to be awaited.
+    """
+    return AsyncApp(7).set_command(cmd, isOverwrite, user)
+
+
+def run_custom(cmd, isOverwrite=False, tags=None, user=None, track=False,
+               max_concurrency=None, on_overlap="skip", max_parallel=None, group=None,
+               profile=None):
+    """
+    same as cronpi.run_custom, has to be awaited.
+    """
+    return AsyncApp.custom(cmd, isOverwrite, tags, user, track, max_concurrency, on_overlap,
+                           max_parallel, group, profile).on(None)
+
+
+async def deploy(content, isOverwrite=False, user=None):
+    """
+    same as cron.deploy without blocking the event loop.
+    Deploys awaited concurrently for the same crontab are merged and
+    installed with a single write.
+    """
+    validate_crontab_content(content)
+    backend = cron.get_backend(user)
+    return await _get_coalescer(backend).submit(content, isOverwrite)
+
+
+async def get_job_list(user=None):
+    """
+    same as cronpi.get_job_list without blocking the event loop.
+    """
+    installed_content = await _read(cron.get_backend(user))
+    return installed_content.rstrip("\n").split("\n")
+
+
+class _Coalescer:
+    """
+    Queue of deploys waiting for the same crontab.
+    Deploys submitted while a write is in progress form the next batch.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.pending = []
+        self.task = None
+
+    def submit(self, content, isOverwrite):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((content, isOverwrite, future))
+        if self.task is None:
+            self.task = loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        try:
+            while self.pending:
+                # let every deploy awaited in this iteration join the batch
+                await asyncio.sleep(0)
+                jobs, self.pending = self.pending, []
+                try:
+                    await _apply(self.backend, jobs)
+                except Exception as e:
+                    for _, _, future in jobs:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for _, _, future in jobs:
+                        if not future.done():
+                            future.set_result(True)
+        finally:
+            self.task = None
+
+
+# coalescers of each event loop, dropped with the loop
+_coalescers = weakref.WeakKeyDictionary()
+
+
+def _get_coalescer(backend):
+    loop = asyncio.get_running_loop()
+    coalescers = _coalescers.get(loop)
+    if coalescers is None:
+        coalescers = _coalescers[loop] = {}
+    coalescer = coalescers.get(backend)
+    if coalescer is None:
+        coalescer = coalescers[backend] = _Coalescer(backend)
+    return coalescer
+
+
+async def _apply(backend, jobs):
+    """
+    install jobs with one read and at most one write, with
+    cron._update_content run in an executor thread, under the same locks
+    as cron.deploy.
+    """
+    cancelled = []
+
+    def update(installed_content):
+        if cancelled:
+            # the deploys are not awaited any more, nothing is installed
+            return installed_content
+        document = CrontabDocument.parse(installed_content)
+        if any(EXPIRES_ATTRIBUTE in content for content, _, _ in jobs):
+            document.discard(document.expired(datetime.now()))
+        for content, isOverwrite, _ in jobs:
+            document.apply(content, isOverwrite)
+        return document.serialize()
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, functools.partial(
+            cron._update_content, update, backend=backend))
+    except asyncio.CancelledError:
+        # the executor thread still waits for the locks and updates the
+        # crontab, releasing them itself
+        cancelled.append(True)
+        raise
+
+
+async def _read(backend):
+    return await asyncio.get_running_loop().run_in_executor(
+        None, cron._get_installed_content, backend)
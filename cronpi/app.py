@@ -1,84 +1,361 @@
-import re
-from datetime import datetime
-from cronpi import cron, validator
-
-class App:
-    def __init__(self):
-        self.__cmd = ""
-        self.__overwrite = False
-        self.type = 0
-
-    def set_command(self, command, overwrite):
-        self.__cmd, self.__overwrite = validator.validate_command(
-            command, overwrite)
-        return self
-
-    def deploy_daily(self, job_time):
-        dt = validator.get_time(job_time)
-        crontab_command = "{} {} * * * {}".format(
-            dt[1], dt[0], self.__cmd)
-        return cron.deploy(crontab_command, self.__overwrite)
-
-    def deploy_by_weekday(self, job_time, target_day):
-        dt = validator.get_time(job_time)
-        weekdays = validator.get_week_days(target_day)
-
-        crontab_command = "{} {} * * {} {}".format(
-            dt[1], dt[0], weekdays, self.__cmd)
-        return cron.deploy(crontab_command, self.__overwrite)
-
-    def deploy_by_month_day(self, job_time, target_day):
-        dt = validator.get_time(job_time)
-        days = validator.get_month_days(target_day)
-
-        crontab_command = "{} {} {} * * {}".format(
-            dt[1], dt[0], days, self.__cmd)
-        return cron.deploy(crontab_command, self.__overwrite)
-
-    def deploy_by_month_name(self, job_time, target_day, target_month):
-        dt = validator.get_time(job_time)
-        days = validator.get_month_days(target_day)
-        months = validator.get_months(target_month)
-        crontab_command = "{} {} {} {} * {}".format(
-            dt[1], dt[0], days, months, self.__cmd)
-        return cron.deploy(crontab_command, self.__overwrite)
-
-    def deploy_by_date(self, job_time):
-        month, day, hour, minute = validator.get_time_once(job_time)
-        crontab_command = "{} {} {} {} * {}".format(
-            minute, hour, day, month, self.__cmd)
-        return cron.deploy(crontab_command, self.__overwrite)
-
-    def deploy_like_crontab_command(self):
-        return cron.deploy(self.__cmd, self.__overwrite)
-
-    def on(self, arg, **kwargs):
-        """
-        Time to deploy the cronjob.
-        """
-        if self.type == 1:
-            return self.deploy_daily(arg)
-
-        if self.type == 2:
-            return self.deploy_by_weekday(kwargs.get("time", ""), arg)
-
-        if self.type == 3:
-            return self.deploy_by_month_day(kwargs.get("time", ""), arg)
-
-        if self.type == 4:
-            return self.deploy_by_month_name(kwargs.get("time", ""), kwargs.get("day", ""), arg)
-
-        if self.type == 5:
-            return self.deploy_by_date(arg)
-
-        if self.type == 6:
-            return self.deploy_like_crontab_command()
-
-    def get_job_list(self):
-        """
-        get the cron job list of current user
-        """
-        return cron._get_installed_content()
-
-
-cronpiObj = App()
\ No newline at end of file
+from datetime import timedelta
+
+from cronpi import cron, validator
+from cronpi.document import command_key
+from cronpi.entry import annotate, format_expires, get_expires, split_annotation
+from cronpi.placement import place
+from cronpi.resources import get_options as get_resource_options
+from cronpi.wrapper import wrap
+
+class App(object):
+    """
+    Immutable job builder returned by the "run_*" functions.
+    Every call creates a new object, so builders can be used from several
+    threads at once without sharing any state.
+    """
+    __slots__ = ("type", "__cmd", "__overwrite", "__tags", "__user", "__runner")
+
+    def __init__(self, type=0, command="", overwrite=False, tags=(), user=None, runner=()):
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "_App__cmd", command)
+        object.__setattr__(self, "_App__overwrite", overwrite)
+        object.__setattr__(self, "_App__tags", tags)
+        object.__setattr__(self, "_App__user", user)
+        object.__setattr__(self, "_App__runner", runner)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(self.__class__.__name__))
+
+    @property
+    def command(self):
+        return self.__cmd
+
+    @property
+    def overwrite(self):
+        return self.__overwrite
+
+    @property
+    def tags(self):
+        return self.__tags
+
+    @property
+    def user(self):
+        return self.__user
+
+    @property
+    def runner(self):
+        """
+        options of the cronpi runner the jobs are installed behind, as
+        (name, value) pairs. Empty if they are installed as they are.
+        """
+        return self.__runner
+
+    @classmethod
+    def custom(cls, cmd, isOverwrite=False, tags=None, user=None, track=False,
+               max_concurrency=None, on_overlap="skip", max_parallel=None, group=None,
+               profile=None):
+        """
+        get a builder of custom jobs with the options of "run_custom".
+        """
+        app = cls(6).set_command(cmd, isOverwrite, user)
+        if tags:
+            app = app.tag(*validator.validate_tags(tags))
+        if track:
+            app = app.track()
+        if max_concurrency is not None or max_parallel is not None:
+            app = app.limit(max_concurrency, on_overlap, max_parallel, group)
+        if profile is not None:
+            app = app.resources(profile)
+        return app
+
+    def set_command(self, command, overwrite, user=None):
+        """
+        get a new builder of same type for the given command, installed
+        into the crontab of user if given.
+        """
+        cmd, overwrite = validator.validate_command(command, overwrite)
+        user = validator.validate_user(user)
+        return self.__class__(self.type, cmd, overwrite, self.__tags, user, self.__runner)
+
+    def tag(self, *tags):
+        """
+        get a new builder whose jobs are installed with the given tags,
+        which can be used to find and remove them later.
+
+        Usage
+        ----------
+        cronpi.run_every_day("/some/command").tag("web", "backup").on("7:30")
+        cronpi.remove_where(tag="web")
+        """
+        tags = validator.validate_tags(list(tags))
+        return self.__class__(self.type, self.__cmd, self.__overwrite, tags, self.__user,
+                              self.__runner)
+
+    def track(self, history=None):
+        """
+        get a new builder whose jobs are installed behind the cronpi
+        runner, which stores the duration, exit status and peak memory of
+        every run. See cronpi.stats.
+
+        Parameters
+        ----------
+        history: string
+            run history file. Default is "~/.cronpi/history.sqlite3" of
+            the user running the job.
+        """
+        options = {"track": True}
+        if history is not None:
+            options["history"] = validator.validate_path(history)
+        return self.with_runner(**options)
+
+    def limit(self, max_concurrency=1, on_overlap="skip", max_parallel=None, group=None):
+        """
+        get a new builder whose jobs are installed behind the cronpi
+        runner, which keeps them from piling up when a run lasts longer
+        than the time between two runs.
+
+        Parameters
+        ----------
+        max_concurrency: int
+            most copies of the command running at once. Default value is 1.
+
+        on_overlap: string
+            when max_concurrency copies are running, "skip" the new run,
+            "queue" it until one of them ends (a single run waits, the next
+            ones are skipped) or "kill" the oldest one. Default is "skip".
+
+        max_parallel: int
+            most jobs of the group of the user running at once, runs wait
+            for their turn unless on_overlap is "skip".
+
+        group: string
+            group of max_parallel. Default is "default".
+
+        Usage
+        ----------
+        cronpi.run_every_day("/some/command").limit(on_overlap="queue").on("7:30")
+        """
+        max_concurrency, on_overlap, max_parallel, group = validator.validate_limits(
+            max_concurrency, on_overlap, max_parallel, group)
+        return self.with_runner(
+            max_concurrency=max_concurrency, max_parallel=max_parallel, group=group,
+            on_overlap=on_overlap if on_overlap != "skip" else None)
+
+    def resources(self, profile=None, priority=None, io_class=None, cpus=None,
+                  memory_limit=None):
+        """
+        get a new builder whose jobs are installed behind the cronpi
+        runner, which starts them with the given CPU and I/O priority, CPU
+        affinity and memory limit, so that they do not slow down the other
+        services of the host. See cronpi.resources.
+
+        Parameters
+        ----------
+        profile: string
+            "background" (lowest CPU priority, idle I/O class) or "batch"
+            (low CPU priority, best-effort I/O class). Other options
+            override the ones of the profile.
+
+        priority: string or int
+            "normal", "low", "background" or niceness from -20 to 19
+
+        io_class: string
+            "realtime", "best-effort" or "idle"
+
+        cpus: int or list
+            CPUs the job may run on, eg. [2, 3]
+
+        memory_limit: int or string
+            address space limit of each process of the job, in bytes or
+            like "512M" or "2G"
+
+        Usage
+        ----------
+        cronpi.run_every_day("/some/command").resources("background", cpus=[3]).on("2:00")
+        """
+        return self.with_runner(**get_resource_options(
+            profile, priority, io_class, cpus, memory_limit))
+
+    def with_runner(self, **options):
+        """
+        get a new builder with the given runner options set.
+        """
+        runner = dict(self.__runner)
+        runner.update(options)
+        runner = tuple(sorted(item for item in runner.items() if item[1] is not None))
+        return self.__class__(self.type, self.__cmd, self.__overwrite, self.__tags, self.__user,
+                              runner)
+
+    def annotate(self, content):
+        """
+        crontab content put behind the runner, if there are runner
+        options, with the annotation of the tags, if any.
+        """
+        if self.__runner:
+            content = wrap(content, dict(self.__runner))
+        if not self.__tags:
+            return content
+        return annotate(content, tags=self.__tags)
+
+    def build_daily(self, job_time):
+        dt = validator.get_time(job_time)
+        return "{} {} * * * {}".format(
+            dt[1], dt[0], self.__cmd)
+
+    def build_by_weekday(self, job_time, target_day):
+        dt = validator.get_time(job_time)
+        weekdays = validator.get_week_days(target_day)
+
+        return "{} {} * * {} {}".format(
+            dt[1], dt[0], weekdays, self.__cmd)
+
+    def build_by_month_day(self, job_time, target_day):
+        dt = validator.get_time(job_time)
+        days = validator.get_month_days(target_day)
+
+        return "{} {} {} * * {}".format(
+            dt[1], dt[0], days, self.__cmd)
+
+    def build_by_month_name(self, job_time, target_day, target_month):
+        dt = validator.get_time(job_time)
+        days = validator.get_month_days(target_day)
+        months = validator.get_months(target_month)
+        return "{} {} {} {} * {}".format(
+            dt[1], dt[0], days, months, self.__cmd)
+
+    def build_by_date(self, job_time):
+        month, day, hour, minute = validator.get_time_once(job_time)
+        # the line would fire again every year, the annotation lets
+        # cronpi.gc remove it once it has run
+        expires = validator.get_datetime_once(job_time) + timedelta(minutes=1)
+        return annotate("{} {} {} {} * {}".format(
+            minute, hour, day, month, self.__cmd), expires=format_expires(expires))
+
+    def build_like_crontab_command(self):
+        return self.__cmd
+
+    def build_every_seconds(self):
+        return "* * * * * {}".format(self.__cmd)
+
+    def deploy_daily(self, job_time, spread=0, jitter=False):
+        return self.deploy_spread(self.build_daily(job_time), spread, jitter)
+
+    def deploy_by_weekday(self, job_time, target_day, spread=0, jitter=False):
+        return self.deploy_spread(
+            self.build_by_weekday(job_time, target_day), spread, jitter)
+
+    def deploy_by_month_day(self, job_time, target_day, spread=0, jitter=False):
+        return self.deploy_spread(
+            self.build_by_month_day(job_time, target_day), spread, jitter)
+
+    def deploy_by_month_name(self, job_time, target_day, target_month,
+                             spread=0, jitter=False):
+        return self.deploy_spread(
+            self.build_by_month_name(job_time, target_day, target_month),
+            spread, jitter)
+
+    def deploy_by_date(self, job_time, spread=0, jitter=False):
+        return self.deploy_spread(self.build_by_date(job_time), spread, jitter)
+
+    def deploy_like_crontab_command(self, spread=0, jitter=False):
+        return self.deploy_spread(
+            self.build_like_crontab_command(), spread, jitter)
+
+    def deploy_every_seconds(self, seconds):
+        # cron starts the runner every minute, which runs the command
+        # every few seconds, so there is nothing to spread
+        app = self.with_runner(every=validator.validate_seconds(seconds))
+        return app.deploy(app.build_every_seconds())
+
+    def build(self, arg, **kwargs):
+        """
+        Crontab content for the arguments of "on".
+        """
+        if self.type == 1:
+            return self.build_daily(arg)
+
+        if self.type == 2:
+            return self.build_by_weekday(kwargs.get("time", ""), arg)
+
+        if self.type == 3:
+            return self.build_by_month_day(kwargs.get("time", ""), arg)
+
+        if self.type == 4:
+            return self.build_by_month_name(kwargs.get("time", ""), kwargs.get("day", ""), arg)
+
+        if self.type == 5:
+            return self.build_by_date(arg)
+
+        if self.type == 6:
+            return self.build_like_crontab_command()
+
+    def deploy(self, content):
+        """
+        Install a crontab content built by this object.
+        """
+        return cron.deploy(self.annotate(content), self.__overwrite, self.__user)
+
+    def deploy_spread(self, content, spread=0, jitter=False):
+        """
+        Install a crontab content, moved to the least loaded minute of the
+        next spread minutes if spread is given.
+
+        Returns
+        ----------
+        result: bool or Placement
+            Placement with the installed content and the number of jobs
+            running at each minute of the window if spread is given
+        """
+        if not spread:
+            return self.deploy(content)
+        placement = self.get_placement(content, spread, jitter, self.planned_content())
+        return self.placed(self.deploy(placement.content), placement)
+
+    def get_placement(self, content, spread, jitter, planned_content):
+        """
+        Placement of content in the least loaded minute of the next spread
+        minutes of planned_content.
+        """
+        exclude_key = command_key(content) if self.__overwrite else None
+        placement = place(content, spread, jitter, planned_content, exclude_key)
+        expires = get_expires(split_annotation(placement.content)[1])
+        if expires is not None and placement.delay:
+            # a delayed one-shot job expires later too
+            placement = placement._replace(content=annotate(
+                placement.content,
+                expires=format_expires(expires + timedelta(minutes=placement.delay))))
+        return placement
+
+    def placed(self, result, placement):
+        return placement
+
+    def planned_content(self):
+        """
+        crontab content the jobs are spread against.
+        """
+        return cron.get_planned_content(self.__user)
+
+    def on(self, arg, spread=0, jitter=False, **kwargs):
+        """
+        Time to deploy the cronjob.
+
+        If spread is given, the job is delayed up to spread minutes to the
+        minute where the fewest installed jobs run. If jitter is True,
+        hosts break ties differently based on their host name.
+        """
+        if self.type == 7:
+            return self.deploy_every_seconds(arg)
+
+        content = self.build(arg, **kwargs)
+        if content is None:
+            return None
+        return self.deploy_spread(content, spread, jitter)
+
+    def get_job_list(self, user=None):
+        """
+        get the cron job list of current user, or of the given user
+        """
+        return cron.get_installed_content(user=user)
+
+
+cronpiObj = App()
@@ -0,0 +1,248 @@
+import errno
+import getpass
+import io
+import os
+import subprocess
+import tempfile
+
+from cronpi import metrics
+from cronpi.validator import validate_user
+
+try:
+    import pwd
+except ImportError:
+    pwd = None
+
+SPOOL_DIR = "/var/spool/cron/crontabs"
+SPOOL_FILE_MODE = 0o600
+# where the "crontab" binary keeps the files on Debian, RedHat and BSD/Mac
+SYSTEM_SPOOL_DIRS = ("/var/spool/cron/crontabs", "/var/spool/cron", "/var/at/tabs")
+
+
+class CrontabBackend:
+    """
+    Read and install the crontab through the "crontab" binary.
+    The binary is executed directly, without an intermediate shell.
+
+    Parameters
+    ----------
+    user: string
+        If given, manage the crontab of this user with "crontab -u",
+        which usually requires root. Default is the current user.
+    """
+    def __init__(self, user=None):
+        self.user = validate_user(user)
+
+    @property
+    def lock_name(self):
+        """
+        name identifying the crontab for the advisory lock.
+        """
+        return "crontab:{}".format(self.user or getpass.getuser())
+
+    def for_user(self, user):
+        """
+        backend of the same kind managing the crontab of user.
+        """
+        return CrontabBackend(user)
+
+    def command(self, *args):
+        """
+        "crontab" command line with the given arguments, for the user.
+        """
+        if self.user is None:
+            return ["crontab"] + list(args)
+        return ["crontab", "-u", self.user] + list(args or ["-"])
+
+    def stat_key(self):
+        """
+        (mtime, inode, size) of the spool file written by the binary, or
+        None if it can not be stated, eg. without permission on the spool.
+        """
+        user = self.user or getpass.getuser()
+        for directory in SYSTEM_SPOOL_DIRS:
+            key = _stat_key(os.path.join(directory, user))
+            if key is not None:
+                return key
+        return None
+
+    def read(self):
+        """
+        get the current installed crontab.
+
+        Returns
+        ----------
+        installed_content: string
+            crontab content multiline
+        """
+        try:
+            retcode, err, installed_content = _run_shell_cmd(self.command("-l"))
+        except OSError:
+            raise OSError("crontab not supported in your system")
+        if retcode != 0 and b'no crontab for' not in err:
+            raise OSError("crontab not supported in your system")
+        return installed_content.decode("utf-8")
+
+    def write(self, content):
+        """
+        install the given content as the crontab.
+        Raises value error if crontab refuses the content.
+        """
+        retcode, err, out = _run_shell_cmd(self.command(), content)
+        if retcode != 0:
+            raise ValueError(
+                "failed to install crontab, check if crontab is valid ; out={} ; err={}".format(out, err))
+
+
+class SpoolBackend:
+    """
+    Read and write a crontab file directly, without starting any process.
+
+    Parameters
+    ----------
+    path: string
+        crontab file, or a directory holding one crontab file per user
+        like "/var/spool/cron/crontabs". Default is SPOOL_DIR.
+
+    user: string
+        name of the file inside the directory.
+        Default is the current user. If given, path is always treated
+        as a directory, and a file written by root is given to this user.
+
+    Usage
+    ----------
+    cronpi.set_backend(SpoolBackend("/tmp/crontabs"))
+    """
+    def __init__(self, path=None, user=None):
+        validate_user(user)
+        if path is None or user is not None or os.path.isdir(path):
+            path = os.path.join(path or SPOOL_DIR, user or getpass.getuser())
+        self.path = path
+        self.user = user
+
+    @property
+    def lock_name(self):
+        """
+        name identifying the crontab for the advisory lock.
+        """
+        return "spool:{}".format(os.path.abspath(self.path))
+
+    def for_user(self, user):
+        """
+        backend for the file of user in the same directory.
+        """
+        return SpoolBackend(os.path.dirname(os.path.abspath(self.path)), user)
+
+    def stat_key(self):
+        """
+        (mtime, inode, size) of the crontab file, changed by every write.
+        """
+        key = _stat_key(self.path)
+        if key is None and not os.path.exists(self.path):
+            return ()
+        return key
+
+    def read(self):
+        """
+        get the current crontab file content, empty if there is no file.
+        """
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as f:
+                return f.read()
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return ""
+            raise
+
+    def write(self, content):
+        """
+        replace the crontab file atomically with a temporary file and rename.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".cronpi-", dir=directory)
+        try:
+            with io.open(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, SPOOL_FILE_MODE)
+            owner = self.__get_owner()
+            if owner is not None:
+                os.chown(tmp_path, owner, -1)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def __get_owner(self):
+        """
+        uid the file is given to when root writes the crontab of another
+        user, since cron ignores a crontab not owned by its user.
+        None if the file is left as it is created.
+        """
+        if self.user is None or pwd is None or os.geteuid() != 0:
+            return None
+        try:
+            uid = pwd.getpwnam(self.user).pw_uid
+        except KeyError:
+            return None
+        return uid if uid != 0 else None
+
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _run_shell_cmd(cmd, input=None):
+    """
+    run shell command and return the a tuple of the cmd's return code, std
+    error and std out.
+    WARN: DO NOT RUN COMMANDS THAT NEED TO INTERACT WITH STDIN WITHOUT SPECIFY
+    INPUT, (eg cat), IT WILL NEVER TERMINATE.
+
+    Parameters
+    ----------
+    cmd: string or list
+        command to run, a list is executed directly without a shell
+    input: string
+        arguments for given command
+
+    Returns
+    ----------
+    returncode: int
+        code returned by subprocess
+    stderrdata: strings if streams were opened in text mode; otherwise, bytes
+        data from stderr
+    stdoutdata: strings if streams were opened in text mode; otherwise, bytes
+        data from stdout
+    """
+    if not hasattr(os, "setsid"):
+        raise OSError("crontab not supported in your system")
+
+    with metrics.span("exec", cmd=cmd[0] if isinstance(cmd, list) else cmd):
+        return _communicate(cmd, input)
+
+
+def _communicate(cmd, input):
+    shell = not isinstance(cmd, list)
+    if input is not None:
+        p = subprocess.Popen(cmd, shell=shell, stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             close_fds=True, preexec_fn=os.setsid)
+        input = input.encode()
+    else:
+        p = subprocess.Popen(cmd, shell=shell,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             close_fds=True, preexec_fn=os.setsid)
+
+    stdoutdata, stderrdata = p.communicate(input)
+    return p.returncode, stderrdata, stdoutdata
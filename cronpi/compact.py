@@ -0,0 +1,288 @@
+"""
+Compaction of a crontab: jobs running the same command are deduplicated
+and their schedules are merged when they differ in a single field, eg.
+
+    30 7 * * 1 /some/command
+    30 7 * * 3 /some/command
+    30 7 * * 5 /some/command
+
+becomes "30 7 * * 1,3,5 /some/command".
+
+Only jobs with the same command text, annotation included, and the same
+environment variables above them are merged. The runs of every merged
+group are compared with the runs of the original lines for each kind of
+calendar year, and the group is left as it is if they differ.
+"""
+from calendar import isleap
+from collections import namedtuple
+from datetime import date
+
+from cronpi.entry import KIND_ENV, KIND_JOB, KIND_MACRO, iter_entries
+from cronpi.parser import CronSyntaxError, FIELD_RANGES, SCHEDULE_LENGTH, parse_line
+from cronpi.schedule import compile_expression
+
+CompactResult = namedtuple("CompactResult", ["removed", "added"])
+CompactResult.__doc__ = """
+crontab lines removed by the compaction and merged lines added instead.
+Lines left as they are are not listed.
+"""
+
+MINUTE, HOUR, DAY, MONTH, WEEKDAY = range(SCHEDULE_LENGTH)
+# fields tried in this order, weekdays first to merge the common
+# "same time on several days" lines
+MERGE_ORDER = (WEEKDAY, DAY, MONTH, HOUR, MINUTE)
+MINUTES_PER_HOUR = 60
+
+
+class _Schedule(object):
+    """
+    schedule of a job line being merged: field texts and masks, and the
+    position of the first line it comes from.
+    """
+    __slots__ = ("texts", "masks", "stars", "first")
+
+    def __init__(self, texts, masks, stars, first):
+        self.texts = texts
+        self.masks = masks
+        self.stars = stars
+        self.first = first
+
+    def key(self, skip=None):
+        if skip is None:
+            return self.masks + self.stars
+        return self.masks[:skip] + self.masks[skip + 1:] + self.stars
+
+    @property
+    def expression(self):
+        return " ".join(self.texts)
+
+
+def compact_content(content):
+    """
+    Compact a crontab.
+
+    Parameters
+    ----------
+    content: string
+        crontab content multiline
+
+    Returns
+    ----------
+    new_content: string
+        compacted crontab content, lines are kept in installed order and a
+        merged line takes the place of the first line it comes from
+
+    result: CompactResult
+    """
+    lines = []
+    groups = {}
+    macros = set()
+    segment = 0
+    removed = []
+    for entry in iter_entries(content):
+        position = len(lines)
+        lines.append(entry.raw)
+        kind = entry.kind
+        if kind == KIND_ENV:
+            # jobs are not moved across a variable, which they may use
+            segment += 1
+        elif kind == KIND_MACRO:
+            key = (segment, entry.raw.split(None, 1)[0].lower(), entry.command,
+                   tuple(sorted(entry.annotation.items())))
+            if key in macros:
+                removed.append(entry.raw)
+                lines[position] = None
+            macros.add(key)
+        elif kind == KIND_JOB:
+            parts = entry.raw.split(None, SCHEDULE_LENGTH)
+            try:
+                fields = parse_line(entry.raw).fields
+            except CronSyntaxError:
+                continue
+            schedule = _Schedule(
+                tuple(parts[:SCHEDULE_LENGTH]), tuple(field.mask for field in fields),
+                (fields[DAY].star, fields[WEEKDAY].star), position)
+            groups.setdefault((segment, parts[SCHEDULE_LENGTH].rstrip()), []).append(schedule)
+
+    added = []
+    checked = {}
+    for (_, command), schedules in groups.items():
+        if len(schedules) < 2:
+            continue
+        merged = _merge(schedules)
+        if len(merged) == len(schedules):
+            continue
+        if not _same_runs(schedules, merged, checked):
+            continue
+        kept = dict((schedule.first, schedule) for schedule in merged)
+        for schedule in schedules:
+            line = lines[schedule.first]
+            new = kept.get(schedule.first)
+            if new is not None and new.texts == schedule.texts:
+                continue
+            removed.append(line)
+            lines[schedule.first] = None
+            if new is not None:
+                lines[schedule.first] = "{} {}".format(new.expression, command)
+                added.append(lines[schedule.first])
+
+    new_content = "\n".join(line for line in lines if line is not None).strip() + "\n"
+    return new_content, CompactResult(removed, added)
+
+
+def _merge(schedules):
+    """
+    schedules with duplicates removed and schedules differing in a single
+    field merged, until nothing can be merged anymore.
+    """
+    unique = {}
+    for schedule in schedules:
+        unique.setdefault(schedule.key(), schedule)
+    schedules = sorted(unique.values(), key=lambda s: s.first)
+    changed = True
+    while changed and len(schedules) > 1:
+        changed = False
+        for index in MERGE_ORDER:
+            buckets = {}
+            for schedule in schedules:
+                buckets.setdefault(schedule.key(index), []).append(schedule)
+            if len(buckets) == len(schedules):
+                continue
+            merged = []
+            for bucket in buckets.values():
+                if len(bucket) == 1 or not _can_merge(bucket[0], index):
+                    merged += bucket
+                    continue
+                mask = 0
+                for schedule in bucket:
+                    mask |= schedule.masks[index]
+                first = bucket[0]
+                texts = list(first.texts)
+                texts[index] = _field_text(mask, index)
+                masks = list(first.masks)
+                masks[index] = mask
+                merged.append(_Schedule(tuple(texts), tuple(masks), first.stars,
+                                        min(s.first for s in bucket)))
+                changed = True
+            schedules = sorted(merged, key=lambda s: s.first)
+    return schedules
+
+
+def _can_merge(schedule, index):
+    """
+    A day or weekday field starting with "*" changes how cron combines
+    the day and weekday fields, so they are only merged when they are
+    both restricted. The generated text never starts with "*" for them.
+    """
+    if index == DAY:
+        return not schedule.stars[0]
+    if index == WEEKDAY:
+        return not schedule.stars[1]
+    return True
+
+
+def _field_text(mask, index):
+    """
+    shortest of a list, ranges or a step covering the values of mask.
+    """
+    lowest, highest = FIELD_RANGES[index]
+    if index == WEEKDAY:
+        highest = 6
+    values = [value for value in range(lowest, highest + 1) if mask >> value & 1]
+    full = len(values) == highest - lowest + 1
+    if full and index not in (DAY, WEEKDAY):
+        return "*"
+    items = []
+    start = previous = values[0]
+    for value in values[1:] + [None]:
+        if value is not None and value == previous + 1:
+            previous = value
+            continue
+        if previous - start >= 2:
+            items.append("{}-{}".format(start, previous))
+        else:
+            items += [str(v) for v in range(start, previous + 1)]
+        start = previous = value
+    text = ",".join(items)
+    if len(values) >= 3 and not full:
+        step = values[1] - values[0]
+        if step > 1 and all(b - a == step for a, b in zip(values, values[1:])):
+            if index not in (DAY, WEEKDAY) and values[0] == lowest and values[-1] + step > highest:
+                step_text = "*/{}".format(step)
+            else:
+                step_text = "{}-{}/{}".format(values[0], values[-1], step)
+            if len(step_text) < len(text):
+                return step_text
+    return text
+
+
+def _calendar_years():
+    """
+    one year of each of the 14 calendars, found from the weekday of
+    january 1st and whether the year is a leap year.
+    """
+    years = {}
+    year = 2000
+    while len(years) < 14:
+        years.setdefault((date(year, 1, 1).weekday(), isleap(year)), year)
+        year += 1
+    return tuple(sorted(years.values()))
+
+
+CALENDAR_YEARS = _calendar_years()
+
+
+def _same_runs(schedules, merged, checked):
+    """
+    True if both lists of schedules run at the same minutes. The days of
+    every calendar year are given by the schedule engine; as a year runs
+    the same as any other year having the same calendar, comparing the
+    14 calendars covers every year. Results are kept in checked, as many
+    commands often have the same schedules.
+    """
+    key = (tuple(s.key() for s in schedules), tuple(s.key() for s in merged))
+    if key not in checked:
+        before = [_compile(schedule) for schedule in schedules]
+        after = [_compile(schedule) for schedule in merged]
+        checked[key] = all(_runs(before, year) == _runs(after, year)
+                           for year in CALENDAR_YEARS)
+    return checked[key]
+
+
+def _compile(schedule):
+    """
+    (schedule, bitmask of the minutes of the day it runs at)
+    """
+    compiled = compile_expression(schedule.expression)
+    minutes = 0
+    for hour in compiled.hour_list:
+        minutes |= compiled.minutes << (hour * MINUTES_PER_HOUR)
+    return compiled, minutes
+
+
+def _runs(schedules, year):
+    """
+    canonical form of the minutes compiled schedules run at in year:
+    the bitmask of the days of the year by bitmask of the minutes of the
+    day.
+    """
+    # classes of days running at the same minutes of the day
+    classes = []
+    for compiled, minutes in schedules:
+        days = compiled.year_days(year)
+        split = []
+        rest = days
+        for class_days, class_minutes in classes:
+            inside = class_days & days
+            if inside:
+                split.append((inside, class_minutes | minutes))
+            if class_days & ~days:
+                split.append((class_days & ~days, class_minutes))
+            rest &= ~class_days
+        if rest:
+            split.append((rest, minutes))
+        classes = split
+    runs = {}
+    for class_days, class_minutes in classes:
+        runs[class_minutes] = runs.get(class_minutes, 0) | class_days
+    return runs
@@ -1,11 +1,23 @@
-import os
-import subprocess
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
 
-from cronpi.validator import validate_crontab_content
+from cronpi import metrics
+from cronpi.backend import CrontabBackend, _run_shell_cmd
+from cronpi.compact import compact_content
+from cronpi.document import EXPIRES_ATTRIBUTE, CrontabDocument, command_key, content_hash
+from cronpi.entry import ANNOTATION_MARKER, iter_entries, split_annotation
+from cronpi.lock import FileLock, get_lock_path
+from cronpi.validator import validate_crontab_content, validate_user
 
 CMD_INDEX = 5
+ERR_NO_CRITERIA = "at least one of command, predicate, regex, tag or schedule is required."
+ERR_USER_NOT_SUPPORTED = "backend does not support 'user', it has no 'for_user' method."
 
-def deploy(content, isOverwrite):
+def deploy(content, isOverwrite, user=None):
     """
     Install crontab into a system if it's not installed.
     If the cron with same command exists, then it will update that.
@@ -22,6 +34,11 @@ def deploy(content, isOverwrite):
         Otherwise, it will insert as new cron job.
         Default value is False.
 
+    user: string
+        If given, install into the crontab of this user instead of the
+        current one, eg. with "crontab -u". Other functions of this module
+        taking "user" use it the same way.
+
     Usage
     ----------
     1. Run at every minutes (always inserts new job)
@@ -30,16 +47,437 @@ def deploy(content, isOverwrite):
     2. Run at every minutes ( if not found, inserts as new job else updates.)
     cronpi.deploy("* * * * * ls -al /opt", isOverwrite=True)
     """
-    # validate conntent
-    validate_crontab_content(content)
-    # update crontab
-    new_content = _get_updated_content(content, isOverwrite)
-    if new_content is not None:
-        retcode, err, out = _run_shell_cmd("crontab", new_content)
-        if retcode != 0:
-            raise ValueError(
-                "failed to install crontab, check if crontab is valid ; out={} ; err={}".format(out, err))
-    return True
+    metrics.increment("deploys")
+    with _for_user(user), metrics.span("deploy"):
+        # validate conntent
+        with metrics.span("validate"):
+            validate_crontab_content(content)
+        # queue into the running transaction, if any
+        # one-shot jobs also prune the expired ones, so that the crontab
+        # does not grow with every "run_by_date"
+        prune = EXPIRES_ATTRIBUTE in content
+        transaction = _get_current_transaction()
+        if transaction is not None:
+            if prune:
+                transaction.add_removal(_select_expired())
+            transaction.add(content, isOverwrite)
+            return True
+        # update crontab
+        _update_content(
+            lambda installed_content: _merge_content(
+                installed_content, content, isOverwrite, prune))
+        return True
+
+
+SyncResult = namedtuple("SyncResult", ["added", "updated", "removed"])
+
+
+def sync(contents, prune=True, user=None):
+    """
+    Make the installed crontab match the given crontab contents with a
+    single read and at most one write.
+
+    Jobs are matched by command, without their annotation and runner.
+    A command that is not installed is added,
+    a command installed with other schedules is updated in place and, if
+    prune is True, installed commands that are not in contents are removed.
+    Comments and environment lines are never touched.
+    Nothing is written if the crontab is already up to date.
+
+    Parameters
+    ----------
+    contents: list
+        crontab contents that should be installed
+
+    prune: bool
+        If True, remove installed jobs whose command is not in contents.
+        Default value is True.
+
+    Returns
+    ----------
+    result: SyncResult
+        added, updated and removed crontab contents
+
+    Usage
+    ----------
+    cronpi.sync(["30 7 * * * /some/command", "* * * * * /other/command"])
+    """
+    desired = {}
+    for content in contents:
+        validate_crontab_content(content)
+        desired.setdefault(command_key(content), []).append(content)
+
+    results = []
+
+    def update(installed_content):
+        document = CrontabDocument.parse(installed_content)
+        result = SyncResult([], [], [])
+        for key, lines in desired.items():
+            installed = document.lookup(key)
+            if not installed:
+                result.added.extend(lines)
+            elif _normalize_lines(installed) != _normalize_lines(lines):
+                result.updated.extend(lines)
+            else:
+                continue
+            document.replace(key, lines)
+
+        if prune:
+            for key in [k for k in document.keys() if k not in desired]:
+                result.removed.extend(document.remove(key))
+        results.append(result)
+        return document.serialize()
+
+    with _for_user(user):
+        _update_content(update)
+    return results[-1]
+
+
+def find(command=None, predicate=None, regex=None, tag=None, schedule=None, user=None):
+    """
+    Get the installed jobs matching every given criterion.
+
+    Parameters
+    ----------
+    command: string
+        command, compared with single spaces and without annotation
+
+    predicate: callable
+        takes a CronEntry and returns True for the jobs to keep
+
+    regex: string or compiled pattern
+        searched in the command of the jobs
+
+    tag: string
+        tag of the jobs, set in the "# cronpi:" annotation
+
+    schedule: string
+        5 time fields or macro, eg. "30 7 * * *" or "@daily"
+
+    Returns
+    ----------
+    entries: list
+        CronEntry of each matching job
+    """
+    document = CrontabDocument.parse(get_installed_content(user=user))
+    select = _make_select(command, predicate, regex, tag, schedule)
+    return [document.entry(pos) for pos in select(document)]
+
+
+def remove(command, user=None):
+    """
+    Remove every installed job running the given command.
+
+    Returns
+    ----------
+    removed: list
+        crontab lines that have been removed, empty inside a transaction
+        where the removal is queued
+    """
+    return remove_where(command=command, user=user)
+
+
+def remove_where(predicate=None, regex=None, tag=None, schedule=None, command=None,
+                 user=None):
+    """
+    Remove every installed job matching all the given criteria, which
+    are the same as in "find", with a single write.
+
+    Returns
+    ----------
+    removed: list
+        crontab lines that have been removed, empty inside a transaction
+        where the removal is queued
+    """
+    if command is None and predicate is None and regex is None and \
+            tag is None and schedule is None:
+        raise ValueError(ERR_NO_CRITERIA)
+    return _remove(_make_select(command, predicate, regex, tag, schedule), user)
+
+
+def gc(now=None, user=None):
+    """
+    Remove every one-shot job, installed by "run_by_date", whose date has
+    passed, with a single write. Jobs without an "expires" annotation are
+    never removed.
+
+    Parameters
+    ----------
+    now: datetime
+        jobs expiring at or before now are removed. Default is the
+        current time.
+
+    Returns
+    ----------
+    removed: list
+        crontab lines that have been removed, empty inside a transaction
+        where the removal is queued
+    """
+    return _remove(_select_expired(now), user)
+
+
+def compact(user=None):
+    """
+    Remove duplicate jobs and merge the schedules of jobs running the same
+    command when they differ in a single field, eg. "30 7 * * 1" and
+    "30 7 * * 3" into "30 7 * * 1,3", with a single write. The minutes
+    every command runs at are not changed. It is not queued by
+    transactions.
+
+    Returns
+    ----------
+    result: CompactResult
+        removed lines and merged lines added instead
+    """
+    results = []
+
+    def update(installed_content):
+        new_content, result = compact_content(installed_content)
+        results.append(result)
+        return new_content
+
+    with _for_user(user):
+        _update_content(update)
+    return results[-1]
+
+
+def _remove(select, user):
+    """
+    remove the lines whose positions are returned by select(document).
+    """
+    results = []
+
+    def update(installed_content):
+        document = CrontabDocument.parse(installed_content)
+        results.append(document.discard(select(document)))
+        return document.serialize()
+
+    with _for_user(user):
+        transaction = _get_current_transaction()
+        if transaction is not None:
+            transaction.add_removal(select)
+            return []
+        _update_content(update)
+    return results[-1]
+
+
+def _select_expired(now=None):
+    """
+    select function of the expired jobs, at the time it is called if now
+    is not given.
+    """
+    return lambda document: document.expired(now or datetime.now())
+
+
+def _make_select(command, predicate, regex, tag, schedule):
+    """
+    function returning the positions of the matching jobs of a document.
+    The command, tag and schedule are looked up in the indexes and only
+    the lines found there are given to the regex and predicate.
+    """
+    key = None
+    if command is not None:
+        if ANNOTATION_MARKER in command:
+            command = split_annotation(command)[0]
+        key = " ".join(command.split())
+    if schedule is not None:
+        schedule = " ".join(schedule.split())
+    if isinstance(regex, str):
+        regex = re.compile(regex)
+
+    def select(document):
+        positions = document.select(key, tag, schedule)
+        if regex is None and predicate is None:
+            return positions
+        found = []
+        for pos in positions:
+            entry = document.entry(pos)
+            if regex is not None and not regex.search(entry.command):
+                continue
+            if predicate is not None and not predicate(entry):
+                continue
+            found.append(pos)
+        return found
+
+    return select
+
+
+def _normalize_lines(lines):
+    return [" ".join(line.split()) for line in lines]
+
+
+class Transaction:
+    """
+    Collect several crontab contents and install them with a single
+    "crontab -l" read and a single write.
+
+    Every deploy made while the transaction is active is queued instead of
+    being installed. On a clean exit the queued contents are merged into
+    the installed crontab and written once. If the block raises, nothing
+    is written. If the write itself fails, the previously installed
+    crontab is restored.
+
+    Usage
+    ----------
+    with cronpi.transaction():
+        cronpi.run_every_day("/some/command").on("7:30")
+        cronpi.run_custom("* * * * * /other/command")
+    """
+    def __init__(self, user=None):
+        self.__jobs = []
+        self.__depth = 0
+        self.user = user
+        self.lock_name = _get_lock_name(get_backend(user))
+
+    def add(self, content, isOverwrite):
+        """
+        queue a single crontab content, already validated.
+        """
+        self.__jobs.append((content, isOverwrite))
+
+    def add_removal(self, select):
+        """
+        queue the removal of the lines whose positions are returned by
+        select(document), applied in order with the queued contents.
+        """
+        self.__jobs.append((None, select))
+
+    def commit(self):
+        """
+        merge all queued contents into the installed crontab and write it.
+        """
+        jobs, self.__jobs = self.__jobs, []
+        if not jobs:
+            return True
+
+        def update(installed_content):
+            document = CrontabDocument.parse(installed_content)
+            for content, isOverwrite in jobs:
+                if content is None:
+                    document.discard(isOverwrite(document))
+                else:
+                    document.apply(content, isOverwrite)
+            return document.serialize()
+
+        with _for_user(self.user):
+            _update_content(update, restore=True)
+        return True
+
+    def queued(self):
+        """
+        crontab contents queued so far.
+        """
+        return [content for content, _ in self.__jobs if content is not None]
+
+    def rollback(self):
+        """
+        discard all queued contents.
+        """
+        self.__jobs = []
+
+    def __enter__(self):
+        if self.__depth == 0:
+            _push_transaction(self)
+        self.__depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__depth -= 1
+        if self.__depth > 0:
+            return False
+        _pop_transaction(self)
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+_local = threading.local()
+# protects the module state below
+_lock = threading.RLock()
+# serialize read-merge-write cycles of threads in this process, by lock name
+_crontab_locks = {}
+# flock locks shared with other processes, by lock file path
+_file_locks = {}
+# backends returned by "for_user" of the current backend, by user
+_user_backends = {}
+_concurrency = {
+    "use_flock": True,
+    "compare_and_swap": False,
+    "max_retries": 5,
+    "backoff": 0.05,
+}
+_cache_options = {
+    "enabled": True,
+    "ttl": 1.0,
+}
+# cached content of each crontab, by lock name
+_read_cache = {}
+# increased by every invalidation so that a read started before a write
+# is not cached after it
+_cache_generation = [0]
+_contention_stats = {
+    "lock_acquisitions": 0,
+    "lock_wait_seconds": 0.0,
+    "cas_retries": 0,
+    "cas_failures": 0,
+}
+
+
+def transaction(user=None):
+    """
+    Get the transaction running in the current thread for the crontab of
+    user or start a new one.
+    Nested calls join the outermost transaction, which commits on exit.
+    """
+    with _for_user(user):
+        current = _get_current_transaction()
+        if current is not None:
+            return current
+        return Transaction(_get_current_user())
+
+
+def _get_current_transaction():
+    """
+    transaction of the current thread for the crontab being managed.
+    """
+    transactions = getattr(_local, "transactions", None)
+    if not transactions:
+        return None
+    return transactions.get(_get_lock_name(get_backend()))
+
+
+def _push_transaction(transaction):
+    if getattr(_local, "transactions", None) is None:
+        _local.transactions = {}
+    _local.transactions[transaction.lock_name] = transaction
+
+
+def _pop_transaction(transaction):
+    transactions = getattr(_local, "transactions", None) or {}
+    if transactions.get(transaction.lock_name) is transaction:
+        del transactions[transaction.lock_name]
+
+
+@contextmanager
+def _for_user(user):
+    """
+    manage the crontab of user in the current thread inside the block.
+    """
+    if user is None:
+        yield
+        return
+    previous = _get_current_user()
+    _local.user = user
+    try:
+        yield
+    finally:
+        _local.user = previous
+
+
+def _get_current_user():
+    return getattr(_local, "user", None)
 
 
 def _get_command_from_cron(content):
@@ -56,12 +494,7 @@ def _get_command_from_cron(content):
     cmd: string
         command part of the crontab
     """
-    cmd = ""
-    split_command = content.split()
-    if len(split_command) >= CMD_INDEX:
-        for i in range(CMD_INDEX, len(split_command)):
-            cmd += split_command[i].strip()
-    return cmd
+    return command_key(content)
 
 
 def _get_updated_content(content, isOverwrite):
@@ -84,73 +517,371 @@ def _get_updated_content(content, isOverwrite):
     new_content: string
         crontab content after update
     """
-    new_content = ""
-    is_command_exists = False
-    cmd = _get_command_from_cron(content)
-    installed_content = _get_installed_content()
-    installed_content = installed_content.rstrip("\n")
-    for installed_crontab in installed_content.split("\n"):
-        if isOverwrite and _get_command_from_cron(installed_crontab) == cmd:
-            installed_crontab = content
-            is_command_exists = True
-        new_content += "\n%s" % installed_crontab
+    return _merge_content(_get_installed_content(), content, isOverwrite)
+
+
+def _merge_content(installed_content, content, isOverwrite, prune=False):
+    """
+    Merge a single crontab content into the given crontab
+
+    Parameters
+    ----------
+    installed_content: string
+        crontab content multiline
 
-    if not is_command_exists:
-        new_content += "\n%s" % content
+    content: string
+        crontab content got recently
 
-    return new_content.strip() + "\n"
+    isOverwrite: bool
+        same as in "_get_updated_content"
 
+    prune: bool
+        If True, expired one-shot jobs are removed too.
 
-def _get_installed_content():
+    Returns
+    ----------
+    new_content: string
+        crontab content after update
     """
-    get the current installed crontab.
+    document = CrontabDocument.parse(installed_content)
+    if prune:
+        document.discard(document.expired(datetime.now()))
+    document.apply(content, isOverwrite)
+    return document.serialize()
+
+
+def set_backend(backend):
+    """
+    Set the backend used to read and install the crontab.
+
+    Parameters
+    ----------
+    backend: object
+        object having "read()" returning the crontab content and
+        "write(content)" installing it, eg. CrontabBackend or SpoolBackend
+    """
+    global _backend
+    with _lock:
+        _backend = backend
+        _user_backends.clear()
+        _invalidate_cache()
+
+
+def get_backend(user=None):
+    """
+    Get the backend used to read and install the crontab.
+
+    Parameters
+    ----------
+    user: string
+        If given, get the backend of the crontab of this user, made by
+        "for_user" of the backend. Default is the user managed by the
+        current thread, ie. the current user outside of "user=" calls.
+    """
+    if user is None:
+        user = _get_current_user()
+        if user is None:
+            return _backend
+    # every "user=" of the API ends here
+    validate_user(user)
+    backend = _user_backends.get(user)
+    if backend is None:
+        with _lock:
+            for_user = getattr(_backend, "for_user", None)
+            if for_user is None:
+                raise ValueError(ERR_USER_NOT_SUPPORTED)
+            backend = _user_backends.setdefault(user, for_user(user))
+    return backend
+
+
+def _get_lock_name(backend):
+    return getattr(backend, "lock_name", None) or "crontab"
+
+
+def configure_cache(enabled=True, ttl=1.0):
+    """
+    Set how "get_installed_content" caches the crontab.
+
+    The cache is invalidated when the (mtime, inode, size) of the crontab
+    file changes and whenever cronpi writes the crontab. If the backend
+    file can not be stated, the cached content expires after ttl seconds.
+
+    Parameters
+    ----------
+    enabled: bool
+        If False, always read the crontab. Default value is True.
+
+    ttl: float
+        seconds to keep the content when the file can not be stated.
+        Default value is 1.0.
+    """
+    with _lock:
+        _cache_options.update(enabled=enabled, ttl=ttl)
+        _invalidate_cache()
+
+
+def get_installed_content(use_cache=True, user=None):
+    """
+    Get the current installed crontab, from the cache if it is still
+    valid. Meant for listing and lookups; updates always read the crontab.
+    Every crontab, eg. of each user, has its own cache.
 
     Returns
     ----------
     installed_content: string
         crontab content multiline
     """
-    retcode, err, installed_content = _run_shell_cmd("crontab -l")
-    if retcode != 0 and b'no crontab for' not in err:
-        raise OSError("crontab not supported in your system")
-    return installed_content.decode("utf-8")
+    backend = get_backend(user)
+    if not use_cache or not _cache_options["enabled"]:
+        return _get_installed_content(backend)
+
+    name = _get_lock_name(backend)
+    with _lock:
+        cached = _read_cache.get(name)
+        generation = _cache_generation[0]
+    stat_key = getattr(backend, "stat_key", None)
+    key = stat_key() if stat_key is not None else None
+    if cached is not None and cached["backend"] is backend:
+        if key is not None:
+            if key == cached["key"]:
+                return cached["content"]
+        elif cached["key"] is None and \
+                time.time() - cached["time"] < _cache_options["ttl"]:
+            return cached["content"]
+
+    content = _get_installed_content(backend)
+    with _lock:
+        if _cache_generation[0] == generation:
+            _read_cache[name] = dict(
+                backend=backend, key=key, content=content, time=time.time())
+    return content
 
 
-def _run_shell_cmd(cmd, input=None):
+def get_planned_content(user=None):
     """
-    run shell command and return the a tuple of the cmd's return code, std
-    error and std out.
-    WARN: DO NOT RUN COMMANDS THAT NEED TO INTERACT WITH STDIN WITHOUT SPECIFY
-    INPUT, (eg cat), IT WILL NEVER TERMINATE.
+    Get the installed crontab followed by the contents queued in the
+    transaction of current thread, ie. what will be installed on commit.
+    """
+    with _for_user(user):
+        content = get_installed_content()
+        transaction = _get_current_transaction()
+    if transaction is None:
+        return content
+    return "\n".join([content.rstrip("\n")] + transaction.queued())
+
+
+def _invalidate_cache(backend=None):
+    """
+    drop the cached content of backend, or of every crontab.
+    """
+    with _lock:
+        _cache_generation[0] += 1
+        if backend is None:
+            _read_cache.clear()
+        else:
+            _read_cache.pop(_get_lock_name(backend), None)
+
+
+def configure_concurrency(use_flock=True, compare_and_swap=False,
+                          max_retries=5, backoff=0.05):
+    """
+    Set how concurrent read-merge-write cycles are protected.
 
     Parameters
     ----------
-    cmd: string
-        command to run
-    input: string
-        arguments for given command
+    use_flock: bool
+        If True, hold an advisory "flock" lock shared with every cronpi
+        process managing the same crontab. Default value is True.
+
+    compare_and_swap: bool
+        If True, re-read the crontab right before writing and merge again
+        when it has changed since it was read, eg. by "crontab -e".
+        Default value is False.
+
+    max_retries: int
+        number of merges retried in compare_and_swap mode before giving up.
+
+    backoff: float
+        seconds to wait before the first retry, doubled on every retry.
+    """
+    with _lock:
+        _concurrency.update(
+            use_flock=use_flock, compare_and_swap=compare_and_swap,
+            max_retries=max_retries, backoff=backoff)
+
+
+def get_contention_stats():
+    """
+    Get the contention counters of this process.
+
+    Returns
+    ----------
+    stats: dict
+        lock_acquisitions, lock_wait_seconds, cas_retries and cas_failures
+    """
+    with _lock:
+        return dict(_contention_stats)
+
+
+def reset_contention_stats():
+    """
+    Set every contention counter of this process back to zero.
+    """
+    with _lock:
+        _contention_stats.update(
+            lock_acquisitions=0, lock_wait_seconds=0.0,
+            cas_retries=0, cas_failures=0)
+
+
+def _update_content(update, restore=False, backend=None):
+    """
+    Read the crontab, merge it with update and write the result unless it
+    is unchanged, while holding the process and file locks.
+
+    Parameters
+    ----------
+    update: callable
+        takes the installed content and returns the new content.
+        It is called again for every compare-and-swap retry.
+
+    restore: bool
+        If True, re-install the content read when the write fails.
+
+    backend: object
+        backend of the crontab. Default is the one of the user managed
+        by the current thread.
+
+    Returns
+    ----------
+    result: bool
+        True if the crontab has been written
+    """
+    backend = backend or get_backend()
+    with _get_crontab_lock(backend):
+        file_lock = None
+        if _concurrency["use_flock"]:
+            file_lock = _get_file_lock(backend)
+            with metrics.span("lock"):
+                wait = file_lock.acquire()
+            _count_contention(lock_wait_seconds=wait, lock_acquisitions=1)
+        try:
+            retries = 0
+            while True:
+                installed_content = _get_installed_content(backend)
+                with metrics.span("merge"):
+                    new_content = update(installed_content)
+                if not _concurrency["compare_and_swap"] or content_hash(
+                        _get_installed_content(backend)) == content_hash(installed_content):
+                    break
+                if retries >= _concurrency["max_retries"]:
+                    _count_contention(cas_failures=1)
+                    raise OSError("crontab kept changing while it was being updated")
+                time.sleep(_concurrency["backoff"] * (2 ** retries))
+                retries += 1
+                _count_contention(cas_retries=1)
+                metrics.increment("retries")
+
+            try:
+                return _install_if_changed(installed_content, new_content, backend)
+            except Exception:
+                if restore:
+                    _restore_content(installed_content, backend)
+                raise
+        finally:
+            if file_lock is not None:
+                file_lock.release()
+
+
+def _count_contention(**counts):
+    with _lock:
+        for name, value in counts.items():
+            _contention_stats[name] += value
+
+
+def _get_crontab_lock(backend):
+    """
+    lock serializing the threads of this process updating the crontab
+    of backend. Different crontabs, eg. of different users, are updated
+    in parallel.
+    """
+    name = _get_lock_name(backend)
+    crontab_lock = _crontab_locks.get(name)
+    if crontab_lock is None:
+        with _lock:
+            crontab_lock = _crontab_locks.setdefault(name, threading.RLock())
+    return crontab_lock
+
+
+def _get_file_lock(backend):
+    # by path, which changes with the lock directory
+    path = get_lock_path(_get_lock_name(backend))
+    file_lock = _file_locks.get(path)
+    if file_lock is None:
+        with _lock:
+            file_lock = _file_locks.setdefault(path, FileLock(path))
+    return file_lock
+
+
+def _install_if_changed(installed_content, new_content, backend=None):
+    """
+    install new_content unless it has the same hash as installed_content.
+
+    Returns
+    ----------
+    result: bool
+        True if the crontab has been written
+    """
+    if content_hash(installed_content) == content_hash(new_content):
+        metrics.increment("noop_writes")
+        return False
+    _install_content(new_content, backend)
+    return True
+
+
+def _install_content(new_content, backend=None):
+    """
+    install the given content as the crontab of current user.
+    Raises value error if crontab refuses the content.
+    """
+    backend = backend or get_backend()
+    _invalidate_cache(backend)
+    try:
+        with metrics.span("write"):
+            backend.write(new_content)
+    finally:
+        # a read made during the write may have cached the old content
+        _invalidate_cache(backend)
+    if metrics.enabled():
+        metrics.increment("writes")
+        metrics.increment("bytes_written", len(new_content.encode("utf-8")))
+        metrics.set_gauge(
+            "crontab_entries", sum(1 for entry in iter_entries(new_content) if entry.is_job))
+
+
+def _restore_content(installed_content, backend=None):
+    """
+    best effort re-install of a previously read crontab.
+    """
+    backend = backend or get_backend()
+    try:
+        backend.write(installed_content)
+    except Exception:
+        pass
+    _invalidate_cache(backend)
+
+
+def _get_installed_content(backend=None):
+    """
+    get the current installed crontab.
 
     Returns
     ----------
-    returncode: int
-        code returned by subprocess
-    stderrdata: strings if streams were opened in text mode; otherwise, bytes
-        data from stderr
-    stdoutdata: strings if streams were opened in text mode; otherwise, bytes
-        data from stdout
-    """
-    if not hasattr(os, "setsid"):
-        raise OSError("crontab not supported in your system")
-
-    if input is not None:
-        p = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE,
-                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                             close_fds=True, preexec_fn=os.setsid)
-        input = input.encode()
-    else:
-        p = subprocess.Popen(cmd, shell=True,
-                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                             close_fds=True, preexec_fn=os.setsid)
-
-    stdoutdata, stderrdata = p.communicate(input)
-    return p.returncode, stderrdata, stdoutdata
\ No newline at end of file
+    installed_content: string
+        crontab content multiline
+    """
+    metrics.increment("reads")
+    with metrics.span("read"):
+        return (backend or get_backend()).read()
+
+
+_backend = CrontabBackend()
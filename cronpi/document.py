@@ -0,0 +1,288 @@
+import hashlib
+
+from cronpi.entry import ANNOTATION_MARKER, RUNNER_MARKER, CronEntry, split_annotation, split_runner
+
+CMD_INDEX = 5
+EXPIRES_ATTRIBUTE = " expires="
+
+
+def command_key(content):
+    """
+    Get the canonical command key of a single crontab content.
+    Tokens are joined by a single space so that "ls -al" and "l s-al"
+    never collide.
+
+    Parameters
+    ----------
+    content: string
+        single crontab content
+
+    Returns
+    ----------
+    key: string
+        command part of the crontab without the cronpi annotation and
+        runner, empty if it is not a job line
+    """
+    if ANNOTATION_MARKER in content:
+        content = split_annotation(content)[0]
+    split_command = content.split()
+    if not split_command or split_command[0].startswith("#"):
+        return ""
+    if split_command[0].startswith("@"):
+        key = " ".join(split_command[1:])
+    else:
+        key = " ".join(split_command[CMD_INDEX:])
+    if RUNNER_MARKER in key:
+        key = " ".join(split_runner(key)[1].split())
+    return key
+
+
+def normalize_content(content):
+    """
+    Get crontab content in the form "CrontabDocument.serialize" writes it,
+    so that installed and merged contents can be compared.
+    """
+    return content.strip() + "\n"
+
+
+def content_hash(content):
+    """
+    Get the hash of crontab content, ignoring leading and trailing blanks.
+
+    Parameters
+    ----------
+    content: string
+        crontab content multiline
+
+    Returns
+    ----------
+    digest: string
+        sha256 hex digest of the normalized content
+    """
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+
+class CrontabDocument:
+    """
+    In-memory crontab parsed once and indexed by command key.
+
+    Lines are kept in installed order. Removed lines leave a hole so that
+    the positions stored in the index never have to be shifted, which
+    keeps upsert, remove and lookup O(1) per matching line.
+    Indexes by tag and by schedule are built on the first "select" and
+    dropped whenever the document changes.
+
+    Usage
+    ----------
+    doc = CrontabDocument.parse(installed_content)
+    doc.upsert("30 7 * * * /some/command")
+    new_content = doc.serialize()
+    """
+    def __init__(self, lines=None):
+        self.__lines = []
+        self.__index = {}
+        self.__size = 0
+        self.__tags = None
+        self.__schedules = None
+        for line in lines or ():
+            self.append(line)
+
+    @classmethod
+    def parse(cls, content):
+        """
+        build a document from multiline crontab content.
+        """
+        return cls(content.rstrip("\n").split("\n") if content else None)
+
+    def __len__(self):
+        return self.__size
+
+    def __iter__(self):
+        for line in self.__lines:
+            if line is not None:
+                yield line
+
+    def __contains__(self, key):
+        return key in self.__index
+
+    def keys(self):
+        """
+        command keys of the indexed job lines.
+        """
+        return self.__index.keys()
+
+    def lookup(self, key):
+        """
+        get every line installed with the given command key.
+        """
+        return [self.__lines[pos] for pos in self.__index.get(key, ())]
+
+    def append(self, line):
+        """
+        add a line at the end of the document.
+        """
+        key = command_key(line)
+        if key:
+            self.__index.setdefault(key, []).append(len(self.__lines))
+        self.__lines.append(line)
+        self.__size += 1
+        self.__tags = self.__schedules = None
+
+    def upsert(self, line):
+        """
+        replace every line having the same command key with the given
+        line, or append it if the command is not installed yet.
+
+        Returns
+        ----------
+        result: bool
+            True if at least one line was replaced
+        """
+        positions = self.__index.get(command_key(line))
+        if not positions:
+            self.append(line)
+            return False
+        for pos in positions:
+            self.__lines[pos] = line
+        self.__tags = self.__schedules = None
+        return True
+
+    def remove(self, key):
+        """
+        remove every line having the given command key.
+
+        Returns
+        ----------
+        removed: list
+            lines that have been removed
+        """
+        removed = []
+        for pos in self.__index.pop(key, ()):
+            removed.append(self.__lines[pos])
+            self.__lines[pos] = None
+            self.__size -= 1
+        self.__tags = self.__schedules = None
+        return removed
+
+    def replace(self, key, lines):
+        """
+        replace every line having the given command key with the given
+        lines. Lines are put at the positions of the replaced ones, extra
+        positions are removed and extra lines are appended.
+        """
+        positions = self.__index.pop(key, [])
+        self.__tags = self.__schedules = None
+        kept = []
+        for pos, line in zip(positions, lines):
+            self.__lines[pos] = line
+            kept.append(pos)
+        for pos in positions[len(lines):]:
+            self.__lines[pos] = None
+            self.__size -= 1
+        if kept:
+            self.__index[key] = kept
+        for line in lines[len(positions):]:
+            self.append(line)
+
+    def select(self, key=None, tag=None, schedule=None):
+        """
+        positions of the job lines matching every given criterion, found
+        through the indexes, in installed order.
+
+        Parameters
+        ----------
+        key: string
+            command key
+
+        tag: string
+            tag set in the cronpi annotation
+
+        schedule: string
+            5 time fields or macro, eg. "30 7 * * *" or "@daily"
+        """
+        if tag is not None or schedule is not None:
+            self.__build_indexes()
+        found = None
+        for index, value in ((self.__index, key), (self.__tags, tag),
+                             (self.__schedules, schedule)):
+            if value is None:
+                continue
+            positions = set(index.get(value, ()))
+            found = positions if found is None else found & positions
+        if found is None:
+            found = set(pos for positions in self.__index.values() for pos in positions)
+        return sorted(found)
+
+    def entry(self, position):
+        """
+        CronEntry of the line at position.
+        """
+        return CronEntry(position + 1, self.__lines[position])
+
+    def discard(self, positions):
+        """
+        remove the lines at the given positions.
+
+        Returns
+        ----------
+        removed: list
+            lines that have been removed
+        """
+        removed = []
+        for pos in sorted(set(positions)):
+            line = self.__lines[pos]
+            if line is None:
+                continue
+            key = command_key(line)
+            if key:
+                self.__index[key].remove(pos)
+                if not self.__index[key]:
+                    del self.__index[key]
+            removed.append(line)
+            self.__lines[pos] = None
+            self.__size -= 1
+        self.__tags = self.__schedules = None
+        return removed
+
+    def expired(self, now):
+        """
+        positions of the job lines whose "expires" annotation is not after
+        now, in installed order. Only lines having an annotation are split.
+        """
+        found = []
+        for positions in self.__index.values():
+            for pos in positions:
+                if EXPIRES_ATTRIBUTE not in self.__lines[pos]:
+                    continue
+                expires = self.entry(pos).expires
+                if expires is not None and expires <= now:
+                    found.append(pos)
+        return sorted(found)
+
+    def __build_indexes(self):
+        if self.__tags is not None:
+            return
+        tags = {}
+        schedules = {}
+        for positions in self.__index.values():
+            for pos in positions:
+                entry = self.entry(pos)
+                schedules.setdefault(" ".join(entry.schedule), []).append(pos)
+                for tag in entry.tags:
+                    tags.setdefault(tag, []).append(pos)
+        self.__tags, self.__schedules = tags, schedules
+
+    def apply(self, content, isOverwrite):
+        """
+        merge a single crontab content the same way "deploy" does.
+        """
+        if isOverwrite:
+            self.upsert(content)
+        else:
+            self.append(content)
+
+    def serialize(self):
+        """
+        get the document as crontab content multiline.
+        """
+        return "\n".join(self).strip() + "\n"
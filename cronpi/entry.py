@@ -0,0 +1,352 @@
+import re
+import shlex
+from datetime import datetime
+
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
+KIND_JOB = "job"
+KIND_MACRO = "macro"
+KIND_ENV = "env"
+KIND_COMMENT = "comment"
+KIND_BLANK = "blank"
+
+SCHEDULE_LENGTH = 5
+ENV_PATTERN = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*=(.*)$")
+# trailing shell comment holding the attributes cronpi sets on a job, eg.
+# "30 7 * * * /some/command # cronpi: tags=web,db"
+ANNOTATION_MARKER = "# cronpi:"
+TAG_PATTERN = re.compile(r"[A-Za-z0-9_.-]+$")
+# module of the wrapper some jobs are installed behind, eg.
+# "30 7 * * * /usr/bin/python3 -m cronpi.runner --track -- '/some/command'"
+RUNNER_MODULE = "cronpi.runner"
+RUNNER_MARKER = " -m {} ".format(RUNNER_MODULE)
+# time from which a one-shot job will never run again, eg. "expires=2020-10-20T07:31"
+EXPIRES_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def split_annotation(text):
+    """
+    Split the cronpi annotation off a crontab line or command.
+
+    Parameters
+    ----------
+    text: string
+        crontab line or command part of it
+
+    Returns
+    ----------
+    text: string
+        text without the annotation
+
+    annotation: dict
+        attributes of the annotation, empty if there is none
+    """
+    pos = text.rfind(ANNOTATION_MARKER)
+    if pos < 0:
+        return text, {}
+    annotation = {}
+    for item in text[pos + len(ANNOTATION_MARKER):].split():
+        name, _, value = item.partition("=")
+        annotation[name] = value
+    return text[:pos].rstrip(), annotation
+
+
+def annotate(content, **attributes):
+    """
+    Set attributes in the annotation of a crontab line, keeping the
+    attributes it already has. A None value removes the attribute and a
+    list or tuple value is joined with ",".
+
+    Usage
+    ----------
+    annotate("30 7 * * * /some/command", tags=["web", "db"])
+    # "30 7 * * * /some/command # cronpi: tags=web,db"
+    """
+    content, annotation = split_annotation(content.strip())
+    for name, value in attributes.items():
+        if value is None or value == () or value == []:
+            annotation.pop(name, None)
+        elif isinstance(value, (list, tuple)):
+            annotation[name] = ",".join(value)
+        else:
+            annotation[name] = str(value)
+    if not annotation:
+        return content
+    return "{} {} {}".format(content, ANNOTATION_MARKER, " ".join(
+        "{}={}".format(name, annotation[name]) for name in sorted(annotation)))
+
+
+def split_runner(command):
+    """
+    Split the cronpi runner off a command.
+
+    Parameters
+    ----------
+    command: string
+        command part of a crontab line
+
+    Returns
+    ----------
+    args: tuple
+        arguments given to the runner, None if the command is not wrapped
+
+    command: string
+        command run by the runner, or the given command if it is not wrapped
+    """
+    if RUNNER_MARKER not in command:
+        return None, command
+    return _split_runner(command)
+
+
+def _split_runner(command):
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None, command
+    if RUNNER_MODULE not in tokens or "--" not in tokens:
+        return None, command
+    start = tokens.index(RUNNER_MODULE) + 1
+    end = tokens.index("--", start)
+    return tuple(tokens[start:end]), " ".join(tokens[end + 1:])
+
+
+if lru_cache is not None:
+    _split_runner = lru_cache(maxsize=4096)(_split_runner)
+
+
+def get_tags(annotation):
+    """
+    tuple of the tags of an annotation.
+    """
+    return tuple(tag for tag in annotation.get("tags", "").split(",") if tag)
+
+
+def get_expires(annotation):
+    """
+    datetime set in the "expires" attribute of an annotation, None if
+    there is none or it is not valid.
+    """
+    value = annotation.get("expires")
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, EXPIRES_FORMAT)
+    except ValueError:
+        return None
+
+
+def format_expires(dt):
+    """
+    value of the "expires" attribute for a datetime.
+    """
+    return dt.strftime(EXPIRES_FORMAT)
+
+
+class CronEntry(object):
+    """
+    Single line of a crontab.
+
+    Only the line number and the raw text are stored when the entry is
+    created. The kind is found from the first character on first access
+    and the schedule and command are split only when one of them is read.
+
+    Attributes
+    ----------
+    line_number: int
+        1-based line number in the crontab
+
+    raw: string
+        the line as installed
+
+    kind: string
+        one of "job", "macro", "env", "comment" or "blank"
+    """
+    __slots__ = ("line_number", "raw", "_kind", "_fields")
+    _EMPTY = ((), "", {})
+
+    def __init__(self, line_number, raw):
+        self.line_number = line_number
+        self.raw = raw
+        self._kind = None
+        self._fields = None
+
+    def __repr__(self):
+        return "CronEntry({!r}, {!r})".format(self.line_number, self.raw)
+
+    def __str__(self):
+        return self.raw
+
+    @property
+    def kind(self):
+        if self._kind is None:
+            self._kind = _get_kind(self.raw)
+        return self._kind
+
+    @property
+    def is_job(self):
+        """
+        True for schedule and macro lines, which run a command.
+        """
+        return self.kind == KIND_JOB or self.kind == KIND_MACRO
+
+    def _split(self):
+        if self._fields is None:
+            kind = self.kind
+            if kind == KIND_JOB:
+                fields = self.raw.split(None, SCHEDULE_LENGTH)
+                fields += [""] * (SCHEDULE_LENGTH + 1 - len(fields))
+                schedule, command = tuple(fields[:SCHEDULE_LENGTH]), fields[SCHEDULE_LENGTH].strip()
+            elif kind == KIND_MACRO:
+                fields = self.raw.split(None, 1)
+                schedule, command = (fields[0],), fields[1].strip() if len(fields) > 1 else ""
+            else:
+                self._fields = self._EMPTY
+                return self._fields
+            if ANNOTATION_MARKER in command:
+                self._fields = (schedule,) + split_annotation(command)
+            else:
+                self._fields = (schedule, command, {})
+        return self._fields
+
+    @property
+    def schedule(self):
+        """
+        tuple of the 5 time fields, or of the macro like ("@daily",).
+        Empty for lines that are not jobs.
+        """
+        return self._split()[0]
+
+    @property
+    def command(self):
+        """
+        command part of a job line without the cronpi annotation, empty
+        for other lines.
+        """
+        return self._split()[1]
+
+    @property
+    def annotation(self):
+        """
+        attributes of the "# cronpi:" annotation of a job line.
+        """
+        return self._split()[2]
+
+    @property
+    def tags(self):
+        return get_tags(self.annotation)
+
+    @property
+    def expires(self):
+        """
+        datetime from which a one-shot job is expired, None if it has no
+        expiry.
+        """
+        return get_expires(self.annotation)
+
+    @property
+    def runner(self):
+        """
+        arguments of the cronpi runner the command is installed behind,
+        None if it is not wrapped.
+        """
+        return split_runner(self.command)[0]
+
+    @property
+    def key(self):
+        """
+        command with single spaces, without the cronpi runner, same as
+        document.command_key.
+        """
+        return " ".join(split_runner(self.command)[1].split())
+
+    @property
+    def macro(self):
+        return self.schedule[0] if self.kind == KIND_MACRO else None
+
+    @property
+    def minute(self):
+        return self._field(0)
+
+    @property
+    def hour(self):
+        return self._field(1)
+
+    @property
+    def day(self):
+        return self._field(2)
+
+    @property
+    def month(self):
+        return self._field(3)
+
+    @property
+    def weekday(self):
+        return self._field(4)
+
+    def _field(self, index):
+        if self.kind != KIND_JOB:
+            return None
+        return self.schedule[index]
+
+    @property
+    def variable(self):
+        """
+        (name, value) of an environment line, None for other lines.
+        """
+        if self.kind != KIND_ENV:
+            return None
+        m = ENV_PATTERN.match(self.raw)
+        return m.group(1), m.group(2).strip()
+
+
+def _get_kind(line):
+    stripped = line.lstrip()
+    if not stripped:
+        return KIND_BLANK
+    first = stripped[0]
+    if first == "#":
+        return KIND_COMMENT
+    if first == "@":
+        return KIND_MACRO
+    if first.isdigit() or first == "*":
+        return KIND_JOB
+    if ENV_PATTERN.match(line):
+        return KIND_ENV
+    return KIND_JOB
+
+
+def iter_entries(content, kind=None):
+    """
+    Yield a CronEntry for every line of a crontab without splitting the
+    whole content at once.
+
+    Parameters
+    ----------
+    content: string
+        crontab content multiline
+
+    kind: string or tuple
+        only yield entries of the given kinds. Default is every line.
+
+    Usage
+    ----------
+    for entry in iter_entries(content, kind=(KIND_JOB, KIND_MACRO)):
+        print(entry.line_number, entry.schedule, entry.command)
+    """
+    if isinstance(kind, str):
+        kind = (kind,)
+    start = 0
+    line_number = 0
+    length = len(content)
+    while start < length:
+        end = content.find("\n", start)
+        if end < 0:
+            end = length
+        line_number += 1
+        entry = CronEntry(line_number, content[start:end])
+        if kind is None or entry.kind in kind:
+            yield entry
+        start = end + 1
@@ -0,0 +1,190 @@
+"""
+Vectorized evaluation of many schedules over a time window.
+It requires numpy ("pip install cronpi[evaluate]").
+
+Usage
+----------
+from cronpi import evaluate
+
+packed = evaluate.pack(lines_collected_from_all_hosts)
+counts = evaluate.fire_histogram(packed, datetime(2020, 1, 6), minutes=7 * 24 * 60)
+print(counts.argmax(), counts.max())
+"""
+from datetime import datetime, timedelta
+
+from cronpi.schedule import compile_expression
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ERR_NUMPY_NOT_INSTALLED = "numpy is required, install it with 'pip install numpy'."
+MINUTES_PER_DAY = 24 * 60
+
+
+class PackedSchedules(object):
+    """
+    Field bitmasks of many schedules as numpy arrays, one item per
+    schedule, in the same order as the expressions given to "pack".
+
+    Attributes
+    ----------
+    minutes, hours, days, months, weekdays: numpy.ndarray
+        bitmask of each field, bit n is set if value n matches
+
+    and_days: numpy.ndarray
+        True where day and weekday must both match, ie. one of them is "*"
+    """
+    __slots__ = ("minutes", "hours", "days", "months", "weekdays", "and_days")
+
+    def __init__(self, minutes, hours, days, months, weekdays, and_days):
+        self.minutes = minutes
+        self.hours = hours
+        self.days = days
+        self.months = months
+        self.weekdays = weekdays
+        self.and_days = and_days
+
+    def __len__(self):
+        return len(self.minutes)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(ERR_NUMPY_NOT_INSTALLED)
+
+
+def pack(expressions):
+    """
+    Compile schedules and pack their bitmasks into numpy arrays.
+
+    Parameters
+    ----------
+    expressions: iterable
+        schedules or whole crontab lines, like "30 7 * * 1-5 /some/command"
+
+    Returns
+    ----------
+    packed: PackedSchedules
+    """
+    _require_numpy()
+    schedules = [compile_expression(e) for e in expressions]
+    return PackedSchedules(
+        np.array([s.minutes for s in schedules], dtype=np.uint64),
+        np.array([s.hours for s in schedules], dtype=np.uint32),
+        np.array([s.days for s in schedules], dtype=np.uint32),
+        np.array([s.months for s in schedules], dtype=np.uint16),
+        np.array([s.weekdays for s in schedules], dtype=np.uint8),
+        np.array([s.day_star or s.weekday_star for s in schedules], dtype=bool))
+
+
+def _expand(masks, width, dtype):
+    """
+    (schedules x width) matrix of the bits of masks.
+    """
+    shifts = np.arange(width, dtype=masks.dtype)
+    return ((masks[:, None] >> shifts[None, :]) & 1).astype(dtype)
+
+
+def _day_match(packed, day):
+    weekday = (day.weekday() + 1) % 7
+    month = (packed.months >> np.uint16(day.month)) & 1
+    dom = (packed.days >> np.uint32(day.day)) & 1
+    dow = (packed.weekdays >> np.uint8(weekday)) & 1
+    match = np.where(packed.and_days, dom & dow, dom | dow)
+    return (match & month).astype(bool)
+
+
+def _iter_days(start, minutes):
+    """
+    yield (day, first minute of day in window, last minute + 1, offset in window)
+    """
+    start = start.replace(second=0, microsecond=0)
+    first = start.hour * 60 + start.minute
+    day = datetime(start.year, start.month, start.day)
+    offset = 0
+    while offset < minutes:
+        last = min(MINUTES_PER_DAY, first + minutes - offset)
+        yield day, first, last, offset
+        offset += last - first
+        first = 0
+        day += timedelta(days=1)
+
+
+def _as_packed(schedules):
+    if isinstance(schedules, PackedSchedules):
+        return schedules
+    return pack(schedules)
+
+
+def fire_histogram(schedules, start, minutes=7 * MINUTES_PER_DAY):
+    """
+    Count how many schedules run in each minute of a time window.
+
+    For every day, the count of each (hour, minute) is the product of the
+    hour and minute bit matrices of the schedules running that day, so
+    the work is a matrix product per day instead of a loop per schedule.
+
+    Parameters
+    ----------
+    schedules: PackedSchedules or iterable
+        packed schedules or expressions given to "pack"
+
+    start: datetime
+        first minute of the window
+
+    minutes: int
+        length of the window. Default is one week.
+
+    Returns
+    ----------
+    counts: numpy.ndarray
+        number of schedules running at start + i minutes, for each i
+    """
+    _require_numpy()
+    packed = _as_packed(schedules)
+    hours = _expand(packed.hours, 24, np.float64)
+    mins = _expand(packed.minutes, 60, np.float64)
+    counts = np.zeros(minutes, dtype=np.int64)
+    for day, first, last, offset in _iter_days(start, minutes):
+        match = _day_match(packed, day)
+        if not match.any():
+            continue
+        per_day = hours[match].T.dot(mins[match]).reshape(MINUTES_PER_DAY)
+        counts[offset:offset + last - first] = per_day[first:last]
+    return counts
+
+
+def fire_matrix(schedules, start, minutes=60):
+    """
+    Get which schedules run in each minute of a time window.
+
+    Parameters
+    ----------
+    schedules: PackedSchedules or iterable
+        packed schedules or expressions given to "pack"
+
+    start: datetime
+        first minute of the window
+
+    minutes: int
+        length of the window. Default is one hour.
+
+    Returns
+    ----------
+    matrix: numpy.ndarray
+        (schedules x minutes) bool matrix, True if schedule runs at
+        start + column minutes
+    """
+    _require_numpy()
+    packed = _as_packed(schedules)
+    hours = _expand(packed.hours, 24, bool)
+    mins = _expand(packed.minutes, 60, bool)
+    matrix = np.zeros((len(packed), minutes), dtype=bool)
+    for day, first, last, offset in _iter_days(start, minutes):
+        of_day = np.arange(first, last)
+        match = _day_match(packed, day)
+        matrix[:, offset:offset + last - first] = (
+            match[:, None] & hours[:, of_day // 60] & mins[:, of_day % 60])
+    return matrix
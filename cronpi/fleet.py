@@ -0,0 +1,128 @@
+"""
+Apply the same operation to the crontabs of many users in parallel.
+
+Each user is handled by one worker of a bounded thread pool. Crontabs of
+different users are updated in parallel while the updates of a single
+crontab are still serialized by its own locks, so the wall-clock time of
+a re-provision scales with the number of workers.
+
+Usage
+----------
+from cronpi import fleet
+
+result = fleet.deploy(["svc1", "svc2"], ["30 7 * * * /some/command"], isOverwrite=True)
+print(result.results, result.errors)
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from cronpi import cron
+from cronpi.validator import validate_crontab_content, validate_user
+
+WORKERS = 8
+ERR_WORKERS_NOT_VALID = "workers should be integer greater than 0."
+
+FleetResult = namedtuple("FleetResult", ["results", "errors"])
+FleetResult.__doc__ = """
+results and errors of an operation applied to many users.
+results maps each user whose operation succeeded to its result and
+errors maps the others to the exception that was raised.
+"""
+
+
+def map_users(func, users, workers=WORKERS):
+    """
+    Call func(user) for every user in a pool of workers threads.
+
+    Parameters
+    ----------
+    func: callable
+        takes a user name. Functions of cronpi taking "user=" can be
+        called with it, eg. lambda user: cronpi.get_job_list(user=user)
+
+    users: iterable
+        user names, each one is handled once. A user name that is not
+        valid ends up in the errors.
+
+    workers: int
+        number of threads. Default value is 8.
+
+    Returns
+    ----------
+    result: FleetResult
+    """
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError(ERR_WORKERS_NOT_VALID)
+    users = list(dict.fromkeys(users))
+    results = {}
+    errors = {}
+    if not users:
+        return FleetResult(results, errors)
+    with ThreadPoolExecutor(max_workers=min(workers, len(users))) as pool:
+        futures = [(user, pool.submit(_call, func, user)) for user in users]
+        for user, future in futures:
+            try:
+                results[user] = future.result()
+            except Exception as e:
+                errors[user] = e
+    return FleetResult(results, errors)
+
+
+def _call(func, user):
+    validate_user(user)
+    return func(user)
+
+
+def deploy(users, contents, isOverwrite=False, workers=WORKERS):
+    """
+    Install the same crontab contents for every user, with a single write
+    of each crontab.
+
+    Returns
+    ----------
+    result: FleetResult
+        True for each user whose crontab has been updated
+    """
+    contents = list(contents)
+    for content in contents:
+        validate_crontab_content(content)
+
+    def apply(user):
+        with cron.transaction(user):
+            for content in contents:
+                cron.deploy(content, isOverwrite, user)
+        return True
+
+    return map_users(apply, users, workers)
+
+
+def sync(jobs_by_user, prune=True, workers=WORKERS):
+    """
+    Make the crontab of every user match its jobs, like cronpi.sync.
+
+    Parameters
+    ----------
+    jobs_by_user: dict
+        crontab contents that should be installed, by user
+
+    Returns
+    ----------
+    result: FleetResult
+        SyncResult of each user
+    """
+    return map_users(
+        lambda user: cron.sync(jobs_by_user[user], prune, user), jobs_by_user, workers)
+
+
+def get_job_lists(users, workers=WORKERS):
+    """
+    Get the crontab of every user, like cronpi.get_job_list.
+
+    Returns
+    ----------
+    result: FleetResult
+        list of crontab lines of each user
+    """
+    return map_users(
+        lambda user: cron.get_installed_content(user=user).rstrip("\n").split("\n"),
+        users, workers)
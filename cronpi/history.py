@@ -0,0 +1,244 @@
+"""
+Run history of the jobs installed behind the cronpi runner.
+
+Every run is stored in a SQLite file with a single transaction, which
+appends the run and updates the summary of its command: counters, sum of
+durations and a histogram of durations with buckets growing by 2%. The
+statistics of a command, percentiles included, are read from its summary
+and histogram without scanning the runs.
+
+The file is "~/.cronpi/history.sqlite3" unless the "CRONPI_HISTORY"
+environment variable or the "history" argument gives another one.
+"""
+import math
+import os
+import sqlite3
+from collections import namedtuple
+
+ENV_HISTORY = "CRONPI_HISTORY"
+DEFAULT_HISTORY = os.path.join("~", ".cronpi", "history.sqlite3")
+# seconds waited for the lock of the file held by other runs
+TIMEOUT = 30.0
+# durations up to MIN_DURATION seconds are in bucket 0, then each bucket
+# is GROWTH times wider than the previous one
+MIN_DURATION = 0.001
+GROWTH = 1.02
+PERCENTILES = (0.5, 0.95, 0.99)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY, key TEXT NOT NULL, start REAL NOT NULL,"
+    " end REAL NOT NULL, exit_code INTEGER NOT NULL, max_rss INTEGER)",
+    "CREATE INDEX IF NOT EXISTS runs_key ON runs (key, start)",
+    "CREATE TABLE IF NOT EXISTS summary ("
+    " key TEXT PRIMARY KEY, count INTEGER NOT NULL, failures INTEGER NOT NULL,"
+    " total REAL NOT NULL, min REAL, max REAL, last_start REAL,"
+    " last_exit_code INTEGER, max_rss INTEGER)",
+    "CREATE TABLE IF NOT EXISTS durations ("
+    " key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,"
+    " PRIMARY KEY (key, bucket))",
+    "CREATE TABLE IF NOT EXISTS counters ("
+    " key TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL,"
+    " PRIMARY KEY (key, name))",
+)
+# events of the runner counted by command, besides the runs
+COUNTERS = ("skipped", "queued", "killed")
+
+Run = namedtuple("Run", ["key", "start", "end", "exit_code", "max_rss"])
+Run.__doc__ = """
+single run of a job. start and end are unix times, max_rss is the peak
+resident memory of the command in bytes, None if it is not known.
+"""
+
+JobStats = namedtuple("JobStats", [
+    "count", "failures", "mean", "min", "max", "p50", "p95", "p99",
+    "last_start", "last_exit_code", "max_rss", "skipped", "queued", "killed"])
+JobStats.__doc__ = """
+statistics of the runs of a command. Durations are in seconds and the
+percentiles are within 2% of the exact ones. Every value but the counts
+is None until the command has run. skipped, queued and killed count the
+runs started while other copies of the command were running.
+"""
+
+
+def get_history_path(path=None):
+    """
+    path of the history file: path if given, else the "CRONPI_HISTORY"
+    environment variable, else "~/.cronpi/history.sqlite3".
+    """
+    return os.path.abspath(os.path.expanduser(
+        path or os.environ.get(ENV_HISTORY) or DEFAULT_HISTORY))
+
+
+def connect(path=None):
+    """
+    open the history file, creating it if needed.
+    """
+    path = get_history_path(path)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=TIMEOUT)
+    # runs of other jobs keep writing while stats are read
+    connection.execute("PRAGMA journal_mode=WAL")
+    for statement in SCHEMA:
+        connection.execute(statement)
+    return connection
+
+
+def record(runs, path=None):
+    """
+    Store runs and update the summary of their commands, in a single
+    transaction.
+
+    Parameters
+    ----------
+    runs: list
+        Run of each run
+    """
+    connection = connect(path)
+    try:
+        with connection:
+            for run in runs:
+                _record(connection, run)
+    finally:
+        connection.close()
+
+
+def _record(connection, run):
+    duration = max(0.0, run.end - run.start)
+    failed = 1 if run.exit_code != 0 else 0
+    connection.execute(
+        "INSERT INTO runs (key, start, end, exit_code, max_rss) VALUES (?, ?, ?, ?, ?)", run)
+    connection.execute(
+        "INSERT OR IGNORE INTO summary (key, count, failures, total) VALUES (?, 0, 0, 0)",
+        (run.key,))
+    connection.execute(
+        "UPDATE summary SET count = count + 1, failures = failures + ?, total = total + ?,"
+        " min = CASE WHEN min IS NULL OR min > ? THEN ? ELSE min END,"
+        " max = CASE WHEN max IS NULL OR max < ? THEN ? ELSE max END,"
+        " last_start = ?, last_exit_code = ?,"
+        " max_rss = CASE WHEN max_rss IS NULL OR max_rss < ? THEN ? ELSE max_rss END"
+        " WHERE key = ?",
+        (failed, duration, duration, duration, duration, duration, run.start,
+         run.exit_code, run.max_rss, run.max_rss, run.key))
+    bucket = get_bucket(duration)
+    connection.execute(
+        "INSERT OR IGNORE INTO durations (key, bucket, count) VALUES (?, ?, 0)",
+        (run.key, bucket))
+    connection.execute(
+        "UPDATE durations SET count = count + 1 WHERE key = ? AND bucket = ?",
+        (run.key, bucket))
+
+
+def increment(key, name, path=None):
+    """
+    add 1 to a counter of a command, one of COUNTERS.
+    """
+    connection = connect(path)
+    try:
+        with connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO counters (key, name, value) VALUES (?, ?, 0)",
+                (key, name))
+            connection.execute(
+                "UPDATE counters SET value = value + 1 WHERE key = ? AND name = ?",
+                (key, name))
+    finally:
+        connection.close()
+
+
+def get_bucket(duration):
+    """
+    histogram bucket of a duration in seconds.
+    """
+    if duration <= MIN_DURATION:
+        return 0
+    return int(math.ceil(math.log(duration / MIN_DURATION) / math.log(GROWTH)))
+
+
+def get_bucket_value(bucket):
+    """
+    duration in seconds standing for the durations of a bucket, the
+    geometric middle of its bounds.
+    """
+    if bucket == 0:
+        return MIN_DURATION
+    return MIN_DURATION * GROWTH ** (bucket - 0.5)
+
+
+def stats(key, path=None):
+    """
+    Get the statistics of a command from its summary and histogram.
+
+    Parameters
+    ----------
+    key: string
+        command, spaces are normalized like document.command_key
+
+    Returns
+    ----------
+    stats: JobStats
+    """
+    key = " ".join(key.split())
+    if not os.path.exists(get_history_path(path)):
+        return _empty_stats({})
+    connection = connect(path)
+    try:
+        row = connection.execute(
+            "SELECT count, failures, total, min, max, last_start, last_exit_code, max_rss"
+            " FROM summary WHERE key = ?", (key,)).fetchone()
+        counters = dict(connection.execute(
+            "SELECT name, value FROM counters WHERE key = ?", (key,)).fetchall())
+        buckets = connection.execute(
+            "SELECT bucket, count FROM durations WHERE key = ? ORDER BY bucket",
+            (key,)).fetchall()
+    finally:
+        connection.close()
+    if row is None:
+        return _empty_stats(counters)
+    count, failures, total, low, high, last_start, last_exit_code, max_rss = row
+    percentiles = [min(high, max(low, value)) for value in _percentiles(buckets, count)]
+    return JobStats(count, failures, total / count, low, high, *percentiles,
+                    last_start=last_start, last_exit_code=last_exit_code, max_rss=max_rss,
+                    **_get_counters(counters))
+
+
+def _empty_stats(counters):
+    return JobStats(0, 0, *([None] * 9), **_get_counters(counters))
+
+
+def _get_counters(counters):
+    return dict((name, counters.get(name, 0)) for name in COUNTERS)
+
+
+def runs(key, path=None, limit=100):
+    """
+    Get the latest runs of a command, newest first.
+    """
+    key = " ".join(key.split())
+    if not os.path.exists(get_history_path(path)):
+        return []
+    connection = connect(path)
+    try:
+        return [Run(*row) for row in connection.execute(
+            "SELECT key, start, end, exit_code, max_rss FROM runs WHERE key = ?"
+            " ORDER BY start DESC LIMIT ?", (key, limit))]
+    finally:
+        connection.close()
+
+
+def _percentiles(buckets, count):
+    """
+    value of each of PERCENTILES from (bucket, count) pairs in order.
+    """
+    values = []
+    seen = 0
+    targets = iter(PERCENTILES)
+    target = next(targets)
+    for bucket, bucket_count in buckets:
+        seen += bucket_count
+        while target is not None and seen >= target * count:
+            values.append(get_bucket_value(bucket))
+            target = next(targets, None)
+    return values
@@ -0,0 +1,316 @@
+import errno
+import hashlib
+import io
+import os
+import stat
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ENV_LOCK_DIR = "CRONPI_LOCK_DIR"
+DEFAULT_LOCK_DIR = os.path.join("~", ".cronpi", "locks")
+
+ERR_LOCK_DIR_NOT_VALID = ("lock directory {} should be a directory owned by the current user "
+                          "and not writable by others.")
+
+ERR_LOCK_FILE_NOT_VALID = "lock file {} should be a regular file owned by the current user."
+
+_lock_directory = [None]
+_checked_directories = set()
+
+
+def set_lock_directory(path):
+    """
+    Set the directory of the lock files of this process, None for the
+    default. The "CRONPI_LOCK_DIR" environment variable, which is also
+    read by the jobs started by the runner, sets it for every process.
+    """
+    _lock_directory[0] = path
+
+
+def get_lock_directory():
+    """
+    directory of the lock files: the one given to set_lock_directory, else
+    the "CRONPI_LOCK_DIR" environment variable, else "~/.cronpi/locks".
+    Each user has its own directory, root managing the crontab of another
+    user does not create lock files this user can not open.
+    The directory is created if needed and should be owned by the user
+    and not writable by others.
+    """
+    path = _lock_directory[0] or os.environ.get(ENV_LOCK_DIR) or DEFAULT_LOCK_DIR
+    path = os.path.expanduser(path)
+    if path not in _checked_directories:
+        _check_directory(path)
+        _checked_directories.add(path)
+    return path
+
+
+def _check_directory(path):
+    try:
+        os.makedirs(path, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_mode & 0o022 or (
+            hasattr(os, "getuid") and st.st_uid != os.getuid()):
+        raise OSError(ERR_LOCK_DIR_NOT_VALID.format(path))
+
+
+def get_lock_path(name):
+    """
+    Get the path of the advisory lock file shared by every process that
+    manages the crontab identified by name.
+    The file is kept in the lock directory, never next to a spool file,
+    so that cron does not read it as a crontab.
+    """
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(get_lock_directory(), "cronpi-{}.lock".format(digest))
+
+
+class FileLock:
+    """
+    Exclusive "flock" advisory lock on a file.
+    It is a no-op on systems without fcntl.
+    Acquiring it again from the thread holding it only increases a counter,
+    other threads of the process wait like other processes do.
+    The file is removed when the lock is released, so lock files do not
+    pile up.
+
+    Usage
+    ----------
+    with FileLock(get_lock_path("crontab")) as lock:
+        print(lock.wait_time)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.wait_time = 0.0
+        self.__fd = None
+        self.__depth = 0
+        self.__owner = None
+        # held by the thread holding the file lock
+        self.__thread_lock = threading.Lock()
+
+    def acquire(self):
+        """
+        block until the lock is held.
+
+        Returns
+        ----------
+        wait_time: float
+            seconds spent waiting for the lock
+        """
+        if self.__owner == threading.get_ident():
+            self.__depth += 1
+            self.wait_time = 0.0
+            return self.wait_time
+
+        start = time.time()
+        self.__thread_lock.acquire()
+        try:
+            if fcntl is not None:
+                self.__fd = self.__lock(fcntl.LOCK_EX)
+        except Exception:
+            self.__thread_lock.release()
+            raise
+        self.__owner = threading.get_ident()
+        self.__depth = 1
+        self.wait_time = time.time() - start
+        return self.wait_time
+
+    def try_acquire(self):
+        """
+        get the lock if no other process or thread holds it, without
+        waiting.
+
+        Returns
+        ----------
+        result: bool
+            True if the lock is held
+        """
+        if self.__owner == threading.get_ident():
+            self.__depth += 1
+            return True
+        if not self.__thread_lock.acquire(False):
+            return False
+        try:
+            if fcntl is not None:
+                self.__fd = self.__lock(fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            self.__thread_lock.release()
+            return False
+        self.__owner = threading.get_ident()
+        self.__depth = 1
+        self.wait_time = 0.0
+        return True
+
+    def __lock(self, operation):
+        """
+        descriptor of the lock file, locked. A file removed by the previous
+        holder while it was waited for is opened again.
+        """
+        while True:
+            fd = self.__open()
+            try:
+                fcntl.flock(fd, operation)
+                try:
+                    same = os.stat(self.path).st_ino == os.fstat(fd).st_ino
+                except OSError:
+                    same = False
+            except Exception:
+                os.close(fd)
+                raise
+            if same:
+                return fd
+            os.close(fd)
+
+    def write(self, text):
+        """
+        replace the content of the file while the lock is held, eg. with
+        the pid of the holder.
+        """
+        if self.__fd is None:
+            return
+        os.ftruncate(self.__fd, 0)
+        os.lseek(self.__fd, 0, os.SEEK_SET)
+        os.write(self.__fd, text.encode("utf-8"))
+
+    def read(self):
+        """
+        content of the file, written by the holder of the lock.
+        """
+        try:
+            fd = self.__open(os.O_RDONLY)
+        except (IOError, OSError):
+            return ""
+        with io.open(fd, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def __open(self, flags=os.O_RDWR | os.O_CREAT):
+        """
+        descriptor of the lock file, which should be a regular file of the
+        current user. A symbolic link is never followed.
+        """
+        flags |= getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_CLOEXEC", 0)
+        fd = os.open(self.path, flags, 0o600)
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or (
+                hasattr(os, "getuid") and st.st_uid != os.getuid()):
+            os.close(fd)
+            raise OSError(ERR_LOCK_FILE_NOT_VALID.format(self.path))
+        return fd
+
+    def release(self):
+        """
+        release the lock, may be called from another thread than the one
+        which acquired it.
+        """
+        if self.__depth == 0:
+            return
+        self.__depth -= 1
+        if self.__depth > 0:
+            return
+        fd, self.__fd = self.__fd, None
+        self.__owner = None
+        try:
+            if fd is not None:
+                # removed while still locked, the next holder creates it
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(fd)
+        finally:
+            self.__thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+
+class Semaphore:
+    """
+    At most "slots" holders at once, across processes, with one "flock"
+    file per slot.
+
+    Usage
+    ----------
+    semaphore = Semaphore("group:batch", 4)
+    if semaphore.try_acquire():
+        try:
+            ...
+        finally:
+            semaphore.release()
+    """
+    def __init__(self, name, slots):
+        self.name = name
+        self.locks = [FileLock(get_lock_path("{}:{}".format(name, i))) for i in range(slots)]
+        self.held = None
+
+    def try_acquire(self):
+        """
+        get a free slot without waiting.
+
+        Returns
+        ----------
+        result: bool
+            True if a slot is held
+        """
+        for lock in self.locks:
+            if lock.try_acquire():
+                self.held = lock
+                return True
+        return False
+
+    def acquire(self, timeout=None, poll=0.05, max_poll=1.0):
+        """
+        wait for a free slot. With a single slot the lock is waited for
+        directly, else the slots are tried again with a growing delay.
+
+        Returns
+        ----------
+        result: bool
+            False if timeout seconds have passed without a free slot
+        """
+        if timeout is None and len(self.locks) == 1:
+            self.locks[0].acquire()
+            self.held = self.locks[0]
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(poll)
+            poll = min(max_poll, poll * 2)
+        return True
+
+    def release(self):
+        if self.held is not None:
+            lock, self.held = self.held, None
+            # the next holder of the slot writes its own content
+            lock.write("")
+            lock.release()
+
+    def write(self, text):
+        """
+        replace the content of the held slot file.
+        """
+        if self.held is not None:
+            self.held.write(text)
+
+    def holders(self):
+        """
+        content written by the holders of the other slots.
+        """
+        return [lock.read() for lock in self.locks if lock is not self.held]
@@ -0,0 +1,346 @@
+"""
+Import and export of job catalogs (manifests).
+
+A manifest is a list of records, one per crontab line:
+    {"schedule": "30 7 * * mon-fri", "command": "/some/command"}
+    {"schedule": "@daily", "command": "/other/command", "overwrite": false}
+    {"schedule": "0 3 * * *", "command": "/backup", "tags": ["db", "nightly"]}
+    {"schedule": "31 7 20 10 *", "command": "/once",
+     "annotation": {"expires": "2020-10-20T07:32"}}
+    {"line": "*/5 * * * * /third/command"}
+    {"env": "MAILTO", "value": "root"}
+
+"annotation" holds the attributes of the cronpi annotation other than the
+tags. Variables apply to the jobs after them, in manifest order.
+
+Supported formats are NDJSON (".ndjson", ".jsonl"), read and written one
+line at a time, a JSON array (".json") and YAML (".yaml", ".yml"), which
+needs PyYAML. JSON and YAML documents are parsed whole when loading.
+"""
+import io
+import json
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from cronpi import cron
+from cronpi.document import CrontabDocument, command_key
+from cronpi.entry import ENV_PATTERN, KIND_ENV, KIND_JOB, KIND_MACRO, annotate, iter_entries
+from cronpi.validator import validate_crontab_content, validate_tags
+
+try:
+    import yaml
+    # the libyaml bindings are much faster than the pure python ones
+    _YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    _YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+except ImportError:
+    yaml = None
+
+ANNOTATION_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_JSON = "json"
+FORMAT_YAML = "yaml"
+FORMATS_BY_EXTENSION = {
+    ".ndjson": FORMAT_NDJSON,
+    ".jsonl": FORMAT_NDJSON,
+    ".json": FORMAT_JSON,
+    ".yaml": FORMAT_YAML,
+    ".yml": FORMAT_YAML,
+}
+
+ERR_FORMAT_NOT_VALID = "manifest format should be one of ndjson, json or yaml."
+ERR_YAML_NOT_INSTALLED = "PyYAML is required for yaml manifests, install it with 'pip install pyyaml'."
+ERR_RECORD_NOT_VALID = "record should have 'line', 'schedule' and 'command' or 'env' and 'value'."
+ERR_ANNOTATION_NOT_VALID = ("'annotation' should be dict of attribute names to values "
+                            "without blanks.")
+ERR_MANIFEST_NOT_VALID = "manifest has {} invalid rows, nothing has been installed."
+
+LoadResult = namedtuple("LoadResult", ["added", "updated", "errors"])
+RowError = namedtuple("RowError", ["row", "message"])
+
+
+class ManifestError(ValueError):
+    """
+    Raised when rows of a manifest are not valid.
+
+    Attributes
+    ----------
+    errors: list
+        RowError of each invalid row, with its 1-based row number
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [ERR_MANIFEST_NOT_VALID.format(len(errors))]
+        lines += ["row {}: {}".format(e.row, e.message) for e in errors[:10]]
+        if len(errors) > 10:
+            lines.append("...")
+        ValueError.__init__(self, "\n".join(lines))
+
+
+def load_manifest(path, format=None, overwrite=True, skip_invalid=False, user=None):
+    """
+    Install every job of a manifest with a single read and a single write
+    of the crontab.
+
+    Every row is validated first and all errors are collected. If one of
+    them is not valid, nothing is installed unless skip_invalid is True.
+    Inside a transaction, the rows are queued like other deploys.
+
+    Parameters
+    ----------
+    path: string or file object
+        manifest file
+
+    format: string
+        "ndjson", "json" or "yaml". Default is found from the extension.
+
+    overwrite: bool
+        default of the "overwrite" of each row: if True, a job whose
+        command is installed is replaced instead of being added again.
+        Default value is True.
+
+    skip_invalid: bool
+        If True, install the valid rows and return the errors of the
+        others instead of raising. Default value is False.
+
+    user: string
+        If given, install into the crontab of this user.
+
+    Returns
+    ----------
+    result: LoadResult
+        added and updated crontab lines and RowError of invalid rows
+
+    Raises
+    ----------
+    ManifestError
+        if a row is not valid and skip_invalid is False
+    """
+    rows = []
+    errors = []
+    for row, record in enumerate(iter_records(path, format), 1):
+        try:
+            rows.append(_to_line(record, overwrite))
+        except ValueError as e:
+            errors.append(RowError(row, str(e)))
+    if errors and not skip_invalid:
+        raise ManifestError(errors)
+
+    results = []
+
+    def update(installed_content):
+        document = CrontabDocument.parse(installed_content)
+        result = LoadResult([], [], errors)
+        installed_lines = None
+        # once a variable is appended, the jobs after it in the manifest are
+        # moved after it too, so that the variable applies to them
+        in_order = False
+        for line, row_overwrite in rows:
+            if ENV_PATTERN.match(line):
+                # variables have no command, they are only added once
+                if installed_lines is None:
+                    installed_lines = set(document)
+                if line not in installed_lines:
+                    installed_lines.add(line)
+                    document.append(line)
+                    result.added.append(line)
+                    in_order = True
+            elif row_overwrite and in_order:
+                if document.remove(command_key(line)):
+                    result.updated.append(line)
+                else:
+                    result.added.append(line)
+                document.append(line)
+            elif row_overwrite and document.upsert(line):
+                result.updated.append(line)
+            else:
+                if not row_overwrite:
+                    document.append(line)
+                result.added.append(line)
+        results.append(result)
+        return document.serialize()
+
+    with cron._for_user(user):
+        transaction = cron._get_current_transaction()
+        if transaction is not None:
+            for line, row_overwrite in rows:
+                transaction.add(line, row_overwrite)
+            return LoadResult([line for line, _ in rows], [], errors)
+        cron._update_content(update, restore=True)
+    return results[-1]
+
+
+def dump_manifest(path, format=None, user=None):
+    """
+    Write the installed crontab as manifest records, one record at a time.
+    Comments and blank lines are not written.
+
+    Parameters
+    ----------
+    path: string or file object
+        manifest file
+
+    format: string
+        "ndjson", "json" or "yaml". Default is found from the extension.
+
+    user: string
+        If given, dump the crontab of this user.
+
+    Returns
+    ----------
+    count: int
+        number of records written
+    """
+    format = _get_format(path, format)
+    if format == FORMAT_YAML:
+        _require_yaml()
+    count = 0
+    with _open(path, "w") as f:
+        if format == FORMAT_JSON:
+            f.write("[")
+        for record in installed_records(user):
+            if format == FORMAT_NDJSON:
+                f.write(json.dumps(record) + "\n")
+            elif format == FORMAT_JSON:
+                f.write("\n  " if count == 0 else ",\n  ")
+                f.write(json.dumps(record))
+            else:
+                f.write(yaml.dump([record], Dumper=_YamlDumper,
+                                  default_flow_style=False, sort_keys=False))
+            count += 1
+        if format == FORMAT_JSON:
+            f.write("\n]\n")
+    return count
+
+
+def installed_records(user=None):
+    """
+    Yield a record for every job and variable of the installed crontab.
+
+    Usage
+    ----------
+    for record in installed_records():
+        print(record["schedule"], record["command"])
+    """
+    content = cron.get_installed_content(user=user)
+    for entry in iter_entries(content, kind=(KIND_JOB, KIND_MACRO, KIND_ENV)):
+        if entry.kind == KIND_ENV:
+            name, value = entry.variable
+            yield {"env": name, "value": value}
+        else:
+            record = {"schedule": " ".join(entry.schedule), "command": entry.command}
+            if entry.tags:
+                record["tags"] = list(entry.tags)
+            annotation = dict(entry.annotation)
+            annotation.pop("tags", None)
+            if annotation:
+                record["annotation"] = annotation
+            yield record
+
+
+def iter_records(path, format=None):
+    """
+    Yield the records of a manifest. NDJSON manifests are read one line
+    at a time, blank lines are skipped.
+    """
+    format = _get_format(path, format)
+    if format == FORMAT_YAML:
+        _require_yaml()
+    with _open(path, "r") as f:
+        if format == FORMAT_NDJSON:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    # kept as a row so that its error is collected
+                    yield _InvalidRecord(str(e))
+        elif format == FORMAT_JSON:
+            for record in json.load(f):
+                yield record
+        else:
+            for record in yaml.load(f, Loader=_YamlLoader) or ():
+                yield record
+
+
+class _InvalidRecord(object):
+    __slots__ = ("message",)
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _to_line(record, overwrite):
+    """
+    (crontab line, overwrite) of a record, validated.
+    """
+    if isinstance(record, _InvalidRecord):
+        raise ValueError(record.message)
+    if not isinstance(record, dict):
+        raise ValueError(ERR_RECORD_NOT_VALID)
+    row_overwrite = record.get("overwrite", overwrite)
+    if not isinstance(row_overwrite, bool):
+        raise ValueError("'overwrite' should be bool either True or False.")
+    if "env" in record:
+        line = "{}={}".format(record["env"], record.get("value", ""))
+        if not ENV_PATTERN.match(line):
+            raise ValueError(ERR_RECORD_NOT_VALID)
+        return line, False
+    if "line" in record:
+        line = record["line"]
+    elif "schedule" in record and "command" in record:
+        line = "{} {}".format(record["schedule"], record["command"])
+    else:
+        raise ValueError(ERR_RECORD_NOT_VALID)
+    if not isinstance(line, str):
+        raise ValueError(ERR_RECORD_NOT_VALID)
+    validate_crontab_content(line)
+    annotation = record.get("annotation")
+    if annotation:
+        line = annotate(line, **_validate_annotation(annotation))
+    if record.get("tags"):
+        line = annotate(line, tags=validate_tags(record["tags"]))
+    return line.strip(), row_overwrite
+
+
+def _validate_annotation(annotation):
+    if not isinstance(annotation, dict):
+        raise ValueError(ERR_ANNOTATION_NOT_VALID)
+    for name, value in annotation.items():
+        if not isinstance(name, str) or not ANNOTATION_NAME_PATTERN.match(name):
+            raise ValueError(ERR_ANNOTATION_NOT_VALID)
+        if not isinstance(value, str) or not value or len(value.split()) != 1:
+            raise ValueError(ERR_ANNOTATION_NOT_VALID)
+    return annotation
+
+
+def _get_format(path, format):
+    if format is None:
+        name = getattr(path, "name", path)
+        if isinstance(name, str):
+            for extension, found in FORMATS_BY_EXTENSION.items():
+                if name.lower().endswith(extension):
+                    format = found
+                    break
+    if format not in (FORMAT_NDJSON, FORMAT_JSON, FORMAT_YAML):
+        raise ValueError(ERR_FORMAT_NOT_VALID)
+    return format
+
+
+def _require_yaml():
+    if yaml is None:
+        raise ImportError(ERR_YAML_NOT_INSTALLED)
+
+
+@contextmanager
+def _open(path, mode):
+    """
+    open path, or use it as it is if it is already a file object.
+    """
+    if hasattr(path, "read") or hasattr(path, "write"):
+        yield path
+        return
+    with io.open(path, mode, encoding="utf-8") as f:
+        yield f
@@ -0,0 +1,277 @@
+"""
+Instrumentation of the deploy phases.
+
+Every deploy is made of spans named "deploy", "validate", "lock", "read",
+"merge", "write" and "exec" (a "crontab" process). When metrics are
+enabled, the duration of every span is added to a histogram and given to
+the hooks, and counters of deploys, no-op writes, retries and bytes
+written are kept. When disabled, which is the default, a span is a shared
+object doing nothing and counters return right away.
+
+Usage
+----------
+from cronpi import metrics
+
+metrics.enable(hook=lambda span: print(span.name, span.duration, span.parent))
+cronpi.run_every_day("/some/command").on("7:30")
+print(metrics.to_prometheus())
+"""
+import json
+import threading
+import time
+
+# upper bounds in seconds of the span duration histograms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "cronpi_"
+
+COUNTERS = ("deploys", "noop_writes", "writes", "reads", "retries", "bytes_written")
+GAUGES = ("crontab_entries",)
+
+
+class Span(object):
+    """
+    Timed phase of a deploy, given to the hooks when it ends.
+
+    Attributes
+    ----------
+    name: string
+        phase name, eg. "read"
+
+    attributes: dict
+        extra information, eg. the executed command for "exec"
+
+    parent: string
+        name of the enclosing span of the same thread, None if there is none
+
+    duration: float
+        seconds, None until the span ends
+
+    error: bool
+        True if the span ended with an exception
+    """
+    __slots__ = ("name", "attributes", "parent", "start", "duration", "error")
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = None
+        self.duration = None
+        self.error = False
+
+    def __repr__(self):
+        return "Span({!r}, duration={!r})".format(self.name, self.duration)
+
+    def __enter__(self):
+        stack = _get_stack()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.duration = time.perf_counter() - self.start
+        self.error = exc_type is not None
+        _get_stack().pop()
+        _record(self)
+        return False
+
+
+class _NoopSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attributes):
+    """
+    Context manager timing a phase. Does nothing when metrics are disabled.
+
+    Usage
+    ----------
+    with metrics.span("read"):
+        content = backend.read()
+    """
+    if not _state["enabled"]:
+        return _NOOP_SPAN
+    stack = _get_stack()
+    return Span(name, attributes, stack[-1].name if stack else None)
+
+
+def increment(name, value=1):
+    """
+    add value to a counter. Does nothing when metrics are disabled.
+    """
+    if not _state["enabled"]:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """
+    set the current value of a gauge. Does nothing when metrics are disabled.
+    """
+    if not _state["enabled"]:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def enabled():
+    return _state["enabled"]
+
+
+def enable(hook=None):
+    """
+    Start recording spans, counters and gauges.
+
+    Parameters
+    ----------
+    hook: callable
+        If given, added with "add_hook".
+    """
+    if hook is not None:
+        add_hook(hook)
+    _state["enabled"] = True
+
+
+def disable():
+    """
+    Stop recording. Recorded values are kept until "reset".
+    """
+    _state["enabled"] = False
+
+
+def add_hook(hook):
+    """
+    Call hook(span) whenever a span ends, eg. to send it to a tracer.
+    Exceptions raised by hooks are ignored.
+    """
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def reset():
+    """
+    Set every counter, gauge and histogram back to zero.
+    """
+    with _lock:
+        _counters.clear()
+        _counters.update((name, 0) for name in COUNTERS)
+        _gauges.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    """
+    Get the recorded values.
+
+    Returns
+    ----------
+    snapshot: dict
+        "counters" and "gauges" by name and "spans" by span name, each
+        having the count, sum of seconds and cumulative bucket counts
+    """
+    with _lock:
+        spans = {}
+        for name, histogram in _histograms.items():
+            spans[name] = {
+                "count": histogram["count"],
+                "sum": histogram["sum"],
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"],
+                                    _cumulate(histogram["buckets"]))),
+            }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "spans": spans}
+
+
+def to_json():
+    """
+    snapshot as a JSON string.
+    """
+    return json.dumps(snapshot(), sort_keys=True)
+
+
+def to_prometheus():
+    """
+    snapshot in the Prometheus text exposition format.
+    """
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data["counters"].items()):
+        metric = "{}{}_total".format(PREFIX, name)
+        lines.append("# TYPE {} counter".format(metric))
+        lines.append("{} {}".format(metric, value))
+    for name, value in sorted(data["gauges"].items()):
+        metric = PREFIX + name
+        lines.append("# TYPE {} gauge".format(metric))
+        lines.append("{} {}".format(metric, value))
+    metric = PREFIX + "span_duration_seconds"
+    if data["spans"]:
+        lines.append("# TYPE {} histogram".format(metric))
+    for name, histogram in sorted(data["spans"].items()):
+        for bound in [str(b) for b in BUCKETS] + ["+Inf"]:
+            lines.append('{}_bucket{{span="{}",le="{}"}} {}'.format(
+                metric, name, bound, histogram["buckets"][bound]))
+        lines.append('{}_sum{{span="{}"}} {}'.format(metric, name, histogram["sum"]))
+        lines.append('{}_count{{span="{}"}} {}'.format(metric, name, histogram["count"]))
+    return "\n".join(lines) + "\n"
+
+
+def _cumulate(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _record(span):
+    with _lock:
+        histogram = _histograms.get(span.name)
+        if histogram is None:
+            histogram = _histograms[span.name] = {
+                "count": 0, "sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+        histogram["count"] += 1
+        histogram["sum"] += span.duration
+        index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if span.duration <= bound:
+                index = i
+                break
+        histogram["buckets"][index] += 1
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(span)
+        except Exception:
+            pass
+
+
+def _get_stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+_state = {"enabled": False}
+_lock = threading.Lock()
+_local = threading.local()
+_hooks = []
+_counters = dict((name, 0) for name in COUNTERS)
+_gauges = {}
+_histograms = {}
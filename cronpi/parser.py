@@ -0,0 +1,333 @@
+import re
+from collections import namedtuple
+
+SCHEDULE_LENGTH = 5
+FIELD_NAMES = ("minute", "hour", "day", "month", "weekday")
+# (lowest, highest) of minute, hour, day, month and weekday
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+MONTH_NAMES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAY_NAMES = {
+    "sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6,
+}
+# names accepted by the "run_*" builders, which also take full names
+MONTH_LOOKUP = dict(
+    MONTH_NAMES, january=1, february=2, march=3, april=4, june=6, july=7,
+    august=8, september=9, october=10, november=11, december=12)
+WEEKDAY_LOOKUP = dict(
+    WEEKDAY_NAMES, sunday=0, monday=1, tuesday=2, wednesday=3, thursday=4,
+    friday=5, saturday=6)
+FIELD_NAME_TABLES = (None, None, None, MONTH_NAMES, WEEKDAY_NAMES)
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+    "@reboot": None,
+}
+
+TOKEN_PATTERN = re.compile(r"\S+")
+ENV_PATTERN = re.compile(r"\s*[A-Za-z_][A-Za-z0-9_]*\s*=")
+ITEM_PATTERN = re.compile(r"(?:(\*)|(\w+)(?:-(\w+))?)(?:/(\d+))?$")
+
+ERR_MISSING_FIELD = "field is missing"
+ERR_MISSING_COMMAND = "command is missing"
+ERR_UNKNOWN_MACRO = "unknown macro"
+ERR_BAD_SYNTAX = "expected '*', value, range or list"
+ERR_BAD_VALUE = "value is not a number or a name"
+ERR_OUT_OF_RANGE = "value should be between {} and {}"
+ERR_REVERSED_RANGE = "range start is greater than range end"
+ERR_BAD_STEP = "step should be greater than 0"
+ERR_NOT_A_JOB = "line is not a job"
+
+CronField = namedtuple("CronField", ["name", "text", "items", "mask", "star"])
+CronField.__doc__ = """
+Parsed time field.
+items are (start, end, step) tuples, mask has bit n set if value n
+matches and star is True if the field starts with "*".
+Fields are shared between every line having the same field text.
+"""
+
+CronLine = namedtuple("CronLine", ["macro", "fields", "command"])
+CronLine.__doc__ = """
+Parsed crontab line.
+fields are the 5 CronField, expanded from the macro if there is one,
+and empty for "@reboot".
+"""
+
+
+class CronSyntaxError(ValueError):
+    """
+    Error of a crontab line, with the field and 1-based column it is at.
+    """
+    def __init__(self, reason, field=None, text="", column=None, prefix=None,
+                 line_number=None):
+        self.reason = reason
+        self.field = field
+        self.text = text
+        self.column = column
+        self.prefix = prefix
+        self.line_number = line_number
+        message = reason
+        if field is not None:
+            message = "{} field '{}' at column {}: {}".format(field, text, column, reason)
+        elif column is not None:
+            message = "column {}: {}".format(column, reason)
+        if line_number is not None:
+            message = "line {}, {}".format(line_number, message)
+        if prefix:
+            message = "{} {}".format(prefix, message)
+        ValueError.__init__(self, message)
+
+    def with_prefix(self, prefix):
+        """
+        same error whose message starts with prefix.
+        """
+        return CronSyntaxError(self.reason, self.field, self.text, self.column,
+                               prefix, self.line_number)
+
+    def at_line(self, line_number):
+        """
+        same error at the given 1-based line of a crontab.
+        """
+        return CronSyntaxError(self.reason, self.field, self.text, self.column,
+                               self.prefix, line_number)
+
+
+class _FieldError(Exception):
+    pass
+
+
+def _value(token, names, lowest, highest):
+    if token.isdigit():
+        value = int(token)
+    elif names is not None and token.lower() in names:
+        value = names[token.lower()]
+    else:
+        raise _FieldError(ERR_BAD_VALUE)
+    if value < lowest or value > highest:
+        raise _FieldError(ERR_OUT_OF_RANGE.format(lowest, highest))
+    return value
+
+
+def _parse_field(text, index):
+    """
+    CronField of a single field like "1-10/2,15,20".
+    """
+    lowest, highest = FIELD_RANGES[index]
+    names = FIELD_NAME_TABLES[index]
+    items = []
+    mask = 0
+    for item in text.split(","):
+        m = ITEM_PATTERN.match(item)
+        if m is None:
+            raise _FieldError(ERR_BAD_SYNTAX)
+        star, start, end, step = m.groups()
+        step = int(step) if step is not None else 1
+        if step == 0:
+            raise _FieldError(ERR_BAD_STEP)
+        if star is not None:
+            start, end = lowest, highest
+        else:
+            start = _value(start, names, lowest, highest)
+            if end is not None:
+                end = _value(end, names, lowest, highest)
+                if start > end:
+                    raise _FieldError(ERR_REVERSED_RANGE)
+            elif m.group(4) is not None:
+                end = highest
+            else:
+                end = start
+        items.append((start, end, step))
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    # sunday can be written as 0 or 7
+    if index == 4 and mask >> 7 & 1:
+        mask = (mask | 1) & ~(1 << 7)
+    return CronField(FIELD_NAMES[index], text, tuple(items), mask, text.startswith("*"))
+
+
+def _columns(content):
+    return [m.start() + 1 for m in TOKEN_PATTERN.finditer(content)]
+
+
+def _parse_fields(tokens, content):
+    """
+    CronField of each token, from the cache of already parsed texts.
+    """
+    fields = []
+    for index, token in enumerate(tokens):
+        cache = _field_caches[index]
+        field = cache.get(token)
+        if field is None:
+            try:
+                field = _parse_field(token, index)
+            except _FieldError as e:
+                raise CronSyntaxError(
+                    str(e), FIELD_NAMES[index], token, _columns(content)[index])
+            if len(cache) >= FIELD_CACHE_SIZE:
+                cache.clear()
+            cache[token] = field
+        fields.append(field)
+    return tuple(fields)
+
+
+def _expand_macro(macro, column):
+    name = macro.lower()
+    if name not in MACROS:
+        raise CronSyntaxError(ERR_UNKNOWN_MACRO, "macro", macro, column)
+    if MACROS[name] is None:
+        return ()
+    return _parse_fields(MACROS[name].split(), MACROS[name])
+
+
+def parse_line(content):
+    """
+    Parse a single crontab job line in one pass.
+
+    The line is split once and each field text is looked up in a cache
+    of parsed fields, so the fields of a large crontab, which repeat a
+    lot, are parsed only once.
+
+    Parameters
+    ----------
+    content: string
+        single crontab content like "*/5 9-17 * * mon-fri /some/command"
+        or "@daily /some/command"
+
+    Returns
+    ----------
+    line: CronLine
+
+    Raises
+    ----------
+    CronSyntaxError
+        with the name and 1-based column of the field that is not valid
+    """
+    parts = content.split(None, SCHEDULE_LENGTH)
+    if len(parts) > SCHEDULE_LENGTH:
+        caches = _field_caches
+        try:
+            fields = (caches[0][parts[0]], caches[1][parts[1]], caches[2][parts[2]],
+                      caches[3][parts[3]], caches[4][parts[4]])
+        except KeyError:
+            if parts[0][0] in "#@":
+                return _parse_special(content)
+            fields = _parse_fields(parts[:SCHEDULE_LENGTH], content)
+        return CronLine(None, fields, parts[SCHEDULE_LENGTH].rstrip())
+
+    if parts and parts[0][0] in "#@":
+        return _parse_special(content)
+    if len(parts) < SCHEDULE_LENGTH:
+        raise CronSyntaxError(
+            ERR_MISSING_FIELD, FIELD_NAMES[len(parts)], "", len(content) + 1)
+    _parse_fields(parts, content)
+    raise CronSyntaxError(ERR_MISSING_COMMAND, column=len(content.rstrip()) + 1)
+
+
+def _parse_special(content):
+    """
+    parse a macro line or reject a comment.
+    """
+    parts = content.split(None, 1)
+    if parts[0].startswith("#"):
+        raise CronSyntaxError(ERR_NOT_A_JOB, column=content.index("#") + 1)
+    fields = _expand_macro(parts[0], content.index("@") + 1)
+    if len(parts) < 2 or not parts[1].strip():
+        raise CronSyntaxError(ERR_MISSING_COMMAND, column=len(content.rstrip()) + 1)
+    return CronLine(parts[0], fields, parts[1].rstrip())
+
+
+def parse_schedule(expression):
+    """
+    Parse the 5 time fields or the macro of a schedule, without command.
+
+    Returns
+    ----------
+    fields: tuple
+        5 CronField, empty for "@reboot"
+    """
+    tokens = expression.split()
+    if tokens and tokens[0].startswith("@"):
+        return _expand_macro(tokens[0], expression.index("@") + 1)
+    if len(tokens) < SCHEDULE_LENGTH:
+        raise CronSyntaxError(
+            ERR_MISSING_FIELD, FIELD_NAMES[len(tokens)], "", len(expression) + 1)
+    return _parse_fields(tokens[:SCHEDULE_LENGTH], expression)
+
+
+def parse_crontab(content):
+    """
+    Parse every job line of a whole crontab.
+    Blank, comment and environment lines are skipped.
+
+    Parameters
+    ----------
+    content: string
+        crontab content multiline
+
+    Returns
+    ----------
+    lines: list
+        (line_number, CronLine) of each job line
+
+    Raises
+    ----------
+    CronSyntaxError
+        of the first line that is not valid, with its line_number
+    """
+    lines = []
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if _is_job_line(line):
+            try:
+                lines.append((line_number, parse_line(line)))
+            except CronSyntaxError as e:
+                raise e.at_line(line_number)
+    return lines
+
+
+def check_crontab(content):
+    """
+    Same as parse_crontab without building the parsed lines.
+
+    Fields already in the cache are only looked up, so a large crontab,
+    whose fields repeat a lot, is checked at about the cost of splitting
+    its lines.
+
+    Returns
+    ----------
+    count: int
+        number of job lines
+    """
+    minutes, hours, days, months, weekdays = _field_caches
+    count = 0
+    for line_number, line in enumerate(content.splitlines(), 1):
+        parts = line.split(None, SCHEDULE_LENGTH)
+        if len(parts) > SCHEDULE_LENGTH and (
+                parts[0] in minutes and parts[1] in hours and parts[2] in days and
+                parts[3] in months and parts[4] in weekdays):
+            count += 1
+        elif _is_job_line(line):
+            try:
+                parse_line(line)
+            except CronSyntaxError as e:
+                raise e.at_line(line_number)
+            count += 1
+    return count
+
+
+def _is_job_line(line):
+    stripped = line.lstrip()
+    return bool(stripped) and stripped[0] != "#" and ENV_PATTERN.match(line) is None
+
+
+# parsed fields by text, one cache per field
+FIELD_CACHE_SIZE = 4096
+_field_caches = tuple({} for _ in FIELD_NAMES)
@@ -0,0 +1,110 @@
+import hashlib
+import socket
+from collections import namedtuple
+from datetime import datetime
+
+from cronpi.document import command_key
+from cronpi.entry import KIND_JOB, KIND_MACRO, iter_entries
+from cronpi.schedule import compile_expression
+
+MINUTES_PER_DAY = 24 * 60
+ERR_SPREAD_NOT_VALID = "spread should be integer between 0 and 1439."
+ERR_PLACEMENT_NOT_SUPPORTED = "spread needs a job with a single minute and hour."
+
+Placement = namedtuple("Placement", ["content", "delay", "concurrency"])
+
+
+def minute_load(content, schedule=None, exclude_key=None, year=None):
+    """
+    Count the jobs of a crontab running at each minute of a day.
+
+    Parameters
+    ----------
+    content: string
+        crontab content multiline
+
+    schedule: Schedule
+        If given, only count jobs running on at least one same day.
+
+    exclude_key: string
+        command key of jobs not to count, eg. the job being replaced.
+
+    year: int
+        year used to compare days. Default is current year.
+
+    Returns
+    ----------
+    load: list
+        1440 counts, index is hour * 60 + minute
+    """
+    load = [0] * MINUTES_PER_DAY
+    year = year or datetime.now().year
+    days = schedule.year_days(year) if schedule is not None else None
+    for entry in iter_entries(content, kind=(KIND_JOB, KIND_MACRO)):
+        if exclude_key is not None and entry.key == exclude_key:
+            continue
+        try:
+            other = compile_expression(entry.raw)
+        except ValueError:
+            # eg. @reboot, which is not bound to a time
+            continue
+        if days is not None and not days & other.year_days(year):
+            continue
+        for hour in other.hour_list:
+            base = hour * 60
+            for minute in other.minute_list:
+                load[base + minute] += 1
+    return load
+
+
+def place(content, spread, jitter=False, installed_content="", exclude_key=None):
+    """
+    Move a job to the least loaded minute of a window starting at its
+    time, so that jobs written for the same time do not start together.
+
+    Parameters
+    ----------
+    content: string
+        single crontab content with a single minute and hour
+
+    spread: int
+        number of minutes the job may be delayed
+
+    jitter: bool
+        If True, break ties with a hash of the host name and command, so
+        that hosts with the same crontab pick different minutes.
+        Otherwise the earliest least loaded minute is used.
+
+    installed_content: string
+        crontab content the job is compared with
+
+    exclude_key: string
+        command key of installed jobs to ignore, eg. the job overwritten.
+
+    Returns
+    ----------
+    placement: Placement
+        content with the chosen time, delay in minutes and the number of
+        jobs running at each minute ("H:MM") of the window after placing
+    """
+    if not isinstance(spread, int) or spread < 0 or spread >= MINUTES_PER_DAY:
+        raise ValueError(ERR_SPREAD_NOT_VALID)
+    fields = content.split(None, 2)
+    if len(fields) < 3 or not fields[0].isdigit() or not fields[1].isdigit():
+        raise ValueError(ERR_PLACEMENT_NOT_SUPPORTED)
+
+    start = int(fields[1]) * 60 + int(fields[0])
+    # the window never crosses midnight so that the day fields still apply
+    candidates = list(range(start, min(start + spread + 1, MINUTES_PER_DAY)))
+    load = minute_load(installed_content, compile_expression(content), exclude_key)
+    if jitter:
+        seed = "{}:{}".format(socket.gethostname(), command_key(content))
+        shift = int(hashlib.sha1(seed.encode("utf-8")).hexdigest(), 16) % len(candidates)
+        candidates = candidates[shift:] + candidates[:shift]
+
+    best = min(candidates, key=lambda t: load[t])
+    load[best] += 1
+    concurrency = dict(("{}:{:02d}".format(t // 60, t % 60), load[t])
+                       for t in sorted(candidates))
+    new_content = "{} {} {}".format(best % 60, best // 60, fields[2])
+    return Placement(new_content, best - start, concurrency)
@@ -0,0 +1,234 @@
+"""
+Resource classes of jobs installed behind the cronpi runner: CPU priority
+(nice), I/O scheduling class (ioprio), CPU affinity and address space
+limit (RLIMIT_AS). The runner applies them in the child process, between
+"fork" and "exec" of the command, so that they are inherited by every
+process the command starts.
+
+Profiles are named sets of these options:
+
+    background  lowest CPU priority and idle I/O class, the job only gets
+                the CPU and disk time nothing else wants
+    batch       low CPU priority and best-effort I/O class
+
+A limit the system refuses, eg. a negative niceness without root, is
+reported on the standard error of the job, which is still run.
+"""
+import os
+import platform
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PRIORITIES = {"normal": 0, "low": 10, "background": 19}
+IO_CLASSES = ("realtime", "best-effort", "idle")
+PROFILES = {
+    "background": {"priority": "background", "io_class": "idle"},
+    "batch": {"priority": "low", "io_class": "best-effort"},
+}
+MEMORY_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+# ioprio_set(2) has no wrapper in the C library
+IOPRIO_SET = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289,
+              "aarch64": 30, "arm64": 30, "armv7l": 314, "ppc64le": 273, "s390x": 282}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+# level 4 is the default level of the realtime and best-effort classes
+IOPRIO_LEVEL = 4
+
+ERR_PROFILE_NOT_VALID = "profile should be one of 'background' or 'batch'."
+ERR_PRIORITY_NOT_VALID = ("priority should be one of 'normal', 'low', 'background' "
+                          "or integer niceness between -20 and 19.")
+ERR_IO_CLASS_NOT_VALID = "io_class should be one of 'realtime', 'best-effort' or 'idle'."
+ERR_CPUS_NOT_VALID = "cpus should be integer or list of integers greater than or equal to 0."
+ERR_MEMORY_LIMIT_NOT_VALID = ("memory_limit should be integer number of bytes greater than 0 "
+                              "or string like '512M' or '2G'.")
+
+
+def get_options(profile=None, priority=None, io_class=None, cpus=None, memory_limit=None):
+    """
+    Validate resource options and get them as runner options.
+
+    Parameters
+    ----------
+    profile: string
+        name of a profile giving defaults of the other options
+
+    priority: string or int
+        "normal", "low", "background" or niceness from -20 to 19
+
+    io_class: string
+        "realtime", "best-effort" or "idle"
+
+    cpus: int or list
+        CPUs the job may run on
+
+    memory_limit: int or string
+        address space limit in bytes, or with a unit like "512M"
+
+    Returns
+    ----------
+    options: dict
+        "priority" as niceness, "io_class", "cpus" as a sorted tuple and
+        "memory_limit" in bytes. Options not set are None.
+    """
+    if profile is not None:
+        if profile not in PROFILES:
+            raise ValueError(ERR_PROFILE_NOT_VALID)
+        defaults = PROFILES[profile]
+        priority = defaults.get("priority") if priority is None else priority
+        io_class = defaults.get("io_class") if io_class is None else io_class
+    return {
+        "priority": get_niceness(priority),
+        "io_class": _get_io_class(io_class),
+        "cpus": _get_cpus(cpus),
+        "memory_limit": get_memory_limit(memory_limit),
+    }
+
+
+def get_niceness(priority):
+    """
+    niceness of a priority name or niceness.
+    """
+    if priority is None:
+        return None
+    if isinstance(priority, str):
+        if priority not in PRIORITIES:
+            raise ValueError(ERR_PRIORITY_NOT_VALID)
+        return PRIORITIES[priority]
+    if not isinstance(priority, int) or isinstance(priority, bool) or not -20 <= priority <= 19:
+        raise ValueError(ERR_PRIORITY_NOT_VALID)
+    return priority
+
+
+def _get_io_class(io_class):
+    if io_class is not None and io_class not in IO_CLASSES:
+        raise ValueError(ERR_IO_CLASS_NOT_VALID)
+    return io_class
+
+
+def _get_cpus(cpus):
+    if cpus is None:
+        return None
+    if isinstance(cpus, int) and not isinstance(cpus, bool):
+        cpus = [cpus]
+    if not isinstance(cpus, (list, tuple, set)) or not cpus:
+        raise ValueError(ERR_CPUS_NOT_VALID)
+    for cpu in cpus:
+        if not isinstance(cpu, int) or isinstance(cpu, bool) or cpu < 0:
+            raise ValueError(ERR_CPUS_NOT_VALID)
+    return tuple(sorted(set(cpus)))
+
+
+def get_memory_limit(memory_limit):
+    """
+    memory limit in bytes, from bytes or a string like "512M".
+    """
+    if memory_limit is None:
+        return None
+    if isinstance(memory_limit, str):
+        text = memory_limit.strip().upper()
+        if text.endswith("B"):
+            text = text[:-1]
+        unit = MEMORY_UNITS.get(text[-1:], 1)
+        if unit > 1:
+            text = text[:-1]
+        if not text.isdigit():
+            raise ValueError(ERR_MEMORY_LIMIT_NOT_VALID)
+        memory_limit = int(text) * unit
+    if not isinstance(memory_limit, int) or isinstance(memory_limit, bool) or memory_limit < 1:
+        raise ValueError(ERR_MEMORY_LIMIT_NOT_VALID)
+    return memory_limit
+
+
+def get_preexec_fn(priority=None, io_class=None, cpus=None, memory_limit=None):
+    """
+    function applying the options in the child process, for the
+    "preexec_fn" of subprocess.Popen. None if no option is set.
+    Everything but the system calls is done here, in the parent, since
+    importing modules or loading libraries is not safe between "fork" and
+    "exec" of a threaded process.
+    """
+    if priority is None and io_class is None and cpus is None and memory_limit is None:
+        return None
+    set_io_class = None if io_class is None else _get_io_class_setter(io_class)
+
+    def preexec_fn():
+        _apply(priority, set_io_class, cpus, memory_limit)
+    return preexec_fn
+
+
+def apply(priority=None, io_class=None, cpus=None, memory_limit=None):
+    """
+    apply the options to the current process.
+    """
+    set_io_class = None if io_class is None else _get_io_class_setter(io_class)
+    _apply(priority, set_io_class, cpus, memory_limit)
+
+
+def _apply(priority, set_io_class, cpus, memory_limit):
+    if priority is not None:
+        _try("priority", _set_niceness, priority)
+    if set_io_class is not None:
+        _try("io_class", set_io_class)
+    if cpus is not None:
+        _try("cpus", os.sched_setaffinity, 0, cpus)
+    if memory_limit is not None:
+        _try("memory_limit", _set_memory_limit, memory_limit)
+
+
+def _try(name, func, *args):
+    try:
+        func(*args)
+    except (AttributeError, OSError, ValueError) as e:
+        # written on the file descriptor, the process is about to exec
+        os.write(2, "cronpi.runner: {} not applied: {}\n".format(name, e).encode("utf-8"))
+
+
+def _set_niceness(niceness):
+    # os.nice adds to the niceness, which may already be above 0
+    increment = niceness - os.nice(0)
+    if increment:
+        os.nice(increment)
+
+
+def _get_io_class_setter(io_class):
+    """
+    function setting the I/O class of the current process with a single
+    system call. A function raising the error is returned if the system
+    does not support it.
+    """
+    number = IOPRIO_SET.get(platform.machine().lower())
+    error = None
+    if not sys.platform.startswith("linux") or number is None:
+        error = OSError("ioprio_set is not supported on this system")
+    else:
+        try:
+            import ctypes
+            syscall = ctypes.CDLL(None, use_errno=True).syscall
+            get_errno = ctypes.get_errno
+        except (ImportError, OSError, AttributeError) as e:
+            error = OSError("ioprio_set is not supported on this system: {}".format(e))
+    value = (IO_CLASSES.index(io_class) + 1) << IOPRIO_CLASS_SHIFT
+    if io_class != "idle":
+        value |= IOPRIO_LEVEL
+
+    def set_io_class():
+        if error is not None:
+            raise error
+        if syscall(number, IOPRIO_WHO_PROCESS, 0, value) != 0:
+            errno = get_errno()
+            raise OSError(errno, os.strerror(errno))
+    return set_io_class
+
+
+def _set_memory_limit(memory_limit):
+    if resource is None:
+        raise OSError("resource limits are not supported on this system")
+    hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
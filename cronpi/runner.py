@@ -0,0 +1,320 @@
+"""
+Wrapper some jobs are installed behind, eg.
+
+    30 7 * * * /usr/bin/python3 -m cronpi.runner --track -- '/some/command'
+
+The runner starts the command with "/bin/sh -c" like cron, passes its
+output through and exits with its status. With "--track", the start and
+end times, exit status and peak memory of the run are stored in the run
+history (see cronpi.history).
+
+With "--max-concurrency N", at most N copies of the command run at once
+and "--on-overlap" tells what a run does when they are all running:
+"skip" exits at once, "queue" waits for one of them to end, with at most
+one run waiting while the others skip, and "kill" stops the oldest one.
+With "--max-parallel N", at most N commands of the same "--group" of the
+user run at once, other runs wait unless "--on-overlap skip" is given.
+Both limits use "flock" files in the lock directory of the user (see
+cronpi.lock) and are released when the runner exits, however it exits.
+Skipped, queued and killed runs are counted in the run history.
+
+Usage
+----------
+python -m cronpi.runner [--every SECONDS] [--track] [--history PATH] [--max-concurrency N]
+    [--on-overlap skip|queue|kill] [--max-parallel N] [--group NAME]
+    [--priority NICENESS] [--io-class realtime|best-effort|idle] [--cpus 0,1]
+    [--memory-limit BYTES] -- COMMAND
+"""
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from cronpi import history, resources
+from cronpi.lock import Semaphore
+from cronpi.validator import EVERY_SECONDS, ON_OVERLAP
+
+DEFAULT_GROUP = "default"
+# seconds a killed run has to end before it is killed with SIGKILL
+KILL_TIMEOUT = 10.0
+MINUTE = 60
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m cronpi.runner",
+                                     description="run a cron job command")
+    parser.add_argument("--every", type=int, choices=EVERY_SECONDS,
+                        help="run the command every SECONDS until the end of the minute")
+    parser.add_argument("--track", action="store_true",
+                        help="store the run in the run history")
+    parser.add_argument("--history", help="run history file, implies --track")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="most copies of the command running at once")
+    parser.add_argument("--on-overlap", choices=ON_OVERLAP, default="skip",
+                        help="what to do when max-concurrency copies are running")
+    parser.add_argument("--max-parallel", type=int,
+                        help="most commands of the group of the user running at once")
+    parser.add_argument("--group", default=DEFAULT_GROUP, help="group of max-parallel")
+    parser.add_argument("--priority", type=int, help="niceness of the command")
+    parser.add_argument("--io-class", choices=resources.IO_CLASSES,
+                        help="I/O scheduling class of the command")
+    parser.add_argument("--cpus", type=_get_cpus, help="CPUs the command may run on, eg. 0,1")
+    parser.add_argument("--memory-limit", type=int,
+                        help="address space limit of the command in bytes")
+    parser.add_argument("command", help="command, run with /bin/sh -c")
+    return parser.parse_args(argv)
+
+
+def _get_cpus(text):
+    try:
+        return tuple(int(cpu) for cpu in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid CPU list: {!r}".format(text))
+
+
+def run(args):
+    """
+    run the command of parsed args and get its exit status.
+    """
+    started = _start(args)
+    if started is None:
+        return 0
+    return _finish(args, started)
+
+
+def _start(args):
+    """
+    get the limits of parsed args and start the command.
+
+    Returns
+    ----------
+    started: tuple
+        process, start time and held semaphores of the run, None if the
+        run is skipped
+    """
+    key = " ".join(args.command.split())
+    semaphores = []
+    try:
+        if args.max_concurrency and not _acquire_job(args, key, semaphores):
+            return None
+        if args.max_parallel:
+            semaphore = Semaphore("group:{}".format(args.group), args.max_parallel)
+            if not semaphore.try_acquire():
+                if args.on_overlap == "skip":
+                    _count(args, key, "skipped")
+                    return None
+                _count(args, key, "queued")
+                semaphore.acquire()
+            semaphores.append(semaphore)
+
+        start = time.time()
+        # a run which may be killed gets its own process group, so that
+        # the whole command is killed
+        process = subprocess.Popen(
+            args.command, shell=True, start_new_session=args.on_overlap == "kill",
+            preexec_fn=resources.get_preexec_fn(
+                args.priority, args.io_class, args.cpus, args.memory_limit))
+        for semaphore in semaphores:
+            semaphore.write("{} {}".format(process.pid, start))
+    except Exception:
+        for semaphore in semaphores:
+            semaphore.release()
+        raise
+    return process, start, semaphores
+
+
+def _finish(args, started):
+    """
+    wait for a started run, release its limits and get its exit status.
+    """
+    process, start, semaphores = started
+    try:
+        status = process.wait()
+        end = time.time()
+    finally:
+        for semaphore in semaphores:
+            semaphore.release()
+    if args.track or args.history:
+        key = " ".join(args.command.split())
+        _record(args, history.Run(key, start, end, status, _get_max_rss()))
+    return status
+
+
+def tick(args, start=None, end=None):
+    """
+    run the command every args.every seconds from start to end, the
+    current minute by default, and get the first non zero exit status.
+    Runs are started and waited for from the calling thread, a tick is
+    skipped while the previous run is still running.
+    """
+    now = time.time()
+    if start is None:
+        start = math.floor(now / MINUTE) * MINUTE
+    end = start + MINUTE if end is None else end
+    key = " ".join(args.command.split())
+    name = "tick:{}:{}".format(os.getuid() if hasattr(os, "getuid") else "", key)
+    # also held by the last run of the runner started the previous minute
+    semaphore = Semaphore(name, 1)
+    statuses = []
+    running = None
+    due = start
+    try:
+        while due < end:
+            # due times are computed from start, never from the previous
+            # tick, so that the time spent starting commands does not add up
+            delay = due - time.time()
+            if running is not None and _wait(running[0], delay):
+                statuses.append(_finish_tick(args, running, semaphore))
+                running = None
+                delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            if delay > -args.every:
+                if running is None and semaphore.try_acquire():
+                    try:
+                        running = _start(args)
+                    finally:
+                        if running is None:
+                            semaphore.release()
+                else:
+                    _count(args, key, "skipped")
+            # else cron started the runner too late for this tick
+            due += args.every
+    finally:
+        if running is not None:
+            statuses.append(_finish_tick(args, running, semaphore))
+    return next((status for status in statuses if status != 0), 0)
+
+
+def _wait(process, timeout):
+    """
+    True if the process has ended within timeout seconds.
+    """
+    try:
+        process.wait(max(timeout, 0))
+    except subprocess.TimeoutExpired:
+        return False
+    return True
+
+
+def _finish_tick(args, running, semaphore):
+    try:
+        return _finish(args, running)
+    finally:
+        semaphore.release()
+
+
+def _acquire_job(args, key, semaphores):
+    """
+    get a slot of the copies of the command, following on_overlap.
+
+    Returns
+    ----------
+    result: bool
+        False if the run is skipped
+    """
+    name = "job:{}:{}".format(os.getuid() if hasattr(os, "getuid") else "", key)
+    semaphore = Semaphore(name, args.max_concurrency)
+    if semaphore.try_acquire():
+        semaphores.append(semaphore)
+        return True
+    if args.on_overlap == "queue":
+        # a single run waits, the next ones are skipped
+        waiting = Semaphore(name + ":queue", 1)
+        if waiting.try_acquire():
+            try:
+                _count(args, key, "queued")
+                semaphore.acquire()
+            finally:
+                waiting.release()
+            semaphores.append(semaphore)
+            return True
+    elif args.on_overlap == "kill":
+        _count(args, key, "killed")
+        oldest = _get_oldest(semaphore.holders())
+        _kill(oldest, signal.SIGTERM)
+        if not semaphore.acquire(timeout=KILL_TIMEOUT):
+            _kill(oldest, signal.SIGKILL)
+            semaphore.acquire()
+        semaphores.append(semaphore)
+        return True
+    _count(args, key, "skipped")
+    return False
+
+
+def _get_oldest(holders):
+    """
+    pid of the run started first, from the "pid start" written by the
+    holders of the slots. None if no run has started yet.
+    """
+    runs = []
+    for holder in holders:
+        parts = holder.split()
+        if len(parts) == 2 and parts[0].isdigit():
+            runs.append((float(parts[1]), int(parts[0])))
+    return min(runs)[1] if runs else None
+
+
+def _kill(pid, sig):
+    if pid is None:
+        return
+    try:
+        os.killpg(pid, sig)
+    except OSError:
+        pass
+
+
+def _count(args, key, name):
+    try:
+        history.increment(key, name, args.history)
+    except (OSError, history.sqlite3.Error) as e:
+        sys.stderr.write("cronpi.runner: {} run not counted: {}\n".format(name, e))
+
+
+def _record(args, run):
+    # a job never fails because its run could not be recorded
+    try:
+        history.record([run], args.history)
+    except (OSError, history.sqlite3.Error) as e:
+        sys.stderr.write("cronpi.runner: run not recorded: {}\n".format(e))
+
+
+def _get_max_rss():
+    """
+    peak resident memory of the waited children in bytes.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # kilobytes everywhere but on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def exit_status(status):
+    """
+    exit status of the runner for the status of the command, which is
+    negative if it was killed by a signal.
+    """
+    return 128 - status if status < 0 else status
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--" in argv:
+        # everything after "--" is the command, even if it was not quoted
+        index = argv.index("--")
+        argv = argv[:index] + ["--", " ".join(argv[index + 1:])]
+    args = parse_args(argv)
+    return exit_status(tick(args) if args.every else run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+from bisect import bisect_left
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from cronpi.parser import CronSyntaxError, SCHEDULE_LENGTH, parse_schedule
+
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
+ERR_SCHEDULE_NOT_VALID = "schedule is not a valid cron expression."
+ERR_SCHEDULE_NEVER_RUNS = "schedule never runs."
+ERR_NOT_TIMED = "schedule is not bound to a time"
+
+# years searched before a schedule like "0 0 30 2 *" is said to never run
+MAX_SEARCH_YEARS = 8
+
+
+class Schedule(object):
+    """
+    Compiled cron schedule.
+    Every field is kept as an int bitmask where bit n is set if the value
+    n matches, so a time is checked with a few shifts and the next match
+    of a field is found without looping.
+    """
+    __slots__ = ("expression", "minutes", "hours", "days", "months",
+                 "weekdays", "day_star", "weekday_star",
+                 "hour_list", "minute_list")
+
+    def __init__(self, expression, masks, day_star, weekday_star):
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = masks
+        self.day_star = day_star
+        self.weekday_star = weekday_star
+        self.hour_list = _bits(self.hours)
+        self.minute_list = _bits(self.minutes)
+
+    def __repr__(self):
+        return "Schedule({!r})".format(self.expression)
+
+    def year_days(self, year):
+        """
+        bitmask of the days of year, counted from 0 for january 1st,
+        on which the schedule runs.
+        """
+        return _year_mask(self.days, self.months, self.weekdays,
+                          self.day_star or self.weekday_star, year)
+
+    def match_day(self, dt):
+        """
+        True if the schedule runs on the day of dt.
+        Like cron, day and weekday are or-ed when both are restricted.
+        """
+        day = self.days >> dt.day & 1
+        weekday = self.weekdays >> ((dt.weekday() + 1) % 7) & 1
+        if self.day_star or self.weekday_star:
+            return bool(day and weekday)
+        return bool(day or weekday)
+
+    def matches(self, dt):
+        """
+        True if the schedule runs at the minute of dt.
+        """
+        return bool(self.months >> dt.month & 1 and
+                    self.hours >> dt.hour & 1 and
+                    self.minutes >> dt.minute & 1 and
+                    self.match_day(dt))
+
+    def next_run(self, start):
+        """
+        first run strictly after start.
+        """
+        return next(self.iter_runs(start))
+
+    def previous_run(self, start):
+        """
+        last run strictly before start.
+        """
+        t = start.replace(second=0, microsecond=0)
+        if t == start:
+            t -= timedelta(minutes=1)
+        limit = t.year - MAX_SEARCH_YEARS
+        while t.year >= limit:
+            month = _previous_bit(self.months, t.month)
+            if month is None:
+                t = datetime(t.year - 1, 12, 31, 23, 59)
+                continue
+            if month != t.month:
+                t = _end_of_month(t.year, month)
+                continue
+            if not self.match_day(t):
+                t = datetime(t.year, t.month, t.day) - timedelta(minutes=1)
+                continue
+            hour = _previous_bit(self.hours, t.hour)
+            if hour is None:
+                t = datetime(t.year, t.month, t.day) - timedelta(minutes=1)
+                continue
+            if hour != t.hour:
+                t = t.replace(hour=hour, minute=59)
+            minute = _previous_bit(self.minutes, t.minute)
+            if minute is None:
+                t = t.replace(minute=0) - timedelta(minutes=1)
+                continue
+            return t.replace(minute=minute)
+        raise ValueError(ERR_SCHEDULE_NEVER_RUNS)
+
+    def iter_runs(self, start):
+        """
+        yield every run strictly after start.
+        Matching days are found with a per-year bitmask of the days, so
+        non-matching months, days and hours are skipped without looping
+        minute by minute.
+        """
+        hours, minutes = self.hour_list, self.minute_list
+        t = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        year, day = t.year, t.timetuple().tm_yday - 1
+        first_hour, first_minute = t.hour, t.minute
+        empty_years = 0
+        while empty_years <= MAX_SEARCH_YEARS:
+            mask = self.year_days(year)
+            found = _next_bit(mask, day)
+            if found is None:
+                empty_years = empty_years + 1 if not mask else 0
+                year, day = year + 1, 0
+                first_hour = first_minute = 0
+                continue
+            if found != day:
+                first_hour = first_minute = 0
+            d = date.fromordinal(date(year, 1, 1).toordinal() + found)
+            for hour in hours[bisect_left(hours, first_hour):]:
+                start_minute = first_minute if hour == first_hour else 0
+                for minute in minutes[bisect_left(minutes, start_minute):]:
+                    yield datetime(d.year, d.month, d.day, hour, minute)
+            day = found + 1
+            first_hour = first_minute = 0
+        raise ValueError(ERR_SCHEDULE_NEVER_RUNS)
+
+    def next_runs(self, start, n):
+        """
+        first n runs strictly after start.
+        """
+        return list(islice(self.iter_runs(start), n))
+
+
+def _year_mask(days, months, weekdays, and_days, year):
+    """
+    bitmask of the days of year, counted from 0 for january 1st,
+    on which the schedule runs.
+    """
+    mask = 0
+    weekday = (date(year, 1, 1).weekday() + 1) % 7
+    offset = 0
+    for month in range(1, 13):
+        length = monthrange(year, month)[1]
+        if months >> month & 1:
+            for day in range(1, length + 1):
+                day_match = days >> day & 1
+                weekday_match = weekdays >> ((weekday + day - 1) % 7) & 1
+                if (day_match and weekday_match) if and_days else (day_match or weekday_match):
+                    mask |= 1 << (offset + day - 1)
+        offset += length
+        weekday = (weekday + length) % 7
+    return mask
+
+
+def _bits(mask):
+    return tuple(i for i in range(mask.bit_length()) if mask >> i & 1)
+
+
+def _next_bit(mask, start):
+    rest = mask >> start
+    if not rest:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+
+def _previous_bit(mask, start):
+    rest = mask & ((1 << (start + 1)) - 1)
+    if not rest:
+        return None
+    return rest.bit_length() - 1
+
+
+def _end_of_month(year, month):
+    if month == 12:
+        return datetime(year, 12, 31, 23, 59)
+    return datetime(year, month + 1, 1) - timedelta(minutes=1)
+
+
+def _compile(expression):
+    try:
+        fields = parse_schedule(expression)
+    except CronSyntaxError as e:
+        raise e.with_prefix(ERR_SCHEDULE_NOT_VALID)
+    if not fields:
+        # @reboot is not bound to a time
+        raise CronSyntaxError(ERR_NOT_TIMED, "macro", expression, 1, ERR_SCHEDULE_NOT_VALID)
+    return Schedule(" ".join(f.text for f in fields), [f.mask for f in fields],
+                    fields[2].star, fields[4].star)
+
+
+if lru_cache is not None:
+    _compile = lru_cache(maxsize=4096)(_compile)
+    _year_mask = lru_cache(maxsize=4096)(_year_mask)
+
+
+def compile_expression(expression):
+    """
+    Compile a cron schedule into a Schedule object.
+    Results are memoized by expression string.
+
+    Parameters
+    ----------
+    expression: string
+        5 time fields like "*/15 9-17 * * mon-fri", a macro like "@daily"
+        or a whole crontab line, whose command part is ignored
+
+    Returns
+    ----------
+    schedule: Schedule
+    """
+    fields = expression.split()
+    if fields and fields[0].startswith("@"):
+        return _compile(fields[0])
+    return _compile(" ".join(fields[:SCHEDULE_LENGTH]))
+
+
+def next_runs(expression, start=None, n=1):
+    """
+    Get the next n times the schedule runs after start.
+
+    Parameters
+    ----------
+    expression: string
+        same as in compile_expression
+
+    start: datetime
+        Default is now.
+
+    n: int
+        number of runs. Default value is 1.
+
+    Returns
+    ----------
+    runs: list
+        datetime of each run
+
+    Usage
+    ----------
+    cronpi.next_runs("30 7 * * mon-fri", n=5)
+    """
+    return compile_expression(expression).next_runs(start or datetime.now(), n)
+
+
+def next_run(expression, start=None):
+    """
+    Get the first time the schedule runs after start (default is now).
+    """
+    return compile_expression(expression).next_run(start or datetime.now())
+
+
+def previous_run(expression, start=None):
+    """
+    Get the last time the schedule ran before start (default is now).
+    """
+    return compile_expression(expression).previous_run(start or datetime.now())
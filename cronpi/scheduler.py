@@ -0,0 +1,360 @@
+"""
+In-process scheduler running cronpi jobs without a cron daemon, eg. in
+containers where "crontab" is not available.
+
+Jobs are defined with the same "run_*" builders as cronpi. Their next run
+times are kept in a heap and a single thread sleeps until the earliest
+one, so thousands of jobs cost no CPU while nothing is due. Due commands
+are run with "/bin/sh -c" in a pool of threads or processes.
+
+Usage
+----------
+scheduler = cronpi.Scheduler(workers=4)
+scheduler.run_every_day("/some/command").on("7:30")
+scheduler.run_custom("*/5 * * * * /other/command")
+scheduler.start()
+...
+print(scheduler.stats())
+scheduler.stop()
+"""
+import heapq
+import itertools
+import subprocess
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from cronpi import validator
+from cronpi.app import App
+from cronpi.document import command_key
+from cronpi.entry import get_expires, split_annotation
+from cronpi.schedule import compile_expression
+from cronpi.validator import validate_crontab_content
+
+WORKERS = 8
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+# longest sleep, so that a change of the system clock is noticed
+MAX_SLEEP = 3600.0
+REBOOT = "@reboot"
+
+ERR_WORKERS_NOT_VALID = "workers should be integer greater than 0."
+ERR_EXECUTOR_NOT_VALID = "executor should be either 'thread' or 'process'."
+ERR_ALREADY_STARTED = "scheduler is already started."
+
+SchedulerStats = namedtuple(
+    "SchedulerStats", ["runs", "failures", "last_lag", "mean_lag", "max_lag"])
+SchedulerStats.__doc__ = """
+number of runs, of runs which raised or exited with a non zero status,
+and seconds between the time jobs were due and the time they were started.
+"""
+
+
+class _Job(object):
+    __slots__ = ("content", "command", "key", "schedule", "expires", "due", "order", "removed")
+
+    def __init__(self, content):
+        self.content = content
+        line, annotation = split_annotation(content)
+        parts = line.split(None, 1) if line.startswith("@") else line.split(None, 5)
+        self.command = parts[-1]
+        self.key = command_key(content)
+        self.schedule = None if parts[0].lower() == REBOOT else compile_expression(line)
+        self.expires = get_expires(annotation)
+        self.due = None
+        self.order = None
+        self.removed = False
+
+
+class SchedulerApp(App):
+    """
+    Job builder adding its jobs to a Scheduler instead of the crontab.
+    """
+    __slots__ = ()
+    scheduler = None
+
+    def deploy(self, content):
+        return self.scheduler.add(self.annotate(content), self.overwrite)
+
+    def planned_content(self):
+        return self.scheduler.get_content()
+
+
+class Scheduler(object):
+    """
+    Run crontab jobs in the current process.
+
+    Parameters
+    ----------
+    workers: int
+        maximum number of jobs running at once. Default value is 8.
+
+    executor: string
+        "thread" or "process", where commands are started from.
+        Default is "thread".
+    """
+    def __init__(self, workers=WORKERS, executor=EXECUTOR_THREAD):
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError(ERR_WORKERS_NOT_VALID)
+        if executor not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+            raise ValueError(ERR_EXECUTOR_NOT_VALID)
+        self.workers = workers
+        self.executor = executor
+        self.__app = type("SchedulerApp", (SchedulerApp,), {"__slots__": (), "scheduler": self})
+        self.__heap = []
+        self.__jobs = {}
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition()
+        self.__pool = None
+        self.__thread = None
+        self.__running = False
+        self.__started = None
+        self.__stats = {"runs": 0, "failures": 0, "last_lag": 0.0, "lag_sum": 0.0, "max_lag": 0.0}
+
+    def run_every_day(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_every_day.
+        """
+        return self.__app(1).set_command(cmd, isOverwrite)
+
+    def run_every_week(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_every_week.
+        """
+        return self.__app(2).set_command(cmd, isOverwrite)
+
+    def run_every_month(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_every_month.
+        """
+        return self.__app(3).set_command(cmd, isOverwrite)
+
+    def run_every_year(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_every_year.
+        """
+        return self.__app(4).set_command(cmd, isOverwrite)
+
+    def run_by_date(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_by_date, the job runs only once.
+        """
+        return self.__app(5).set_command(cmd, isOverwrite)
+
+    def run_every_seconds(self, cmd, isOverwrite=False):
+        """
+        same as cronpi.run_every_seconds, the runner started every minute
+        runs the command every few seconds.
+        """
+        return self.__app(7).set_command(cmd, isOverwrite)
+
+    def run_custom(self, cmd, isOverwrite=False, tags=None):
+        """
+        same as cronpi.run_custom, cmd is a whole crontab line.
+        """
+        app = self.__app(6).set_command(cmd, isOverwrite)
+        if tags:
+            app = app.tag(*validator.validate_tags(tags))
+        return app.on(None)
+
+    def add(self, content, isOverwrite=False):
+        """
+        Schedule a single crontab content.
+
+        Parameters
+        ----------
+        content: string
+            single crontab content like "30 7 * * * /some/command"
+
+        isOverwrite: bool
+            If True, jobs running the same command are replaced.
+        """
+        validate_crontab_content(content)
+        job = _Job(content.strip())
+        with self.__condition:
+            job.order = next(self.__counter)
+            if isOverwrite:
+                self.__discard(job.key)
+            now = datetime.now()
+            if job.schedule is None:
+                # "@reboot" runs once, when the scheduler starts
+                job.due = self.__started or now
+            else:
+                job.due = job.schedule.next_run(now)
+                if job.expires is not None and job.due >= job.expires:
+                    return True
+            self.__jobs.setdefault(job.key, []).append(job)
+            heapq.heappush(self.__heap, (job.due, next(self.__counter), job))
+            self.__condition.notify()
+        return True
+
+    def remove(self, command):
+        """
+        Unschedule every job running the given command.
+
+        Returns
+        ----------
+        removed: list
+            crontab lines that have been removed
+        """
+        with self.__condition:
+            removed = [job.content for job in self.__discard(command_key("* * * * * " + command))]
+            self.__condition.notify()
+        return removed
+
+    def get_job_list(self):
+        """
+        crontab lines of the scheduled jobs, in the order they were added.
+        """
+        with self.__condition:
+            jobs = [job for jobs in self.__jobs.values() for job in jobs]
+        return [job.content for job in sorted(jobs, key=lambda job: job.order)]
+
+    def get_content(self):
+        """
+        scheduled jobs as crontab content multiline.
+        """
+        return "\n".join(self.get_job_list()) + "\n"
+
+    def next_run_time(self):
+        """
+        datetime the next job is due, None if nothing is scheduled.
+        """
+        with self.__condition:
+            heap = self.__heap
+            while heap and heap[0][2].removed:
+                heapq.heappop(heap)
+            return heap[0][0] if heap else None
+
+    def run_pending(self, now=None):
+        """
+        Start every job due at or before now and schedule its next run.
+        Called by the thread of "start", it can also be called from an
+        existing loop instead.
+
+        Returns
+        ----------
+        started: list
+            crontab lines of the jobs that have been started
+        """
+        started = []
+        with self.__condition:
+            now = now or datetime.now()
+            heap = self.__heap
+            while heap and heap[0][0] <= now:
+                due, _, job = heapq.heappop(heap)
+                if job.removed:
+                    continue
+                # "@reboot" jobs added before "start" are not late
+                self.__dispatch(job, (datetime.now() - max(due, self.__started or due)).total_seconds())
+                started.append(job.content)
+                if job.schedule is None:
+                    self.__discard_job(job)
+                    continue
+                job.due = job.schedule.next_run(max(due, now))
+                if job.expires is not None and job.due >= job.expires:
+                    self.__discard_job(job)
+                    continue
+                heapq.heappush(heap, (job.due, next(self.__counter), job))
+        return started
+
+    def start(self):
+        """
+        Run the jobs in a background thread until "stop" is called.
+        """
+        with self.__condition:
+            if self.__running:
+                raise RuntimeError(ERR_ALREADY_STARTED)
+            self.__running = True
+            self.__started = datetime.now()
+            self.__thread = threading.Thread(target=self.__loop, name="cronpi-scheduler")
+            self.__thread.daemon = True
+            self.__thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """
+        Stop scheduling jobs. If wait is True, wait for the running jobs
+        to end.
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+            thread, self.__thread = self.__thread, None
+            pool, self.__pool = self.__pool, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def stats(self):
+        """
+        Get the number of runs and the scheduling lag.
+
+        Returns
+        ----------
+        stats: SchedulerStats
+        """
+        with self.__condition:
+            stats = dict(self.__stats)
+        runs = stats["runs"]
+        return SchedulerStats(runs, stats["failures"], stats["last_lag"],
+                              stats["lag_sum"] / runs if runs else 0.0, stats["max_lag"])
+
+    def __loop(self):
+        with self.__condition:
+            while self.__running:
+                self.run_pending()
+                due = self.next_run_time()
+                timeout = MAX_SLEEP
+                if due is not None:
+                    timeout = min(MAX_SLEEP, max(0.0, (due - datetime.now()).total_seconds()))
+                self.__condition.wait(timeout)
+
+    def __dispatch(self, job, lag):
+        stats = self.__stats
+        stats["runs"] += 1
+        stats["last_lag"] = lag
+        stats["lag_sum"] += lag
+        stats["max_lag"] = max(stats["max_lag"], lag)
+        if self.__pool is None:
+            if self.executor == EXECUTOR_PROCESS:
+                self.__pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.__pool = ThreadPoolExecutor(max_workers=self.workers)
+        future = self.__pool.submit(_run_command, job.command)
+        future.add_done_callback(self.__done)
+
+    def __done(self, future):
+        if future.cancelled() or future.exception() is not None or future.result() != 0:
+            with self.__condition:
+                self.__stats["failures"] += 1
+
+    def __discard(self, key):
+        jobs = self.__jobs.pop(key, [])
+        for job in jobs:
+            job.removed = True
+        return jobs
+
+    def __discard_job(self, job):
+        jobs = self.__jobs.get(job.key, [])
+        if job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self.__jobs[job.key]
+        job.removed = True
+
+
+def _run_command(command):
+    """
+    run a command the way cron does and get its exit status.
+    """
+    return subprocess.call(command, shell=True)
@@ -0,0 +1,59 @@
+"""
+Installation of jobs behind the cronpi runner (see cronpi.runner), which
+is kept apart from the runner so that importing cronpi does not import the
+module run by "python -m cronpi.runner".
+"""
+import shlex
+import sys
+
+from cronpi.entry import RUNNER_MODULE, annotate, split_annotation
+
+# options of the builders, by name, that the runner takes
+OPTIONS = ("every", "track", "history", "max_concurrency", "on_overlap", "max_parallel", "group",
+           "priority", "io_class", "cpus", "memory_limit")
+
+
+def wrap(content, options):
+    """
+    Put the command of a single crontab content behind the runner.
+
+    Parameters
+    ----------
+    content: string
+        single crontab content, with its annotation if any
+
+    options: dict
+        runner options by name, see OPTIONS. A True value is given as a
+        flag, a list or tuple is joined with ",".
+
+    Returns
+    ----------
+    content: string
+        same schedule running "python -m cronpi.runner ... -- 'command'"
+    """
+    line, annotation = split_annotation(content.strip())
+    count = 1 if line.startswith("@") else 5
+    parts = line.split(None, count)
+    args = [shlex.quote(sys.executable), "-m", RUNNER_MODULE]
+    args += [shlex.quote(arg) for arg in get_args(options)]
+    args += ["--", shlex.quote(parts[count])]
+    return annotate("{} {}".format(" ".join(parts[:count]), " ".join(args)), **annotation)
+
+
+def get_args(options):
+    """
+    command line arguments of the runner for options.
+    """
+    args = []
+    for name in OPTIONS:
+        value = options.get(name)
+        if value is None or value is False:
+            continue
+        flag = "--" + name.replace("_", "-")
+        if value is True:
+            args.append(flag)
+        elif isinstance(value, (list, tuple)):
+            args += [flag, ",".join(str(item) for item in value)]
+        else:
+            args += [flag, str(value)]
+    return args
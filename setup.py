@@ -13,6 +13,10 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/dakc/cronpi",
     packages=setuptools.find_packages(),
+    extras_require={
+        "evaluate": ["numpy"],
+        "yaml": ["pyyaml"],
+    },
     classifiers=[
         "Programming Language :: Python ",
         "License :: OSI Approved :: MIT License",
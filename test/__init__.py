@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# lock files of the tests and of the runners they start are kept apart
+# from the ones of the cronpi processes of the host, and removed
+_lock_directory = tempfile.mkdtemp(prefix="cronpi-locks-")
+os.environ["CRONPI_LOCK_DIR"] = _lock_directory
+atexit.register(shutil.rmtree, _lock_directory, True)
@@ -0,0 +1,39 @@
+"""
+Fixtures shared by the tests.
+"""
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+import cronpi
+from cronpi import cron
+from cronpi.backend import SpoolBackend
+
+
+class SpoolTestCase(unittest.TestCase):
+    """
+    Test case installing jobs into a crontab file in a temporary directory
+    instead of the crontab of the current user. The backend used before
+    the test is set back afterwards.
+
+    Attributes
+    ----------
+    directory: string
+        temporary directory, removed after the test
+
+    backend: SpoolBackend
+        backend of the crontab, an instance of backend_class
+    """
+    backend_class = SpoolBackend
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = self.backend_class(self.directory, user="cronpi")
+        self.default_backend = cron.get_backend()
+        cronpi.set_backend(self.backend)
+
+    def tearDown(self):
+        cronpi.set_backend(self.default_backend)
+        shutil.rmtree(self.directory)
@@ -0,0 +1,143 @@
+import asyncio
+import gc
+import threading
+import time
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+import cronpi.aio
+from cronpi import cron
+from cronpi.backend import SpoolBackend
+from cronpi.lock import FileLock, get_lock_path
+from test.helpers import SpoolTestCase
+
+class CountingBackend(SpoolBackend):
+    writes = 0
+
+    def write(self, content):
+        self.writes += 1
+        SpoolBackend.write(self, content)
+
+
+class TestAio(SpoolTestCase):
+    backend_class = CountingBackend
+
+    def test_builders(self):
+        """
+        run_* builders
+        """
+        async def main():
+            await cronpi.aio.run_every_day("ls", isOverwrite=True).on("7:30")
+            await cronpi.aio.run_every_day("ls", isOverwrite=True).on("7:30pm")
+            await cronpi.aio.run_custom("* * * * * pwd")
+            return await cronpi.aio.get_job_list()
+
+        self.assertEqual(asyncio.run(main()), ["30 19 * * * ls", "* * * * * pwd"])
+
+    def test_coalesced_deploy(self):
+        """
+        concurrent deploys are written once
+        """
+        async def main():
+            await asyncio.gather(*[
+                cronpi.aio.run_every_day("cmd{}".format(i)).on("7:30") for i in range(100)])
+
+        asyncio.run(main())
+        self.assertEqual(self.backend.writes, 1)
+        self.assertEqual(len(cronpi.get_job_list()), 100)
+
+    def test_spread(self):
+        """
+        spread jobs are placed against the crontab read without blocking
+        """
+        self.backend.write("0 7 * * * busy\n")
+
+        def blocking_read(user=None):
+            raise AssertionError("the crontab is read in the event loop")
+
+        async def main():
+            return await cronpi.aio.run_every_day("ls").on("7:00", spread=5)
+
+        get_planned_content = cron.get_planned_content
+        cron.get_planned_content = blocking_read
+        try:
+            placement = asyncio.run(main())
+        finally:
+            cron.get_planned_content = get_planned_content
+        self.assertEqual(placement.content, "1 7 * * * ls")
+        self.assertEqual(cronpi.get_job_list(), ["0 7 * * * busy", "1 7 * * * ls"])
+
+    def test_cancelled_lock(self):
+        """
+        the file lock taken after its deploy was cancelled is released
+        """
+        path = get_lock_path(cron._get_lock_name(self.backend))
+        holder = FileLock(path)
+        holder.acquire()
+        # released while the event loop waits for the executor to stop
+        timer = threading.Timer(0.3, holder.release)
+        timer.start()
+
+        async def main():
+            asyncio.ensure_future(cronpi.aio.run_custom("* * * * * ls"))
+            await asyncio.sleep(0.1)
+
+        # leaving asyncio.run cancels the deploy waiting for the lock
+        asyncio.run(main())
+        timer.join()
+        lock = FileLock(path)
+        deadline = time.time() + 5
+        while not lock.try_acquire() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertLess(time.time(), deadline)
+        lock.release()
+        self.assertEqual(cronpi.get_job_list(), [""])
+
+    def test_process_lock(self):
+        """
+        deploys wait for the updates of the other threads, without file lock
+        """
+        cronpi.configure_concurrency(use_flock=False)
+        crontab_lock = cron._get_crontab_lock(self.backend)
+        acquired = threading.Event()
+
+        def hold():
+            with crontab_lock:
+                acquired.set()
+                time.sleep(0.2)
+        thread = threading.Thread(target=hold)
+        try:
+            thread.start()
+            acquired.wait()
+            start = time.time()
+            asyncio.run(cronpi.aio.run_custom("* * * * * ls"))
+            thread.join()
+        finally:
+            cronpi.configure_concurrency()
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(cronpi.get_job_list(), ["* * * * * ls"])
+
+    def test_coalescers(self):
+        """
+        coalescers are dropped with their event loop
+        """
+        asyncio.run(cronpi.aio.run_custom("* * * * * ls"))
+        gc.collect()
+        self.assertEqual(len(cronpi.aio._coalescers), 0)
+
+    def test_invalid_deploy(self):
+        """
+        validation errors are raised before anything is queued
+        """
+        async def main():
+            await cronpi.aio.run_custom("* * * *  ls")
+
+        with self.assertRaisesRegex(ValueError, cronpi.validator.ERR_COMMAND_FORMAT_NOT_VALID):
+            asyncio.run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
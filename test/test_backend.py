@@ -0,0 +1,321 @@
+import multiprocessing
+import os
+import pwd
+import threading
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import cron
+from cronpi.backend import SpoolBackend
+from cronpi.lock import FileLock, get_lock_directory, get_lock_path, set_lock_directory
+from test.helpers import SpoolTestCase
+
+def deploy_in_process(directory, start):
+    cronpi.set_backend(SpoolBackend(directory, user="cronpi"))
+    for i in range(start, start + 10):
+        cronpi.run_custom("* * * * * cmd{}".format(i))
+
+
+class ChangingBackend(SpoolBackend):
+    """
+    spool backend edited by someone else right after each of the first reads
+    """
+    changes = 1
+
+    def read(self):
+        content = SpoolBackend.read(self)
+        if self.changes > 0:
+            self.changes -= 1
+            SpoolBackend.write(self, content + "* * * * * other{}\n".format(self.changes))
+        return content
+
+
+class ReadingBackend(SpoolBackend):
+    """
+    spool backend without stat_key, listed by another thread while writing
+    """
+    stat_key = None
+
+    def write(self, content):
+        thread = threading.Thread(target=cronpi.get_job_list)
+        thread.start()
+        thread.join()
+        SpoolBackend.write(self, content)
+
+
+class CountingBackend(SpoolBackend):
+    reads = 0
+
+    def read(self):
+        self.reads += 1
+        return SpoolBackend.read(self)
+
+
+class TestSpoolBackend(SpoolTestCase):
+    def test_read_write(self):
+        """
+        read and atomic write
+        """
+        self.assertEqual(self.backend.path, os.path.join(self.directory, "cronpi"))
+        self.assertEqual(self.backend.read(), "")
+        self.backend.write("* * * * * ls\n")
+        self.assertEqual(self.backend.read(), "* * * * * ls\n")
+        self.assertEqual(os.listdir(self.directory), ["cronpi"])
+
+    def test_deploy(self):
+        """
+        deploy through the spool file
+        """
+        cronpi.run_every_day("ls", isOverwrite=True).on("7:30")
+        cronpi.run_every_day("ls", isOverwrite=True).on("7:30pm")
+        cronpi.run_custom("* * * * * pwd")
+        self.assertEqual(cronpi.get_job_list(), ["30 19 * * * ls", "* * * * * pwd"])
+
+    def test_transaction(self):
+        """
+        transaction writes once and nothing on error
+        """
+        with self.assertRaises(RuntimeError):
+            with cronpi.transaction():
+                cronpi.run_custom("* * * * * ls")
+                raise RuntimeError()
+        self.assertEqual(self.backend.read(), "")
+
+        with cronpi.batch():
+            cronpi.run_custom("* * * * * ls")
+            with cronpi.batch():
+                cronpi.run_custom("1 * * * * ls", isOverwrite=True)
+            self.assertEqual(self.backend.read(), "")
+        self.assertEqual(cronpi.get_job_list(), ["1 * * * * ls"])
+
+    def test_skip_identical_write(self):
+        """
+        re-deploying the same job does not write
+        """
+        cronpi.run_custom("* * * * * ls", isOverwrite=True)
+        mtime = os.stat(self.backend.path).st_mtime_ns
+        os.utime(self.backend.path, ns=(0, 0))
+        cronpi.run_custom("* * * * * ls", isOverwrite=True)
+        self.assertEqual(os.stat(self.backend.path).st_mtime_ns, 0)
+        self.assertNotEqual(mtime, 0)
+
+    def test_sync(self):
+        """
+        sync
+        """
+        self.backend.write("MAILTO=a\n* * * * * ls\n1 * * * * pwd\n2 * * * * date\n")
+        result = cronpi.sync(["* * * * * ls", "5 * * * * pwd", "3 * * * * whoami"])
+        self.assertEqual(result.added, ["3 * * * * whoami"])
+        self.assertEqual(result.updated, ["5 * * * * pwd"])
+        self.assertEqual(result.removed, ["2 * * * * date"])
+        self.assertEqual(self.backend.read(),
+                         "MAILTO=a\n* * * * * ls\n5 * * * * pwd\n3 * * * * whoami\n")
+
+        os.utime(self.backend.path, ns=(0, 0))
+        result = cronpi.sync(["* * * * * ls", "5 * * * * pwd", "3 * * * * whoami"])
+        self.assertEqual(result, ([], [], []))
+        self.assertEqual(os.stat(self.backend.path).st_mtime_ns, 0)
+
+        result = cronpi.sync(["* * * * * ls"], prune=False)
+        self.assertEqual(result, ([], [], []))
+
+        wrapped = "0 * * * * {} -m cronpi.runner --track -- pwd".format(sys.executable)
+        contents = ["* * * * * ls # cronpi: tags=web", wrapped]
+        result = cronpi.sync(contents)
+        self.assertEqual(result, ([], contents, ["3 * * * * whoami"]))
+        self.assertEqual(self.backend.read(), "MAILTO=a\n{}\n".format("\n".join(contents)))
+        self.assertEqual(cronpi.sync(contents), ([], [], []))
+        self.assertEqual(cronpi.sync(contents, prune=False), ([], [], []))
+        self.assertEqual(cronpi.get_job_list(), ["MAILTO=a"] + contents)
+
+    def test_concurrent_deploy(self):
+        """
+        builders are independent and deploys from threads are not lost
+        """
+        daily = cronpi.run_every_day("ls")
+        weekly = cronpi.run_every_week("pwd")
+        self.assertEqual(daily.build("7:30"), "30 7 * * * ls")
+        self.assertEqual(weekly.build("sun", time="7:30"), "30 7 * * 0 pwd")
+        with self.assertRaises(AttributeError):
+            daily.type = 2
+
+        def deploy(i):
+            cronpi.run_every_day("cmd{}".format(i)).on("7:30")
+            cronpi.run_every_week("cmd{}".format(i), isOverwrite=True).on("sun", time="7:30")
+        threads = [threading.Thread(target=deploy, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(cronpi.get_job_list()),
+                         sorted("30 7 * * 0 cmd{}".format(i) for i in range(20)))
+
+    def test_concurrent_processes(self):
+        """
+        deploys from several processes are not lost
+        """
+        processes = [multiprocessing.Process(target=deploy_in_process, args=(self.directory, i * 10))
+                     for i in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        self.assertEqual(sorted(cronpi.get_job_list()),
+                         sorted("* * * * * cmd{}".format(i) for i in range(40)))
+
+    def test_file_lock(self):
+        """
+        the lock is reentrant in its thread only and its file is removed
+        """
+        lock = FileLock(get_lock_path("test:{}".format(self.directory)))
+        acquired = []
+        lock.acquire()
+        lock.acquire()
+        thread = threading.Thread(target=lambda: acquired.append(lock.acquire()))
+        thread.start()
+        lock.release()
+        thread.join(0.2)
+        self.assertEqual(acquired, [])
+        self.assertTrue(os.path.exists(lock.path))
+        lock.release()
+        thread.join()
+        self.assertEqual(len(acquired), 1)
+        self.assertFalse(lock.try_acquire())
+        lock.release()
+        self.assertFalse(os.path.exists(lock.path))
+
+        set_lock_directory(self.directory)
+        try:
+            self.assertEqual(get_lock_directory(), self.directory)
+            cronpi.run_custom("* * * * * ls")
+            self.assertEqual(os.path.dirname(get_lock_path("crontab")), self.directory)
+        finally:
+            set_lock_directory(None)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["cronpi"])
+
+        # a planted symbolic link is not followed and its target not touched
+        target = os.path.join(self.directory, "target")
+        with open(target, "w") as f:
+            f.write("content")
+        os.symlink(target, lock.path)
+        with self.assertRaises(OSError):
+            lock.acquire()
+        self.assertFalse(lock.try_acquire())
+        self.assertEqual(lock.read(), "")
+        os.unlink(lock.path)
+        with open(target) as f:
+            self.assertEqual(f.read(), "content")
+
+        shared = os.path.join(self.directory, "shared")
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        set_lock_directory(shared)
+        try:
+            with self.assertRaises(OSError):
+                get_lock_path("crontab")
+        finally:
+            set_lock_directory(None)
+
+    @unittest.skipUnless(hasattr(os, "geteuid") and os.geteuid() == 0, "needs root")
+    def test_owner(self):
+        """
+        the crontab of another user written by root is owned by this user
+        """
+        try:
+            uid = pwd.getpwnam("nobody").pw_uid
+        except KeyError:
+            self.skipTest("no user nobody")
+        backend = self.backend.for_user("nobody")
+        backend.write("* * * * * ls\n")
+        self.assertEqual(os.stat(backend.path).st_uid, uid)
+        self.assertEqual(os.stat(backend.path).st_mode & 0o777, 0o600)
+        self.backend.write("* * * * * ls\n")
+        self.assertEqual(os.stat(self.backend.path).st_uid, os.getuid())
+
+    def test_compare_and_swap(self):
+        """
+        merge is retried when the crontab changes between read and write
+        """
+        backend = ChangingBackend(self.directory, user="cas")
+        cronpi.set_backend(backend)
+        cronpi.configure_concurrency(compare_and_swap=True, backoff=0)
+        cron.reset_contention_stats()
+        try:
+            cronpi.run_custom("* * * * * ls")
+            self.assertEqual(cronpi.get_job_list(), ["* * * * * other0", "* * * * * ls"])
+            stats = cronpi.contention_stats()
+            self.assertEqual(stats["cas_retries"], 1)
+            self.assertEqual(stats["lock_acquisitions"], 1)
+
+            backend.changes = 100
+            with self.assertRaises(OSError):
+                cronpi.run_custom("* * * * * pwd")
+            self.assertEqual(cronpi.contention_stats()["cas_failures"], 1)
+        finally:
+            cronpi.configure_concurrency()
+
+    def test_read_cache(self):
+        """
+        get_job_list is cached until the file changes
+        """
+        backend = CountingBackend(self.directory, user="cache")
+        cronpi.set_backend(backend)
+        cronpi.run_custom("* * * * * ls")
+        reads = backend.reads
+        for _ in range(10):
+            self.assertEqual(cronpi.get_job_list(), ["* * * * * ls"])
+        self.assertEqual(backend.reads, reads + 1)
+
+        SpoolBackend.write(backend, "* * * * * pwd\n")
+        self.assertEqual(cronpi.get_job_list(), ["* * * * * pwd"])
+        cronpi.run_custom("* * * * * date")
+        self.assertEqual(cronpi.get_job_list(), ["* * * * * pwd", "* * * * * date"])
+
+        cronpi.configure_cache(enabled=False)
+        try:
+            reads = backend.reads
+            cronpi.get_job_list()
+            cronpi.get_job_list()
+            self.assertEqual(backend.reads, reads + 2)
+        finally:
+            cronpi.configure_cache()
+
+    def test_read_during_write(self):
+        """
+        content read while the crontab is written is not kept in the cache
+        """
+        cronpi.set_backend(ReadingBackend(self.directory, user="reading"))
+        cronpi.configure_cache(ttl=60)
+        try:
+            cronpi.run_custom("* * * * * ls")
+            self.assertEqual(cronpi.get_job_list(), ["* * * * * ls"])
+        finally:
+            cronpi.configure_cache()
+
+    def test_spread(self):
+        """
+        jobs with same time are spread over the window
+        """
+        self.backend.write("0 0 * * * heavy\n1 0 * * 6 weekend\n")
+        with cronpi.batch():
+            for i in range(3):
+                cronpi.run_every_day("cmd{}".format(i)).on("0:00", spread=2)
+        self.assertEqual(cronpi.get_job_list()[2:], ["2 0 * * * cmd0", "0 0 * * * cmd1", "1 0 * * * cmd2"])
+
+        placement = cronpi.run_every_week("weekly").on("sat", time="0:00", spread=3)
+        self.assertEqual(placement.content, "3 0 * * 6 weekly")
+        self.assertEqual(placement.delay, 3)
+        self.assertEqual(placement.concurrency, {"0:00": 2, "0:01": 2, "0:02": 1, "0:03": 1})
+
+        placement = cronpi.run_every_day("cmd0", isOverwrite=True).on("23:58", spread=10, jitter=True)
+        self.assertTrue(placement.content.endswith(" 23 * * * cmd0"))
+        self.assertEqual(len(placement.concurrency), 2)
+        with self.assertRaisesRegex(ValueError, cronpi.placement.ERR_PLACEMENT_NOT_SUPPORTED):
+            cronpi.run_every_day("*/5").deploy_spread("*/5 * * * * ls", 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
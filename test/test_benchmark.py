@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "benchmark"))
+
+import bench
+from cronpi import cron
+from cronpi.backend import CrontabBackend
+
+class TestBenchmark(unittest.TestCase):
+    def test_run(self):
+        """
+        every benchmark runs on small crontabs
+        """
+        result = bench.run(sizes=[10], repeat=2, jobs=3, label="test")
+        names = set(r["name"] for r in result["results"])
+        self.assertEqual(names, {"deploy", "batch", "get_job_list", "merge",
+                                 "get_updated_content", "validate"})
+        self.assertEqual(set(r.get("backend") for r in result["results"] if r["name"] == "deploy"),
+                         {"spool", "crontab"})
+        self.assertIsInstance(cron.get_backend(), CrontabBackend)
+
+    def test_main(self):
+        """
+        results written as json
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "result.json")
+            bench.main(["--sizes", "10", "--repeat", "1", "--jobs", "2",
+                        "--backends", "spool", "--output", path])
+            with open(path) as f:
+                result = json.load(f)
+        self.assertIsNone(result["label"])
+        self.assertTrue(all(r["count"] >= 1 for r in result["results"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import unittest
+from datetime import datetime
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi.compact import compact_content
+from cronpi.entry import iter_entries
+from cronpi.schedule import next_runs
+from test.helpers import SpoolTestCase
+
+class TestCompact(SpoolTestCase):
+    def runs(self, content, command):
+        """
+        sorted runs of the jobs running command over the next years
+        """
+        runs = set()
+        for entry in iter_entries(content):
+            if entry.is_job and entry.command == command:
+                runs.update(next_runs(entry.raw, datetime(2024, 1, 1), 400))
+        return sorted(runs)[:400]
+
+    def test_compact(self):
+        """
+        merge weekdays, deduplicate and keep other lines
+        """
+        self.backend.write(
+            "MAILTO=root\n"
+            "30 7 * * 1 /job1\n"
+            "# comment\n"
+            "30 7 * * 3 /job1\n"
+            "30 7 * * 5 /job1\n"
+            "30 7 * * 5 /job1\n"
+            "0 * * * * /job2\n"
+            "15,30 * * * * /job2\n"
+            "45 * * * * /job2\n"
+            "@daily /job3\n"
+            "@daily /job3\n"
+            "0 3 * * * /job4 # cronpi: tags=web\n"
+            "0 3 * * * /job4\n")
+        result = cronpi.compact()
+        self.assertEqual(self.backend.read(),
+                         "MAILTO=root\n"
+                         "30 7 * * 1,3,5 /job1\n"
+                         "# comment\n"
+                         "*/15 * * * * /job2\n"
+                         "@daily /job3\n"
+                         "0 3 * * * /job4 # cronpi: tags=web\n"
+                         "0 3 * * * /job4\n")
+        self.assertEqual(result.added, ["30 7 * * 1,3,5 /job1", "*/15 * * * * /job2"])
+        self.assertEqual(len(result.removed), 8)
+        self.assertEqual(cronpi.compact(), ([], []))
+
+    def test_not_merged(self):
+        """
+        lines which would run at other minutes once merged are kept
+        """
+        content = (
+            "30 7 * * 1 /job1\n"
+            "0 8 * * 2 /job1\n"
+            "0 0 * * 1 /job2\n"
+            "0 0 1 * * /job2\n"
+            "0 0 */2 * 1 /job3\n"
+            "0 0 */3 * 1 /job3\n"
+            "30 7 * * 1 /job4\n"
+            "FOO=bar\n"
+            "30 7 * * 2 /job4\n")
+        self.assertEqual(compact_content(content), (content, ([], [])))
+
+    def test_day_or_weekday(self):
+        """
+        day and weekday both restricted run on either of them
+        """
+        content = "0 0 1 * 1 /job1\n0 0 15 * 1 /job1\n0 0 1 * 5 /job1\n"
+        new_content, result = compact_content(content)
+        self.assertEqual(new_content, "0 0 1 * 1,5 /job1\n0 0 15 * 1 /job1\n")
+        self.assertEqual(self.runs(content, "/job1"), self.runs(new_content, "/job1"))
+
+    def test_same_runs(self):
+        """
+        compaction keeps the runs of random crontabs
+        """
+        choices = (
+            ("0", "5", "0,30", "*/20"),
+            ("1", "5", "1-5"),
+            ("*", "1", "15", "*/2"),
+            ("*", "jan", "1-6"),
+            ("*", "1", "5", "*/2", "mon", "0,6"),
+        )
+        rand = random.Random(1)
+        for _ in range(30):
+            lines = []
+            for i in range(20):
+                fields = [rand.choice(field_choices) for field_choices in choices]
+                lines.append("{} /job{}".format(" ".join(fields), i % 3))
+            content = "\n".join(lines) + "\n"
+            new_content, result = compact_content(content)
+            self.assertLessEqual(len(new_content.splitlines()), len(lines))
+            for command in ("/job0", "/job1", "/job2"):
+                self.assertEqual(self.runs(content, command), self.runs(new_content, command))
+
+    def test_large(self):
+        """
+        a large crontab is compacted in a single pass
+        """
+        content = "".join("30 7 * * {} /job{}\n".format(day, i)
+                          for i in range(5000) for day in (1, 3, 5))
+        new_content, result = compact_content(content)
+        self.assertEqual(len(result.added), 5000)
+        self.assertEqual(new_content.splitlines()[0], "30 7 * * 1,3,5 /job0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from cronpi.document import CrontabDocument, command_key
+
+class TestCrontabDocument(unittest.TestCase):
+    def test_command_key(self):
+        """
+        command_key
+        """
+        self.assertEqual(command_key("* * * * * ls   -al"), "ls -al")
+        self.assertNotEqual(command_key("* * * * * ls -al"), command_key("* * * * * l s-al"))
+        self.assertEqual(command_key("@reboot ls -al"), "ls -al")
+        self.assertEqual(command_key("# 1 2 3 4 5 ls"), "")
+        self.assertEqual(command_key(""), "")
+
+    def test_upsert(self):
+        """
+        upsert replaces every line with same command
+        """
+        doc = CrontabDocument.parse("* * * * * ls\n# comment\n30 * * * * ls\n1 * * * * pwd\n")
+        self.assertTrue(doc.upsert("30 7 * * * ls"))
+        self.assertFalse(doc.upsert("30 7 * * * date"))
+        self.assertEqual(doc.serialize(),
+                         "30 7 * * * ls\n# comment\n30 7 * * * ls\n1 * * * * pwd\n30 7 * * * date\n")
+
+    def test_remove(self):
+        """
+        remove
+        """
+        doc = CrontabDocument.parse("* * * * * ls\n1 * * * * pwd\n")
+        self.assertEqual(doc.remove("ls"), ["* * * * * ls"])
+        self.assertEqual(doc.remove("ls"), [])
+        self.assertFalse("ls" in doc)
+        self.assertEqual(len(doc), 1)
+        self.assertEqual(doc.serialize(), "1 * * * * pwd\n")
+
+    def test_apply(self):
+        """
+        apply like deploy
+        """
+        doc = CrontabDocument.parse("")
+        doc.apply("* * * * * ls", False)
+        doc.apply("30 * * * * ls", False)
+        self.assertEqual(doc.lookup("ls"), ["* * * * * ls", "30 * * * * ls"])
+        doc.apply("30 7 * * * ls", True)
+        self.assertEqual(doc.serialize(), "30 7 * * * ls\n30 7 * * * ls\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from cronpi.entry import CronEntry, iter_entries
+
+CONTENT = """MAILTO=root
+# daily backup
+
+30 7 * * 1-5 /opt/backup.sh  --full
+@reboot /opt/start.sh
+PATH = /usr/bin:/bin
+*/5 * * * *"""
+
+class TestCronEntry(unittest.TestCase):
+    def test_kind(self):
+        """
+        kind of each line
+        """
+        kinds = [e.kind for e in iter_entries(CONTENT)]
+        self.assertEqual(kinds, ["env", "comment", "blank", "job", "macro", "env", "job"])
+
+    def test_fields(self):
+        """
+        schedule and command
+        """
+        job, macro, _ = iter_entries(CONTENT, kind=("job", "macro"))
+        self.assertEqual(job.line_number, 4)
+        self.assertEqual(job.schedule, ("30", "7", "*", "*", "1-5"))
+        self.assertEqual(job.weekday, "1-5")
+        self.assertEqual(job.command, "/opt/backup.sh  --full")
+        self.assertEqual(job.key, "/opt/backup.sh --full")
+        self.assertEqual(macro.macro, "@reboot")
+        self.assertEqual(macro.command, "/opt/start.sh")
+        self.assertIsNone(macro.minute)
+
+    def test_variable(self):
+        """
+        environment lines
+        """
+        env = list(iter_entries(CONTENT, kind="env"))
+        self.assertEqual([e.variable for e in env], [("MAILTO", "root"), ("PATH", "/usr/bin:/bin")])
+        self.assertEqual(env[0].command, "")
+
+    def test_incomplete(self):
+        """
+        job line without command
+        """
+        entry = CronEntry(1, "*/5 * * * *")
+        self.assertEqual(entry.command, "")
+        self.assertTrue(entry.is_job)
+
+
+if __name__ == '__main__':
+    unittest.main()
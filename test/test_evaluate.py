@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from cronpi import evaluate
+from cronpi.schedule import compile_expression
+
+EXPRESSIONS = [
+    "*/15 * * * *",
+    "30 7 * * mon-fri /some/command",
+    "0 0 1 * 0",
+    "0 0 29 2 *",
+    "5 4 * * *",
+    "@hourly",
+]
+START = datetime(2024, 2, 28, 22, 50)
+
+@unittest.skipIf(evaluate.np is None, "numpy is not installed")
+class TestEvaluate(unittest.TestCase):
+    def expected(self, minutes):
+        schedules = [compile_expression(e) for e in EXPRESSIONS]
+        return [[s.matches(START + timedelta(minutes=i)) for i in range(minutes)] for s in schedules]
+
+    def test_fire_matrix(self):
+        """
+        fire_matrix is same as Schedule.matches
+        """
+        minutes = 3 * 24 * 60
+        matrix = evaluate.fire_matrix(EXPRESSIONS, START, minutes)
+        self.assertEqual(matrix.tolist(), self.expected(minutes))
+
+    def test_fire_histogram(self):
+        """
+        fire_histogram counts schedules of each minute
+        """
+        minutes = 3 * 24 * 60
+        packed = evaluate.pack(EXPRESSIONS)
+        counts = evaluate.fire_histogram(packed, START, minutes)
+        expected = [sum(column) for column in zip(*self.expected(minutes))]
+        self.assertEqual(counts.tolist(), expected)
+        self.assertEqual(len(packed), len(EXPRESSIONS))
+
+
+if __name__ == '__main__':
+    unittest.main()
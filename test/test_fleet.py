@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import fleet
+from cronpi.backend import CrontabBackend, SpoolBackend
+from test.helpers import SpoolTestCase
+
+class SlowBackend(SpoolBackend):
+    """
+    spool backend whose reads take some time and are counted
+    """
+    active = 0
+    peak = 0
+    counter_lock = threading.Lock()
+
+    def for_user(self, user):
+        return SlowBackend(os.path.dirname(self.path), user)
+
+    def read(self):
+        with SlowBackend.counter_lock:
+            SlowBackend.active += 1
+            SlowBackend.peak = max(SlowBackend.peak, SlowBackend.active)
+        time.sleep(0.02)
+        with SlowBackend.counter_lock:
+            SlowBackend.active -= 1
+        return SpoolBackend.read(self)
+
+
+class TestFleet(SpoolTestCase):
+    def read(self, user):
+        with open(os.path.join(self.directory, user)) as f:
+            return f.read()
+
+    def test_user(self):
+        """
+        every api takes user
+        """
+        cronpi.run_every_day("/job1", user="svc1").on("7:30")
+        cronpi.run_custom("* * * * * /job2", user="svc2", tags="web")
+        with cronpi.transaction(user="svc1"):
+            cronpi.run_custom("* * * * * /job3", user="svc1")
+            cronpi.run_custom("* * * * * /job4")
+            self.assertEqual(cronpi.get_job_list(user="svc1"), ["30 7 * * * /job1"])
+            self.assertEqual(cronpi.get_job_list(), ["* * * * * /job4"])
+        self.assertEqual(self.read("svc1"), "30 7 * * * /job1\n* * * * * /job3\n")
+        self.assertEqual([e.command for e in cronpi.find(tag="web", user="svc2")], ["/job2"])
+        self.assertEqual(cronpi.find(tag="web"), [])
+        cronpi.remove("/job2", user="svc2")
+        self.assertEqual(cronpi.get_job_list(user="svc2"), [""])
+        cronpi.sync(["0 0 * * * /job5"], user="svc1")
+        self.assertEqual(self.read("svc1"), "0 0 * * * /job5\n")
+        with self.assertRaises(ValueError):
+            cronpi.run_every_day("/job1", user="-r").on("7:30")
+        # user names never leave the spool directory
+        for user in ("../escape", "a/b", "..", ".", ""):
+            with self.assertRaises(ValueError):
+                cronpi.run_every_day("/job1", user=user).on("7:30")
+            for call in (cronpi.get_job_list, cronpi.gc, lambda user: cronpi.sync([], user=user),
+                         lambda user: cronpi.find(user=user)):
+                with self.assertRaises(ValueError):
+                    call(user=user)
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.directory), "escape")))
+
+    def test_crontab_command(self):
+        """
+        crontab -u
+        """
+        self.assertEqual(CrontabBackend().command("-l"), ["crontab", "-l"])
+        self.assertEqual(CrontabBackend("svc1").command("-l"), ["crontab", "-u", "svc1", "-l"])
+        self.assertEqual(CrontabBackend("svc1").command(), ["crontab", "-u", "svc1", "-"])
+        self.assertEqual(CrontabBackend().for_user("svc1").lock_name, "crontab:svc1")
+
+    def test_fleet(self):
+        """
+        deploy, sync and list many users in parallel
+        """
+        cronpi.set_backend(SlowBackend(self.directory, user="cronpi"))
+        SlowBackend.peak = 0
+        users = ["svc{}".format(i) for i in range(16)]
+        result = fleet.deploy(users, ["30 7 * * * /job1", "* * * * * /job2"], isOverwrite=True, workers=8)
+        self.assertEqual(result.errors, {})
+        self.assertEqual(sorted(result.results), sorted(users))
+        self.assertGreater(SlowBackend.peak, 1)
+        self.assertEqual(self.read("svc3"), "30 7 * * * /job1\n* * * * * /job2\n")
+
+        result = fleet.sync(dict((user, ["0 0 * * * /{}".format(user)]) for user in users[:4]))
+        self.assertEqual(result.results["svc2"].added, ["0 0 * * * /svc2"])
+        result = fleet.get_job_lists(users[:2] + ["bad user"])
+        self.assertEqual(result.results["svc0"], ["0 0 * * * /svc0"])
+        self.assertEqual(list(result.errors), ["bad user"])
+        self.assertEqual(len(result.results), 2)
+
+    def test_errors(self):
+        """
+        errors collected per user
+        """
+        def func(user):
+            if user == "svc1":
+                raise OSError("failed")
+            return user
+        result = fleet.map_users(func, ["svc0", "svc1", "svc0"])
+        self.assertEqual(result.results, {"svc0": "svc0"})
+        self.assertIsInstance(result.errors["svc1"], OSError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import cron
+from cronpi.document import CrontabDocument
+from test.helpers import SpoolTestCase
+
+class TestGc(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        self.next_year = datetime.now().year + 1
+
+    def test_run_by_date(self):
+        """
+        one-shot job has an expires annotation
+        """
+        cronpi.run_by_date("ls -al").on("{}-10-20 7:30pm".format(self.next_year))
+        line = "30 19 20 10 * ls -al # cronpi: expires={}-10-20T19:31".format(self.next_year)
+        self.assertEqual(cronpi.get_job_list(), [line])
+        job = cronpi.find("ls -al")[0]
+        self.assertEqual(job.expires, datetime(self.next_year, 10, 20, 19, 31))
+
+        cronpi.run_by_date("ls -al", isOverwrite=True).tag("web").on(
+            "{}-12-31 23:59".format(self.next_year))
+        self.assertEqual(cronpi.get_job_list(), [
+            "59 23 31 12 * ls -al # cronpi: expires={}-01-01T00:00 tags=web".format(
+                self.next_year + 1)])
+
+    def test_gc(self):
+        """
+        gc removes expired jobs only
+        """
+        self.backend.write(
+            "30 7 20 10 * /job1 # cronpi: expires=2020-10-20T07:31\n"
+            "30 7 * * * /job2\n"
+            "30 7 21 10 * /job3 # cronpi: expires=2020-10-21T07:31 tags=web\n"
+            "30 7 20 10 * /job4 # cronpi: expires={}-10-20T07:31\n"
+            "30 7 20 10 * /job5 # cronpi: expires=soon\n".format(self.next_year))
+        self.assertEqual(cron.gc(now=datetime(2020, 10, 21)), [
+            "30 7 20 10 * /job1 # cronpi: expires=2020-10-20T07:31"])
+        self.assertEqual(len(cronpi.gc()), 1)
+        self.assertEqual([job.command for job in cronpi.find(regex=".")],
+                         ["/job2", "/job4", "/job5"])
+        self.assertEqual(cronpi.gc(), [])
+
+    def test_deploy_prunes(self):
+        """
+        one-shot deploys remove expired jobs in the same write
+        """
+        self.backend.write("".join(
+            "30 7 20 10 * /job{} # cronpi: expires=2020-10-20T07:31\n".format(i)
+            for i in range(1000)))
+        cronpi.run_custom("* * * * * /job")
+        self.assertEqual(len(cronpi.get_job_list()), 1001)
+        cronpi.run_by_date("/once").on("{}-10-20 7:30".format(self.next_year))
+        self.assertEqual(len(cronpi.get_job_list()), 2)
+
+        with cronpi.transaction():
+            cronpi.run_custom("30 7 20 10 * /old # cronpi: expires=2020-10-20T07:31")
+            cronpi.run_by_date("/once2").on("{}-10-20 7:30".format(self.next_year))
+            cronpi.gc()
+        self.assertEqual([job.command for job in cronpi.find(regex=".")],
+                         ["/job", "/once", "/once2"])
+
+    def test_spread(self):
+        """
+        delayed one-shot job expires later
+        """
+        placement = cronpi.run_by_date("/once").on(
+            "{}-10-20 7:30".format(self.next_year), spread=10, jitter=True)
+        expires = datetime(self.next_year, 10, 20, 7, 31) + timedelta(minutes=placement.delay)
+        self.assertEqual(cronpi.find("/once")[0].expires, expires)
+
+    def test_expired(self):
+        """
+        expired positions of a document
+        """
+        document = CrontabDocument.parse(
+            "* * * * * /job1 # cronpi: tags=expires\n"
+            "@daily /job2 # cronpi: expires=2020-01-01T00:00\n"
+            "# 1 1 1 1 * /job3 # cronpi: expires=2020-01-01T00:00\n")
+        self.assertEqual(document.expired(datetime(2019, 12, 31)), [])
+        self.assertEqual(document.expired(datetime(2020, 1, 1)), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import history, runner
+from cronpi.lock import Semaphore
+from test.helpers import SpoolTestCase
+
+class TestLimits(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        self.history = os.path.join(self.directory, "history.sqlite3")
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        super().tearDown()
+
+    def start(self, command, *args):
+        """
+        start a runner in the background and wait for its command to start
+        """
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+        process = subprocess.Popen(
+            [sys.executable, "-m", "cronpi.runner", "--history", self.history] + list(args) +
+            ["--", command], env=env)
+        self.processes.append(process)
+        if "--max-concurrency" in args:
+            semaphore = Semaphore("job:{}:{}".format(os.getuid(), command), 1)
+        else:
+            semaphore = Semaphore("group:{}".format(args[args.index("--group") + 1]), 1)
+        deadline = time.time() + 10
+        while not any(semaphore.holders()) and time.time() < deadline:
+            time.sleep(0.02)
+        return process
+
+    def run_runner(self, command, *args):
+        return runner.main(["--history", self.history] + list(args) + ["--", command])
+
+    def test_semaphore(self):
+        """
+        a semaphore has at most slots holders
+        """
+        name = "test:{}".format(self.directory)
+        first, second, third = Semaphore(name, 2), Semaphore(name, 2), Semaphore(name, 2)
+        self.assertTrue(first.try_acquire())
+        self.assertTrue(second.try_acquire())
+        self.assertFalse(third.try_acquire())
+        self.assertFalse(third.acquire(timeout=0.1))
+        first.write("123 1000.5")
+        self.assertIn("123 1000.5", third.holders())
+        self.assertEqual(runner._get_oldest(["", "20 30.0", "10 40.0"]), 20)
+        first.release()
+        self.assertTrue(third.acquire(timeout=1))
+        self.assertEqual(third.holders(), [""])
+        second.release()
+        third.release()
+
+    def test_skip(self):
+        """
+        a run is skipped while the previous one is running
+        """
+        command = "sleep 1; : {}".format(self.directory)
+        process = self.start(command, "--max-concurrency", "1")
+        start = time.time()
+        self.assertEqual(self.run_runner(command, "--max-concurrency", "1"), 0)
+        self.assertLess(time.time() - start, 0.9)
+        self.assertEqual(process.wait(), 0)
+        stats = history.stats(command, self.history)
+        self.assertEqual((stats.count, stats.skipped, stats.queued), (1, 1, 0))
+
+        # the slot is free again once the run has ended
+        self.assertEqual(self.run_runner(command, "--max-concurrency", "1"), 0)
+        self.assertEqual(history.stats(command, self.history).count, 2)
+
+    def test_queue(self):
+        """
+        a queued run starts when the previous one ends
+        """
+        command = "sleep 0.5; : {}".format(self.directory)
+        process = self.start(command, "--max-concurrency", "1", "--on-overlap", "queue")
+        self.assertEqual(self.run_runner(command, "--max-concurrency", "1",
+                                         "--on-overlap", "queue"), 0)
+        self.assertEqual(process.wait(), 0)
+        runs = history.runs(command, self.history)
+        self.assertGreaterEqual(runs[0].start, runs[1].end)
+        stats = history.stats(command, self.history)
+        self.assertEqual((stats.count, stats.skipped, stats.queued), (2, 0, 1))
+
+    def test_kill(self):
+        """
+        the oldest run is killed with its children
+        """
+        flag = os.path.join(self.directory, "started")
+        command = "if [ -e {0} ]; then exit 0; fi; touch {0}; sleep 30".format(flag)
+        process = self.start(command, "--max-concurrency", "1", "--on-overlap", "kill")
+        start = time.time()
+        self.assertEqual(self.run_runner(command, "--max-concurrency", "1",
+                                         "--on-overlap", "kill"), 0)
+        self.assertLess(time.time() - start, runner.KILL_TIMEOUT)
+        self.assertEqual(process.wait(), 128 + 15)
+        stats = history.stats(command, self.history)
+        self.assertEqual((stats.count, stats.failures, stats.killed), (2, 1, 1))
+
+    def test_group(self):
+        """
+        commands of a group share max_parallel slots
+        """
+        group = "test{}".format(os.getpid())
+        first = "sleep 1; : {}".format(self.directory)
+        process = self.start(first, "--max-parallel", "1", "--group", group)
+        command = "true; : {}".format(self.directory)
+        self.assertEqual(self.run_runner(command, "--max-parallel", "1", "--group", group), 0)
+        self.assertEqual(history.stats(command, self.history).skipped, 1)
+        self.assertEqual(self.run_runner(command, "--max-parallel", "1", "--group", group,
+                                         "--on-overlap", "queue"), 0)
+        self.assertEqual(process.wait(), 0)
+        self.assertGreaterEqual(history.runs(command, self.history)[0].start,
+                                history.runs(first, self.history)[0].end)
+        stats = history.stats(command, self.history)
+        self.assertEqual((stats.count, stats.skipped, stats.queued), (1, 1, 1))
+
+    def test_builder(self):
+        """
+        limits are installed as runner options
+        """
+        cronpi.run_every_day("/some/command").limit(2, "queue", 3, "batch").on("7:30")
+        cronpi.run_custom("*/5 * * * * /other/command", max_concurrency=1)
+        job, other = cronpi.get_job_list()
+        self.assertIn(" -m cronpi.runner --max-concurrency 2 --on-overlap queue"
+                      " --max-parallel 3 --group batch -- /some/command", job)
+        self.assertIn(" -m cronpi.runner --max-concurrency 1 -- /other/command", other)
+        self.assertEqual(cronpi.find("/other/command")[0].runner, ("--max-concurrency", "1"))
+
+        app = cronpi.run_every_day("/some/command")
+        for kwargs in ({"max_concurrency": 0}, {"on_overlap": "wait"},
+                       {"max_parallel": "2"}, {"group": "a b"}):
+            with self.assertRaises(ValueError):
+                app.limit(**kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
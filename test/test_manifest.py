@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import cron, manifest
+from test.helpers import SpoolTestCase
+
+class TestManifest(SpoolTestCase):
+    def write(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+        return path
+
+    def test_load(self):
+        """
+        every row installed with a single write
+        """
+        self.backend.write("MAILTO=root\n0 0 * * * /job1\n")
+        path = self.write("jobs.ndjson", [
+            {"env": "MAILTO", "value": "root"},
+            {"schedule": "30 7 * * mon-fri", "command": "/job1"},
+            {"schedule": "@daily", "command": "/job2"},
+            {"line": "*/5 * * * * /job1", "overwrite": False},
+        ])
+        result = cronpi.load_manifest(path)
+        self.assertEqual(result.updated, ["30 7 * * mon-fri /job1"])
+        self.assertEqual(result.added, ["@daily /job2", "*/5 * * * * /job1"])
+        self.assertEqual(cronpi.get_job_list(), [
+            "MAILTO=root", "30 7 * * mon-fri /job1", "@daily /job2", "*/5 * * * * /job1"])
+
+    def test_errors(self):
+        """
+        every invalid row reported and nothing installed
+        """
+        path = self.write("jobs.ndjson", [
+            {"schedule": "30 7 * * *", "command": "/job1"},
+            {"schedule": "99 7 * * *", "command": "/job2"},
+            {"command": "/job3"},
+        ])
+        with open(path, "a") as f:
+            f.write("{not json\n")
+        with self.assertRaises(manifest.ManifestError) as cm:
+            cronpi.load_manifest(path)
+        self.assertEqual([e.row for e in cm.exception.errors], [2, 3, 4])
+        self.assertEqual(cron.get_installed_content(), "")
+
+        result = cronpi.load_manifest(path, skip_invalid=True)
+        self.assertEqual(len(result.errors), 3)
+        self.assertEqual(cronpi.get_job_list(), ["30 7 * * * /job1"])
+
+    def test_dump(self):
+        """
+        records in every format
+        """
+        self.backend.write("# comment\nMAILTO=root\n30 7 * * * /job1 -v\n@daily /job2\n")
+        expected = [{"env": "MAILTO", "value": "root"},
+                    {"schedule": "30 7 * * *", "command": "/job1 -v"},
+                    {"schedule": "@daily", "command": "/job2"}]
+        f = io.StringIO()
+        self.assertEqual(cronpi.dump_manifest(f, format="ndjson"), 3)
+        self.assertEqual([json.loads(line) for line in f.getvalue().splitlines()], expected)
+        for name in ("jobs.json", "jobs.yaml"):
+            if name.endswith(".yaml") and manifest.yaml is None:
+                continue
+            path = os.path.join(self.directory, name)
+            cronpi.dump_manifest(path)
+            self.assertEqual(list(manifest.iter_records(path)), expected)
+
+    def test_annotation(self):
+        """
+        the whole annotation is dumped and loaded back
+        """
+        line = "31 7 20 10 * /job1 # cronpi: expires=2020-10-20T07:32 tags=db,nightly"
+        self.backend.write(line + "\n")
+        f = io.StringIO()
+        cronpi.dump_manifest(f, format="ndjson")
+        record = json.loads(f.getvalue())
+        self.assertEqual(record, {"schedule": "31 7 20 10 *", "command": "/job1",
+                                  "tags": ["db", "nightly"],
+                                  "annotation": {"expires": "2020-10-20T07:32"}})
+        self.backend.write("")
+        cronpi.load_manifest(io.StringIO(f.getvalue()), format="ndjson")
+        self.assertEqual(cronpi.get_job_list(), [line])
+
+        path = self.write("jobs.ndjson", [
+            {"schedule": "* * * * *", "command": "/job2", "annotation": {"expires": "a b"}}])
+        with self.assertRaises(manifest.ManifestError):
+            cronpi.load_manifest(path)
+
+    def test_env_order(self):
+        """
+        variables stay before the jobs following them in the manifest
+        """
+        self.backend.write("0 0 * * * /job1\n0 0 * * * /job2\n")
+        path = self.write("jobs.ndjson", [
+            {"schedule": "30 7 * * *", "command": "/job1"},
+            {"env": "MAILTO", "value": "root"},
+            {"schedule": "30 8 * * *", "command": "/job2"},
+            {"schedule": "30 9 * * *", "command": "/job3"},
+        ])
+        result = cronpi.load_manifest(path)
+        self.assertEqual(result.updated, ["30 7 * * * /job1", "30 8 * * * /job2"])
+        self.assertEqual(result.added, ["MAILTO=root", "30 9 * * * /job3"])
+        self.assertEqual(cronpi.get_job_list(), [
+            "30 7 * * * /job1", "MAILTO=root", "30 8 * * * /job2", "30 9 * * * /job3"])
+
+    def test_transaction(self):
+        """
+        rows queued in a running transaction
+        """
+        path = self.write("jobs.jsonl", [{"schedule": "30 7 * * *", "command": "/job1"}])
+        with cronpi.transaction():
+            cronpi.load_manifest(path)
+            cronpi.run_custom("* * * * * /job2")
+            self.assertEqual(cron.get_installed_content(), "")
+        self.assertEqual(cronpi.get_job_list(), ["30 7 * * * /job1", "* * * * * /job2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
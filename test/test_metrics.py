@@ -0,0 +1,72 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import metrics
+from test.helpers import SpoolTestCase
+
+class TestMetrics(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.spans = []
+        cronpi.configure_metrics(hook=self.spans.append)
+
+    def tearDown(self):
+        cronpi.configure_metrics(False, hook=self.spans.append)
+        metrics.reset()
+        super().tearDown()
+
+    def test_spans(self):
+        """
+        phases of a deploy
+        """
+        cronpi.run_custom("* * * * * ls")
+        self.assertEqual([s.name for s in self.spans], ["validate", "lock", "read", "merge", "write", "deploy"])
+        self.assertEqual([s.parent for s in self.spans], ["deploy"] * 5 + [None])
+        self.assertTrue(all(s.duration >= 0 for s in self.spans))
+        spans = metrics.snapshot()["spans"]
+        self.assertEqual(spans["deploy"]["count"], 1)
+        self.assertEqual(spans["deploy"]["buckets"]["+Inf"], 1)
+
+    def test_counters(self):
+        """
+        deploys, no-op writes, bytes written and entries
+        """
+        cronpi.run_custom("* * * * * ls", isOverwrite=True)
+        cronpi.run_custom("* * * * * ls", isOverwrite=True)
+        cronpi.run_custom("@daily pwd")
+        data = metrics.snapshot()
+        self.assertEqual(data["counters"]["deploys"], 3)
+        self.assertEqual(data["counters"]["writes"], 2)
+        self.assertEqual(data["counters"]["noop_writes"], 1)
+        self.assertEqual(data["counters"]["bytes_written"], len("* * * * * ls\n") + len("* * * * * ls\n@daily pwd\n"))
+        self.assertEqual(data["gauges"]["crontab_entries"], 2)
+        self.assertEqual(json.loads(metrics.to_json())["counters"]["deploys"], 3)
+
+    def test_prometheus(self):
+        """
+        text exposition format
+        """
+        cronpi.run_custom("* * * * * ls")
+        text = metrics.to_prometheus()
+        self.assertIn("cronpi_deploys_total 1\n", text)
+        self.assertIn('cronpi_span_duration_seconds_count{span="write"} 1\n', text)
+        self.assertIn('cronpi_span_duration_seconds_bucket{span="read",le="+Inf"} 1\n', text)
+
+    def test_disabled(self):
+        """
+        nothing recorded when disabled
+        """
+        cronpi.configure_metrics(False)
+        cronpi.run_custom("* * * * * ls")
+        self.assertEqual(self.spans, [])
+        self.assertEqual(metrics.snapshot()["counters"]["deploys"], 0)
+        self.assertIs(metrics.span("read"), metrics.span("write"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from cronpi import validator
+from cronpi.parser import CronSyntaxError, check_crontab, parse_crontab, parse_line, parse_schedule
+
+class TestParser(unittest.TestCase):
+    def test_parse_line(self):
+        """
+        fields and command
+        """
+        line = parse_line("*/15 9-17 * jan,jul mon-fri  /some/command  -v")
+        self.assertIsNone(line.macro)
+        self.assertEqual([f.text for f in line.fields], ["*/15", "9-17", "*", "jan,jul", "mon-fri"])
+        self.assertEqual(line.fields[0].items, ((0, 59, 15),))
+        self.assertEqual(line.fields[3].mask, 1 << 1 | 1 << 7)
+        self.assertEqual(line.fields[4].items, ((1, 5, 1),))
+        self.assertTrue(line.fields[2].star)
+        self.assertEqual(line.command, "/some/command  -v")
+
+    def test_macro(self):
+        """
+        macros
+        """
+        line = parse_line("@daily /some/command")
+        self.assertEqual(line.macro, "@daily")
+        self.assertEqual([f.text for f in line.fields], ["0", "0", "*", "*", "*"])
+        self.assertEqual(parse_line("@reboot ls").fields, ())
+        self.assertEqual(parse_schedule("0 0 * * 7")[4].mask, 1)
+
+    def test_errors(self):
+        """
+        error field and column
+        """
+        cases = (
+            ("99 * * * * ls", "minute", 1),
+            ("* 7-3 * * * ls", "hour", 3),
+            ("* * * * */* ls", "weekday", 9),
+            ("*  * 1,0 * * ls", "day", 6),
+            ("* * * 13 * ls", "month", 7),
+            ("* * * * 8 ls", "weekday", 9),
+            ("*/0 * * * * ls", "minute", 1),
+            ("@every ls", "macro", 1),
+        )
+        for content, field, column in cases:
+            with self.assertRaises(CronSyntaxError) as cm:
+                parse_line(content)
+            self.assertEqual((cm.exception.field, cm.exception.column), (field, column), content)
+        with self.assertRaisesRegex(CronSyntaxError, "command is missing"):
+            parse_line("* * * * *")
+        with self.assertRaisesRegex(CronSyntaxError, "field is missing"):
+            parse_line("* * * *")
+
+    def test_validate_crontab_content(self):
+        """
+        validator keeps its message
+        """
+        for content in ("99 * * * * ls", "*/* * * * * ls", "7-3 * * * * ls", "# * * * * * ls"):
+            with self.assertRaisesRegex(ValueError, validator.ERR_COMMAND_FORMAT_NOT_VALID):
+                validator.validate_crontab_content(content)
+        self.assertEqual(validator.validate_crontab_content("5 4 * * sun ls").command, "ls")
+        self.assertEqual(validator.get_week_days(["Sunday", "sat"]), "0,6")
+        self.assertEqual(validator.get_months(["jan", "December"]), "1,12")
+
+    def test_crontab(self):
+        """
+        whole crontab with line numbers
+        """
+        content = "# comment\nMAILTO=root\n\n@daily ls\n*/5 * * * * echo  hi\n"
+        self.assertEqual([(n, l.command) for n, l in parse_crontab(content)], [(4, "ls"), (5, "echo  hi")])
+        self.assertEqual(check_crontab(content), 2)
+        with self.assertRaises(CronSyntaxError) as cm:
+            check_crontab(content + "1 99 * * * ls\n")
+        self.assertEqual((cm.exception.line_number, cm.exception.field), (6, "hour"))
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            validator.validate_crontab("* * * * * ls\n* * * * *")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi.document import CrontabDocument, command_key
+from cronpi.entry import annotate, split_annotation
+from test.helpers import SpoolTestCase
+
+class TestRemove(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend.write(
+            "MAILTO=root\n"
+            "30 7 * * * /opt/app/job1 # cronpi: tags=web\n"
+            "30 7 * * * /opt/app/job2 # cronpi: tags=web,db\n"
+            "@daily /opt/other/job3\n"
+            "0 3 * * * /opt/app/job1 --full\n")
+
+    def test_annotation(self):
+        """
+        annotation is not part of the command key
+        """
+        line = annotate("30 7 * * * ls -al", tags=["web", "db"])
+        self.assertEqual(line, "30 7 * * * ls -al # cronpi: tags=web,db")
+        self.assertEqual(split_annotation(line), ("30 7 * * * ls -al", {"tags": "web,db"}))
+        self.assertEqual(command_key(line), "ls -al")
+        self.assertEqual(annotate(line, tags=None), "30 7 * * * ls -al")
+
+    def test_find(self):
+        """
+        find by command, tag, schedule, regex and predicate
+        """
+        self.assertEqual([e.line_number for e in cronpi.find(tag="web")], [2, 3])
+        self.assertEqual([e.command for e in cronpi.find(tag="db")], ["/opt/app/job2"])
+        self.assertEqual([e.line_number for e in cronpi.find(schedule="30  7 * * *", tag="db")], [3])
+        self.assertEqual([e.line_number for e in cronpi.find(schedule="@daily")], [4])
+        self.assertEqual([e.line_number for e in cronpi.find(regex=r"job1")], [2, 5])
+        self.assertEqual([e.line_number for e in cronpi.find(predicate=lambda e: e.hour == "3")], [5])
+        self.assertEqual([e.tags for e in cronpi.find(command="/opt/app/job1")], [("web",)])
+
+    def test_remove(self):
+        """
+        remove by command and with criteria in a single write
+        """
+        self.assertEqual(cronpi.remove("/opt/app/job1"), ["30 7 * * * /opt/app/job1 # cronpi: tags=web"])
+        self.assertEqual(cronpi.remove_where(regex=r"^/opt/app/"), [
+            "30 7 * * * /opt/app/job2 # cronpi: tags=web,db", "0 3 * * * /opt/app/job1 --full"])
+        self.assertEqual(cronpi.get_job_list(), ["MAILTO=root", "@daily /opt/other/job3"])
+        self.assertEqual(cronpi.remove_where(tag="missing"), [])
+        with self.assertRaises(ValueError):
+            cronpi.remove_where()
+
+    def test_tag_and_transaction(self):
+        """
+        tagged deploys and removals queued in a transaction
+        """
+        with cronpi.transaction():
+            cronpi.run_every_day("/opt/new/job4").tag("batch").on("5:00")
+            cronpi.run_custom("1 1 * * * /opt/new/job5", tags="batch")
+            cronpi.remove_where(tag="web")
+            self.assertEqual(len(cronpi.find(tag="web")), 2)
+        self.assertEqual(cronpi.get_job_list(), [
+            "MAILTO=root", "@daily /opt/other/job3", "0 3 * * * /opt/app/job1 --full",
+            "0 5 * * * /opt/new/job4 # cronpi: tags=batch",
+            "1 1 * * * /opt/new/job5 # cronpi: tags=batch"])
+        cronpi.run_custom("2 2 * * * /opt/new/job5", isOverwrite=True)
+        self.assertEqual(cronpi.get_job_list()[-1], "2 2 * * * /opt/new/job5")
+        with self.assertRaises(ValueError):
+            cronpi.run_every_day("ls").tag("bad tag")
+
+    def test_many(self):
+        """
+        thousands of lines removed by tag
+        """
+        document = CrontabDocument([
+            annotate("* * * * * job{}".format(i), tags="old" if i % 2 else "new")
+            for i in range(5000)])
+        removed = document.discard(document.select(tag="old"))
+        self.assertEqual(len(removed), 2500)
+        self.assertEqual(len(document), 2500)
+        self.assertEqual(document.select(tag="old"), [])
+        self.assertNotIn("job1", document)
+        self.assertIn("job2", document)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import resources, runner
+from test.helpers import SpoolTestCase
+
+class TestResources(SpoolTestCase):
+    def test_builder(self):
+        """
+        resource options are installed as runner options
+        """
+        cronpi.run_every_day("/some/command").resources(
+            "background", cpus=[1, 0, 1], memory_limit="512M").on("2:00")
+        cronpi.run_custom("*/5 * * * * /other/command", profile="batch")
+        cronpi.run_every_week("/third/command").resources(priority=5).on("sun", time="2:00")
+        job, other, third = cronpi.get_job_list()
+        self.assertIn(" -m cronpi.runner --priority 19 --io-class idle --cpus 0,1"
+                      " --memory-limit 536870912 -- /some/command", job)
+        self.assertIn(" -m cronpi.runner --priority 10 --io-class best-effort -- /other/command",
+                      other)
+        self.assertIn(" -m cronpi.runner --priority 5 -- /third/command", third)
+        self.assertEqual(cronpi.find("/third/command")[0].runner, ("--priority", "5"))
+
+    def test_options(self):
+        """
+        profiles give defaults and options are validated
+        """
+        options = resources.get_options("background", priority="low", memory_limit="2G")
+        self.assertEqual(options, {"priority": 10, "io_class": "idle", "cpus": None,
+                                   "memory_limit": 2 * 1024 ** 3})
+        self.assertEqual(resources.get_memory_limit("64kb"), 65536)
+        self.assertEqual(resources.get_memory_limit(1000), 1000)
+
+        app = cronpi.run_every_day("/some/command")
+        for kwargs in ({"profile": "idle"}, {"priority": 20}, {"priority": "lowest"},
+                       {"io_class": "none"}, {"cpus": []}, {"cpus": [-1]},
+                       {"memory_limit": 0}, {"memory_limit": "1X"}):
+            with self.assertRaises(ValueError):
+                app.resources(**kwargs)
+
+    def test_apply(self):
+        """
+        the command runs with the resource options
+        """
+        output = os.path.join(self.directory, "output")
+        script = ("import os, resource; print(os.nice(0), sorted(os.sched_getaffinity(0)),"
+                  " resource.getrlimit(resource.RLIMIT_AS)[0])")
+        command = "{} -c '{}' > {}".format(sys.executable, script, output)
+        niceness = min(19, os.nice(0) + 3)
+        status = runner.main(["--priority", str(niceness), "--cpus", "0",
+                              "--memory-limit", str(1024 ** 3), "--", command])
+        self.assertEqual(status, 0)
+        with open(output) as f:
+            self.assertEqual(f.read().split(None, 1),
+                             [str(niceness), "[0] {}\n".format(1024 ** 3)])
+        # the runner itself is left as it is
+        self.assertLess(os.nice(0), niceness)
+
+        if shutil.which("ionice"):
+            command = "ionice -p $$ > {}".format(output)
+            self.assertEqual(runner.main(["--io-class", "idle", "--", command]), 0)
+            with open(output) as f:
+                self.assertEqual(f.read().strip(), "idle")
+
+    def test_preexec_fn(self):
+        """
+        nothing is imported or loaded in the child, between fork and exec
+        """
+        self.assertIsNone(resources.get_preexec_fn())
+        preexec_fn = resources.get_preexec_fn(io_class="best-effort")
+        ctypes = sys.modules.pop("ctypes", None)
+        sys.modules["ctypes"] = None
+        try:
+            preexec_fn()
+        finally:
+            del sys.modules["ctypes"]
+            if ctypes is not None:
+                sys.modules["ctypes"] = ctypes
+
+    def test_not_applied(self):
+        """
+        a refused option is reported and the command still runs
+        """
+        result = subprocess.run(
+            [sys.executable, "-m", "cronpi.runner", "--cpus", "100000", "--", "exit 4"],
+            env=dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent)),
+            stderr=subprocess.PIPE)
+        self.assertEqual(result.returncode, 4)
+        self.assertIn(b"cronpi.runner: cpus not applied", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import random
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi import history, runner
+from cronpi.document import command_key
+from cronpi.entry import split_runner
+from test.helpers import SpoolTestCase
+
+class TestRunner(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        self.history = os.path.join(self.directory, "history.sqlite3")
+
+    def run_installed(self, line):
+        """
+        run the command of an installed line like cron does
+        """
+        env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+        command = line.split(None, 1 if line.startswith("@") else 5)[-1]
+        return subprocess.call(["/bin/sh", "-c", command], env=env)
+
+    def test_wrap(self):
+        """
+        wrapped jobs keep the command key of their command
+        """
+        cronpi.run_every_day("echo 'a b' | wc -c").track(self.history).tag("web").on("7:30")
+        line = cronpi.get_job_list()[0]
+        self.assertIn(" -m cronpi.runner --track --history ", line)
+        self.assertTrue(line.endswith(" -- 'echo '\"'\"'a b'\"'\"' | wc -c' # cronpi: tags=web"))
+        self.assertEqual(command_key(line), "echo 'a b' | wc -c")
+        job = cronpi.find("echo 'a b' | wc -c")[0]
+        self.assertEqual(job.runner, ("--track", "--history", self.history))
+        self.assertEqual(job.tags, ("web",))
+
+        cronpi.run_every_day("echo 'a b' | wc -c", isOverwrite=True).on("8:30")
+        self.assertEqual(cronpi.get_job_list(), ["30 8 * * * echo 'a b' | wc -c"])
+        self.assertEqual(split_runner("ls -m cronpi.runner"), (None, "ls -m cronpi.runner"))
+
+    def test_run(self):
+        """
+        runs are recorded with their status
+        """
+        cronpi.run_custom("* * * * * exit 3", isOverwrite=True)
+        cronpi.run_custom("@hourly exit 3", track=True)
+        line = cronpi.find("exit 3")[1].raw
+        self.assertTrue(line.startswith("@hourly "))
+        os.environ[history.ENV_HISTORY] = self.history
+        try:
+            self.assertEqual(self.run_installed(line), 3)
+            self.assertEqual(self.run_installed(line), 3)
+            stats = cronpi.stats("exit  3")
+        finally:
+            del os.environ[history.ENV_HISTORY]
+        self.assertEqual((stats.count, stats.failures, stats.last_exit_code), (2, 2, 3))
+        self.assertGreater(stats.max_rss, 0)
+        self.assertEqual(cronpi.stats("exit 4", self.history).count, 0)
+        self.assertEqual(len(history.runs("exit 3", self.history)), 2)
+        self.assertEqual(runner.main(["--history", self.history, "--", "kill", "-9", "$$"]), 137)
+
+    def test_percentiles(self):
+        """
+        percentiles of the histogram are close to the exact ones
+        """
+        rand = random.Random(1)
+        durations = [rand.lognormvariate(0, 1.5) for _ in range(5000)]
+        history.record([history.Run("job", 1000.0, 1000.0 + d, 0, None) for d in durations],
+                       self.history)
+        stats = history.stats("job", self.history)
+        durations.sort()
+        for value, p in ((stats.p50, 0.5), (stats.p95, 0.95), (stats.p99, 0.99)):
+            exact = durations[int(p * len(durations)) - 1]
+            self.assertAlmostEqual(value / exact, 1, delta=0.03)
+        self.assertEqual(stats.count, 5000)
+        self.assertAlmostEqual(stats.min, durations[0])
+        self.assertAlmostEqual(stats.max, durations[-1])
+        self.assertAlmostEqual(stats.mean, sum(durations) / 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi.schedule import compile_expression, ERR_SCHEDULE_NOT_VALID, ERR_SCHEDULE_NEVER_RUNS
+
+START = datetime(2024, 2, 28, 23, 58, 30)
+
+class TestSchedule(unittest.TestCase):
+    def test_next_runs(self):
+        """
+        next_runs
+        """
+        self.assertEqual(cronpi.next_runs("*/30 * * * *", START, 3), [
+            datetime(2024, 2, 29, 0, 0), datetime(2024, 2, 29, 0, 30), datetime(2024, 2, 29, 1, 0)])
+        self.assertEqual(cronpi.next_runs("30 7 * * mon-fri", START, 3), [
+            datetime(2024, 2, 29, 7, 30), datetime(2024, 3, 1, 7, 30), datetime(2024, 3, 4, 7, 30)])
+        self.assertEqual(cronpi.next_run("0 0 29 feb *", START), datetime(2024, 2, 29))
+        self.assertEqual(cronpi.next_run("0 0 29 feb *", datetime(2024, 3, 1)), datetime(2028, 2, 29))
+        self.assertEqual(cronpi.next_run("@yearly /some/command", START), datetime(2025, 1, 1))
+        self.assertEqual(cronpi.next_run("58 23 * * *", START), datetime(2024, 2, 29, 23, 58))
+
+    def test_day_and_weekday(self):
+        """
+        day and weekday are or-ed when both are restricted
+        """
+        self.assertEqual(cronpi.next_runs("0 0 1 * 0", START, 3), [
+            datetime(2024, 3, 1), datetime(2024, 3, 3), datetime(2024, 3, 10)])
+        self.assertEqual(cronpi.next_run("0 0 */2 * 7", START), datetime(2024, 3, 3))
+
+    def test_previous_run(self):
+        """
+        previous_run
+        """
+        self.assertEqual(cronpi.previous_run("30 7 * * mon-fri", START), datetime(2024, 2, 28, 7, 30))
+        self.assertEqual(cronpi.previous_run("0 0 1 jan *", START), datetime(2024, 1, 1))
+        self.assertEqual(cronpi.previous_run("* * * * *", datetime(2024, 1, 1)), datetime(2023, 12, 31, 23, 59))
+
+    def test_invalid(self):
+        """
+        invalid and impossible schedules
+        """
+        for expr in ("60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "* * * * 8",
+                     "7-3 * * * *", "*/0 * * * *", "* * * foo *", "@every", "* * * *"):
+            with self.assertRaisesRegex(ValueError, ERR_SCHEDULE_NOT_VALID):
+                compile_expression(expr)
+        with self.assertRaisesRegex(ValueError, ERR_SCHEDULE_NEVER_RUNS):
+            cronpi.next_run("0 0 30 2 *", START)
+        with self.assertRaisesRegex(ValueError, ERR_SCHEDULE_NEVER_RUNS):
+            cronpi.previous_run("0 0 31 4 *", START)
+
+    def test_memoized(self):
+        """
+        compiled schedules are shared
+        """
+        self.assertIs(compile_expression("1 2 3 4 5 ls"), compile_expression("1 2 3 4 5 pwd"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+from cronpi.scheduler import Scheduler
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, "output")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        if not os.path.exists(self.output):
+            return []
+        with open(self.output) as f:
+            return f.read().split()
+
+    def test_builders(self):
+        """
+        same builders as cronpi
+        """
+        scheduler = cronpi.Scheduler()
+        scheduler.run_every_day("/job1").on("7:30")
+        scheduler.run_every_week("/job2").on("mon", time="8:00")
+        scheduler.run_custom("*/5 * * * * /job3", tags="web")
+        scheduler.run_every_day("/job1", isOverwrite=True).on("9:30")
+        self.assertEqual(scheduler.get_job_list(), [
+            "0 8 * * 1 /job2", "*/5 * * * * /job3 # cronpi: tags=web", "30 9 * * * /job1"])
+        self.assertEqual(scheduler.remove("/job3"), ["*/5 * * * * /job3 # cronpi: tags=web"])
+        self.assertEqual(len(scheduler.get_job_list()), 2)
+        with self.assertRaises(ValueError):
+            scheduler.run_custom("* * * ls")
+
+    def test_next_run_time(self):
+        """
+        next run time is the earliest job
+        """
+        scheduler = Scheduler()
+        self.assertIsNone(scheduler.next_run_time())
+        now = datetime.now()
+        for i in range(2000):
+            scheduler.run_custom("{} {} * * * /job{}".format(i % 60, i % 24, i))
+        expected = min(cronpi.next_run("{} {} * * *".format(i % 60, i % 24), now)
+                       for i in range(2000))
+        self.assertEqual(scheduler.next_run_time(), expected)
+
+    def test_run_pending(self):
+        """
+        due jobs are run and scheduled again, one-shot jobs only once
+        """
+        scheduler = Scheduler(workers=2)
+        scheduler.run_custom("* * * * * echo every >> {}".format(self.output))
+        scheduler.run_by_date("echo once >> {}".format(self.output)).on(
+            "{}-01-01 0:00".format(datetime.now().year + 1))
+        first = scheduler.next_run_time()
+        self.assertEqual(len(scheduler.run_pending(first - timedelta(seconds=1))), 0)
+        self.assertEqual(len(scheduler.run_pending(first)), 1)
+        once = datetime(datetime.now().year + 1, 1, 1)
+        self.assertEqual(len(scheduler.run_pending(once)), 2)
+        self.assertEqual(len(scheduler.run_pending(once + timedelta(minutes=5))), 1)
+        self.assertEqual(len(scheduler.get_job_list()), 1)
+        scheduler.stop()
+        self.assertEqual(sorted(self.read()), ["every", "every", "every", "once"])
+        stats = scheduler.stats()
+        self.assertEqual((stats.runs, stats.failures), (4, 0))
+
+    def test_start(self):
+        """
+        background thread runs @reboot jobs and wakes up for new jobs
+        """
+        scheduler = Scheduler(executor="process")
+        scheduler.run_custom("@reboot echo boot >> {}".format(self.output))
+        with scheduler:
+            scheduler.run_custom("@reboot exit 3")
+            deadline = time.time() + 10
+            while scheduler.stats().runs < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            with self.assertRaises(RuntimeError):
+                scheduler.start()
+        stats = scheduler.stats()
+        self.assertEqual((stats.runs, stats.failures), (2, 1))
+        self.assertLess(stats.max_lag, 5)
+        self.assertEqual(self.read(), ["boot"])
+        self.assertEqual(scheduler.get_job_list(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
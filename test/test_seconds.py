@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cronpi
+import cronpi.aio
+from cronpi import history, runner
+from cronpi.lock import get_lock_path
+from test.helpers import SpoolTestCase
+
+class TestSeconds(SpoolTestCase):
+    def setUp(self):
+        super().setUp()
+        self.history = os.path.join(self.directory, "history.sqlite3")
+
+    def test_builder(self):
+        """
+        sub-minute jobs are a single line starting the runner every minute
+        """
+        cronpi.run_every_seconds("/some/command").track(self.history).on(15)
+        cronpi.run_every_seconds("/some/command", isOverwrite=True).on(5)
+        asyncio.run(cronpi.aio.run_every_seconds("/other/command").on(30))
+        job, other = cronpi.get_job_list()
+        self.assertRegex(job, r"^\* \* \* \* \* .+ -m cronpi\.runner --every 5 -- /some/command$")
+        self.assertIn(" -m cronpi.runner --every 30 -- /other/command", other)
+        self.assertEqual(cronpi.find("/some/command")[0].runner, ("--every", "5"))
+
+        app = cronpi.run_every_seconds("/some/command")
+        for seconds in (0, 7, 60, "15", None):
+            with self.assertRaises(ValueError):
+                app.on(seconds)
+
+    def test_tick(self):
+        """
+        ticks are due at fixed offsets and skipped while the previous run
+        is still running
+        """
+        args = runner.parse_args(["--every", "1", "--history", self.history,
+                                  "sleep 1.5; : {}".format(self.directory)])
+        start = time.time()
+        self.assertEqual(runner.tick(args, start, start + 3), 0)
+        key = args.command
+        runs = sorted(history.runs(key, self.history), key=lambda run: run.start)
+        self.assertEqual([round(run.start - start) for run in runs], [0, 2])
+        for run, offset in zip(runs, (0, 2)):
+            self.assertLess(abs(run.start - start - offset), 0.3)
+        self.assertEqual(history.stats(key, self.history).skipped, 1)
+        # the tick lock file is removed once the last run has ended
+        name = "tick:{}:{}".format(os.getuid(), key)
+        self.assertFalse(os.path.exists(get_lock_path(name + ":0")))
+
+        args = runner.parse_args(["--every", "1", "--history", self.history,
+                                  "exit 2; : {}".format(self.directory)])
+        # ticks due long before the runner started are not run
+        start = time.time()
+        self.assertEqual(runner.tick(args, start - 5, start + 1), 2)
+        self.assertEqual(history.stats(args.command, self.history).count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()